@@ -1,65 +1,182 @@
 # app/crud/activity.py
 
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 from datetime import datetime
 from bson import ObjectId
 
-from app.db.mongodb import activity_logs_collection
+from app.db.mongodb import activity_logs_collection, analytics_reads
+from app.db.pagination import decode_cursor, encode_cursor
+from app.db.persistence import insert_document
 from app.schemas.activity import ActivityLogCreate, ActivityLogDB
+from app.services.activity_writer import activity_writer
 
-async def create_activity_log(log_in: ActivityLogCreate) -> ActivityLogDB:
+# Les logs sont dans une collection time-series : `timestamp` est le
+# timeField, `meta` le metaField typé (user_id / course_id en ObjectId,
+# action). Le reste de `metadata` est stocké tel quel.
+ANONYMOUS = "anonymous"
+
+def _oid_or_none(value: Any) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if isinstance(value, str) and ObjectId.is_valid(value) else None
+
+def log_document(
+    user_id: Any,
+    action: str,
+    timestamp: datetime,
+    metadata: Optional[Dict[str, Any]]
+) -> dict:
     """
-    Insère un document dans la collection `activity_logs`.
+    Document time-series d'un log. Un user_id non ObjectId ("anonymous")
+    devient null ; metadata.course_id passe dans `meta` s'il est valide.
     """
-    # On convertit user_id en ObjectId si possible, sinon on le laisse tel quel.
-    if ObjectId.is_valid(log_in.user_id):
-        user_field = ObjectId(log_in.user_id)
-    else:
-        user_field = log_in.user_id
-
-    doc = {
-        "user_id":  user_field,
-        "action":   log_in.action,
-        "timestamp": log_in.timestamp,
-        "metadata":  log_in.metadata,
+    extra = dict(metadata or {})
+    course_id = _oid_or_none(extra.get("course_id"))
+    if course_id is not None:
+        del extra["course_id"]
+    return {
+        "timestamp": timestamp,
+        "meta": {
+            "user_id":   _oid_or_none(user_id),
+            "action":    action,
+            "course_id": course_id,
+        },
+        "metadata": extra or None,
     }
 
-    res = await activity_logs_collection.insert_one(doc)
-    created = await activity_logs_collection.find_one({"_id": res.inserted_id})
-    if not created:
-        return None
+def _log_doc(log_in: ActivityLogCreate) -> dict:
+    return log_document(log_in.user_id, log_in.action, log_in.timestamp, log_in.metadata)
 
-    # Convertir _id et user_id vers str pour Pydantic
-    created["_id"] = str(created["_id"])
-    created["user_id"] = (
-        str(created["user_id"]) 
-        if isinstance(created["user_id"], ObjectId) 
-        else created["user_id"]
+def _log_out(doc: dict) -> ActivityLogDB:
+    """Forme de l'API (inchangée) : user_id à plat, course_id dans metadata."""
+    meta = doc.get("meta") or {}
+    metadata = doc.get("metadata")
+    if meta.get("course_id") is not None:
+        metadata = {**(metadata or {}), "course_id": str(meta["course_id"])}
+    return ActivityLogDB(
+        _id=doc["_id"],
+        user_id=meta.get("user_id") or ANONYMOUS,
+        action=meta.get("action", ""),
+        timestamp=doc["timestamp"],
+        metadata=metadata
     )
 
-    return ActivityLogDB(**created)
+async def create_activity_log(
+    log_in: ActivityLogCreate,
+    return_document: bool = False
+) -> Optional[ActivityLogDB]:
+    """
+    Insère un document dans la collection `activity_logs`.
+    Par défaut le document est simplement mis en file pour l'écrivain en
+    arrière-plan (aucun aller-retour Mongo) et la fonction renvoie None.
+    Avec return_document=True, on insère tout de suite et on renvoie le document.
+    """
+    doc = _log_doc(log_in)
 
-async def list_activity_logs(user_id: Optional[str] = None) -> List[ActivityLogDB]:
+    if not return_document:
+        await activity_writer.submit(doc)
+        return None
+
+    created = await insert_document(activity_logs_collection, doc)
+    return _log_out(created)
+
+async def create_activity_logs(logs: List[ActivityLogCreate]) -> None:
     """
-    Liste tous les logs, ou filtre par user_id.
+    Plusieurs logs d'un coup (opérations en masse) : un seul insert_many
+    quand l'écrivain ne tourne pas, sinon mis en file ensemble.
     """
-    query = {}
-    if user_id:
-        if ObjectId.is_valid(user_id):
-            query["user_id"] = ObjectId(user_id)
-        else:
-            query["user_id"] = user_id
-
-    cursor = activity_logs_collection.find(query).sort("timestamp", -1)
-    out: List[ActivityLogDB] = []
-
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        doc["user_id"] = (
-            str(doc["user_id"]) 
-            if isinstance(doc["user_id"], ObjectId) 
-            else doc["user_id"]
-        )
-        out.append(ActivityLogDB(**doc))
+    await activity_writer.submit_many([_log_doc(log_in) for log_in in logs])
+
+# Tri servi par les index (meta.<champ>, timestamp) et par le tri borné des
+# time-series : sur `timestamp` seul. Le curseur porte (timestamp, _id) du
+# dernier log rendu pour départager les logs de même timestamp.
+LOGS_SORT = [("timestamp", -1)]
+LOGS_CURSOR = [("timestamp", -1), ("_id", -1)]
 
+def _newest_first(docs: List[dict]) -> List[dict]:
+    """
+    Tri (timestamp, _id) décroissant, sans doublons : l'écrivain livre au
+    moins une fois, un même log (même _id) peut donc être stocké deux fois.
+    """
+    out: List[dict] = []
+    for doc in sorted(docs, key=lambda d: (d["timestamp"], d["_id"]), reverse=True):
+        if not out or out[-1]["_id"] != doc["_id"]:
+            out.append(doc)
     return out
+
+async def _page_logs(
+    collection,
+    query: Dict[str, Any],
+    limit: Optional[int],
+    cursor: Optional[str]
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Pagination par curseur sur (timestamp, _id) décroissants, avec un tri
+    serveur sur `timestamp` seul ; l'ordre des ex aequo est fixé ici.
+    Une page peut compter moins de `limit` logs quand des doublons ont été
+    retirés ; le curseur reste exact.
+    """
+    if cursor:
+        ts, last_id = decode_cursor(cursor, LOGS_CURSOR)
+        query = {
+            **query,
+            "timestamp": {**query.get("timestamp", {}), "$lte": ts},
+            "$nor": [{"timestamp": ts, "_id": {"$gte": last_id}}],
+        }
+
+    find = collection.find(query).sort(LOGS_SORT)
+    if limit is None:
+        return _newest_first(await find.to_list(length=None)), None
+
+    docs = await find.limit(limit + 1).to_list(length=limit + 1)
+    if len(docs) <= limit:
+        return _newest_first(docs), None
+    # Le dernier timestamp lu peut avoir d'autres logs (ordre serveur
+    # arbitraire entre ex aequo) : on relit seulement ce qu'il faut pour
+    # compléter la page, triés par _id (tri borné à `need` documents).
+    edge = docs[-1]["timestamp"]
+    above = [d for d in docs if d["timestamp"] != edge]
+    need = limit - len(above)
+    ties = await collection.find({**query, "timestamp": edge}) \
+        .sort([("_id", -1)]).limit(need).to_list(length=need)
+    page = _newest_first(above + ties)
+    return page, encode_cursor(page[-1], LOGS_CURSOR)
+
+async def list_activity_logs(
+    user_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    course_id: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Tuple[List[ActivityLogDB], Optional[str]]:
+    """
+    Liste les logs (une page si `limit` est donné), filtrés par utilisateur,
+    cours, action et/ou intervalle [since, until). Chaque filtre a son index
+    (meta.<champ>, timestamp). Renvoie aussi le curseur de la page suivante.
+    """
+    # ids qui ne peuvent correspondre à aucun log
+    if user_id and user_id != ANONYMOUS and not ObjectId.is_valid(user_id):
+        return [], None
+    if course_id and not ObjectId.is_valid(course_id):
+        return [], None
+
+    query: Dict[str, Any] = {}
+    if user_id:
+        query["meta.user_id"] = None if user_id == ANONYMOUS else _oid_or_none(user_id)
+    if course_id:
+        query["meta.course_id"] = _oid_or_none(course_id)
+    if action:
+        query["meta.action"] = action
+    if since or until:
+        query["timestamp"] = {
+            **({"$gte": since} if since else {}),
+            **({"$lt": until} if until else {}),
+        }
+
+    # admin listing: may be served by a secondary
+    docs, next_cursor = await _page_logs(
+        analytics_reads(activity_logs_collection), query, limit, cursor
+    )
+    return [_log_out(doc) for doc in docs], next_cursor
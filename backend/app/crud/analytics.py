@@ -0,0 +1,142 @@
+# app/crud/analytics.py
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+
+from app.db.indexes import ACTIVITY_LOG_TTL_DAYS
+from app.db.mongodb import (
+    activity_logs_collection,
+    activity_daily_collection,
+    rollup_state_collection,
+    analytics_reads
+)
+from app.schemas.analytics import DailyActivity, RollupResult
+
+# Daily summaries, one document per (day, course_id, action):
+#   { _id: {day, course_id, action}, day, course_id, action, count, users, rolled_up_at }
+# rollup_activity() aggregates the logs written since the stored watermark
+# and $merges the result. Summaries are recomputed a whole day at a time
+# (from 00:00 of the watermark's day), so `users` stays a true distinct
+# count and replacing the row is always correct. Logs inserted behind the
+# watermark (e.g. by app.scripts.migrate_activity_logs) are only counted
+# after a rebuild.
+
+STATE_ID = "activity_daily"
+# Logs younger than this are left for the next run (the activity writer
+# and spill replay can deliver them slightly late)
+ROLLUP_LAG = timedelta(minutes=5)
+# Days aggregated per $merge; the watermark advances after each chunk
+ROLLUP_CHUNK_DAYS = 7
+
+
+def day_start(ts: datetime) -> datetime:
+    """00:00 UTC of the day `ts` falls in."""
+    return datetime(ts.year, ts.month, ts.day)
+
+
+def _pipeline(start: datetime, end: datetime, run_at: datetime) -> List[dict]:
+    return [
+        {"$match": {"timestamp": {"$gte": start, "$lt": end}}},
+        # the activity writer delivers at least once: count each _id once
+        {"$group": {"_id": "$_id", "timestamp": {"$first": "$timestamp"}, "meta": {"$first": "$meta"}}},
+        {"$group": {
+            "_id": {
+                "day":       {"$dateTrunc": {"date": "$timestamp", "unit": "day"}},
+                "course_id": "$meta.course_id",
+                "action":    "$meta.action"
+            },
+            "count": {"$sum": 1},
+            "users": {"$addToSet": "$meta.user_id"}
+        }},
+        {"$project": {
+            "day":       "$_id.day",
+            "course_id": "$_id.course_id",
+            "action":    "$_id.action",
+            "count":     1,
+            # anonymous logs have no user
+            "users":     {"$size": {"$setDifference": ["$users", [None]]}},
+            "rolled_up_at": run_at
+        }},
+        {"$merge": {
+            "into":           activity_daily_collection.name,
+            "on":             "_id",
+            "whenMatched":    "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+
+async def rollup_watermark() -> Optional[datetime]:
+    state = await rollup_state_collection.find_one({"_id": STATE_ID})
+    return state["watermark"] if state else None
+
+
+async def rollup_activity(rebuild: bool = False) -> RollupResult:
+    """
+    Bring `activity_daily` up to date with the logs, up to now - ROLLUP_LAG.
+    With `rebuild`, start over from the oldest log still retained.
+    Safe to run concurrently or to interrupt: every chunk is an idempotent
+    replace of whole days, and the watermark only moves forward.
+    """
+    now = datetime.utcnow()
+    until = now - ROLLUP_LAG
+    watermark = None if rebuild else await rollup_watermark()
+
+    if watermark is not None:
+        start = day_start(watermark)
+    else:
+        oldest = await activity_logs_collection.find_one({}, {"timestamp": 1}, sort=[("timestamp", 1)])
+        if not oldest:
+            return RollupResult()
+        start = day_start(oldest["timestamp"])
+    if ACTIVITY_LOG_TTL_DAYS:
+        # days whose logs are (partly) expired would be replaced by partial counts
+        horizon = day_start(now - timedelta(days=ACTIVITY_LOG_TTL_DAYS)) + timedelta(days=1)
+        start = max(start, horizon)
+
+    result = RollupResult(since=start, watermark=watermark)
+    chunk_start = start
+    while chunk_start < until:
+        chunk_end = min(chunk_start + timedelta(days=ROLLUP_CHUNK_DAYS), until)
+        await activity_logs_collection.aggregate(
+            _pipeline(chunk_start, chunk_end, now), allowDiskUse=True
+        ).to_list(length=None)
+        await rollup_state_collection.update_one(
+            {"_id": STATE_ID},
+            {"$max": {"watermark": chunk_end}, "$set": {"updated_at": now}},
+            upsert=True
+        )
+        result.watermark = chunk_end
+        chunk_start = chunk_end
+
+    result.rows = await activity_daily_collection.count_documents({"day": {"$gte": start}})
+    return result
+
+
+async def list_daily_activity(
+    since: datetime,
+    course_id: Optional[str] = None,
+    action: Optional[str] = None
+) -> List[DailyActivity]:
+    """Summary rows from `since` (a day, inclusive), oldest day first."""
+    query: Dict = {"day": {"$gte": day_start(since)}}
+    if course_id:
+        query["course_id"] = ObjectId(course_id)
+    if action:
+        query["action"] = action
+    cursor = analytics_reads(activity_daily_collection).find(query, {"_id": 0}) \
+        .sort([("day", 1), ("action", 1)])
+    return [DailyActivity(**doc) async for doc in cursor]
+
+
+async def activity_by_action(since: datetime, course_id: Optional[str] = None) -> Dict[str, int]:
+    """Log counts per action from `since` (a day, inclusive), from the summaries."""
+    match: Dict = {"day": {"$gte": day_start(since)}}
+    if course_id:
+        match["course_id"] = ObjectId(course_id)
+    rows = await analytics_reads(activity_daily_collection).aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$action", "count": {"$sum": "$count"}}}
+    ]).to_list(length=None)
+    return {r["_id"]: r["count"] for r in rows}
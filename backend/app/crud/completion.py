@@ -4,7 +4,9 @@ from bson import ObjectId
 from typing import List
 
 from app.db.mongodb import completions_collection
+from app.db.persistence import insert_document
 from app.schemas.completion import Completion, CompletionCreate
+from app.crud.progress import record_completion
 
 async def create_completion(user_id: str, course_id: str, post_id: str) -> Completion:
     """Mark a single post done for a user."""
@@ -14,13 +16,8 @@ async def create_completion(user_id: str, course_id: str, post_id: str) -> Compl
         "post_id":    ObjectId(post_id),
         "created_at": datetime.utcnow()
     }
-    res = await completions_collection.insert_one(doc)
-    created = await completions_collection.find_one({"_id": res.inserted_id})
-    # convert ObjectIds → str
-    created["_id"]        = str(created["_id"])
-    created["user_id"]    = str(created["user_id"])
-    created["course_id"]  = str(created["course_id"])
-    created["post_id"]    = str(created["post_id"])
+    created = await insert_document(completions_collection, doc)
+    await record_completion(user_id, course_id, 1)
     return Completion(**created)
 
 async def delete_completion(user_id: str, course_id: str, post_id: str) -> bool:
@@ -30,7 +27,10 @@ async def delete_completion(user_id: str, course_id: str, post_id: str) -> bool:
         "course_id": ObjectId(course_id),
         "post_id":   ObjectId(post_id)
     })
-    return res.deleted_count == 1
+    if res.deleted_count != 1:
+        return False
+    await record_completion(user_id, course_id, -1)
+    return True
 
 async def list_completions(user_id: str, course_id: str) -> List[Completion]:
     """List all completions for this user+course."""
@@ -40,9 +40,5 @@ async def list_completions(user_id: str, course_id: str) -> List[Completion]:
     })
     out = []
     async for doc in cursor:
-        doc["_id"]        = str(doc["_id"])
-        doc["user_id"]    = str(doc["user_id"])
-        doc["course_id"]  = str(doc["course_id"])
-        doc["post_id"]    = str(doc["post_id"])
         out.append(Completion(**doc))
     return out
@@ -4,12 +4,11 @@ from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 
-from app.db.mongodb import db
+from app.db.mongodb import courses_collection, enrollments_collection
+from app.db.persistence import insert_document, update_document
 from app.schemas.course import CourseCreate, CourseDB
 
-from app.crud.user import list_enrollments  # pour récupérer les enrollments de l'utilisateur
-
-courses_collection = db.get_collection("courses")
+from app.crud.course_version import bump_course_version
 
 
 async def create_course(course_in: CourseCreate, created_by: str) -> CourseDB:
@@ -18,11 +17,10 @@ async def create_course(course_in: CourseCreate, created_by: str) -> CourseDB:
     doc.update({
         "created_at": now,
         "updated_at": now,
-        "created_by": created_by
+        "created_by": created_by,
+        "post_count": 0             # maintained by crud.progress.record_post
     })
-    result = await courses_collection.insert_one(doc)
-    created = await courses_collection.find_one({"_id": result.inserted_id})
-    created["_id"] = str(created["_id"])
+    created = await insert_document(courses_collection, doc)
     return CourseDB(**created)
 
 
@@ -30,7 +28,6 @@ async def get_course(course_id: str) -> Optional[CourseDB]:
     doc = await courses_collection.find_one({"_id": ObjectId(course_id)})
     if not doc:
         return None
-    doc["_id"] = str(doc["_id"])
     return CourseDB(**doc)
 
 
@@ -42,49 +39,50 @@ async def list_courses() -> List[CourseDB]:
     out: List[CourseDB] = []
     cursor = courses_collection.find().sort("created_at", -1)
     async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
         out.append(CourseDB(**doc))
     return out
 
 
 async def list_courses_by_user(user_id: str) -> List[CourseDB]:
     """
-    Liste uniquement les cours pour lesquels l'utilisateur est inscrit.
-    On lit d'abord les enrollments de l'utilisateur, puis on récupère
-    chaque cours correspondant.
+    Liste uniquement les cours pour lesquels l'utilisateur est inscrit,
+    en une seule agrégation : les inscriptions de l'utilisateur (index
+    user_id, course_id) jointes aux cours correspondants.
     """
-    # 1) Récupérer les enrollments de l'utilisateur
-    enrolls = await list_enrollments(user_id)  # renvoie List[Enrollment]
-    if not enrolls:
-        return []
-
-    # 2) Extraire les courseIds valides
-    course_ids = [
-        ObjectId(e.courseId) if ObjectId.is_valid(e.courseId) else e.courseId
-        for e in enrolls
+    pipeline = [
+        {"$match": {"user_id": ObjectId(user_id)}},
+        {"$lookup": {
+            "from":         courses_collection.name,
+            "localField":   "course_id",
+            "foreignField": "_id",
+            "as":           "course"
+        }},
+        {"$unwind": "$course"},
+        {"$replaceWith": "$course"},
+        {"$sort": {"created_at": -1}}
     ]
-
-    # 3) Requête Mongo pour récupérer tous les cours de la liste
-    out: List[CourseDB] = []
-    cursor = courses_collection.find({"_id": {"$in": course_ids}}).sort("created_at", -1)
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        out.append(CourseDB(**doc))
-    return out
+    return [CourseDB(**doc) async for doc in enrollments_collection.aggregate(pipeline)]
 
 
 async def update_course(course_id: str, course_in: CourseCreate) -> Optional[CourseDB]:
     now = datetime.utcnow()
     update = {**course_in.model_dump(), "updated_at": now}
-    result = await courses_collection.update_one(
+    doc = await update_document(
+        courses_collection,
         {"_id": ObjectId(course_id)},
         {"$set": update}
     )
-    if result.matched_count == 0:
+    if not doc:
         return None
-    return await get_course(course_id)
+    await bump_course_version(course_id)
+    return CourseDB(**doc)
 
 
 async def delete_course(course_id: str) -> bool:
     result = await courses_collection.delete_one({"_id": ObjectId(course_id)})
-    return result.deleted_count == 1
+    if result.deleted_count != 1:
+        return False
+    await enrollments_collection.delete_many({"course_id": ObjectId(course_id)})
+    # so cached copies of the course stop validating
+    await bump_course_version(course_id)
+    return True
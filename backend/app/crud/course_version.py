@@ -0,0 +1,53 @@
+# app/crud/course_version.py
+#
+# Per-course change counter behind the ETags of the course feeds (posts,
+# forum threads, thread detail) and of the course itself. Every write to
+# those bumps it; GETs compare If-None-Match against it before touching
+# any document.
+# Versions are cached in-process for COURSE_VERSION_TTL seconds. A bump
+# made by this worker updates the cache at once, so only writes made by
+# other workers can go unseen, and for at most that long.
+
+import os
+import time
+from typing import Dict, Tuple, Union
+
+from bson import ObjectId
+
+from app.db.mongodb import course_versions_collection
+from app.db.persistence import update_document
+
+COURSE_VERSION_TTL  = float(os.getenv("COURSE_VERSION_TTL", "2"))
+_CACHE_MAX_ENTRIES  = 10000
+
+# course id -> (version, expires at)
+_cache: Dict[str, Tuple[int, float]] = {}
+
+
+def _remember(course_id: str, version: int) -> None:
+    if len(_cache) >= _CACHE_MAX_ENTRIES:
+        _cache.clear()
+    _cache[course_id] = (version, time.monotonic() + COURSE_VERSION_TTL)
+
+
+async def bump_course_version(course_id: Union[str, ObjectId]) -> int:
+    """Record a change to the course's content; returns the new version."""
+    doc = await update_document(
+        course_versions_collection,
+        {"_id": ObjectId(course_id)},
+        {"$inc": {"v": 1}},
+        upsert=True
+    )
+    _remember(str(course_id), doc["v"])
+    return doc["v"]
+
+
+async def get_course_version(course_id: str) -> int:
+    """Current version (0 for a course never written since versions exist)."""
+    hit = _cache.get(course_id)
+    if hit and hit[1] > time.monotonic():
+        return hit[0]
+    doc = await course_versions_collection.find_one({"_id": ObjectId(course_id)})
+    version = doc["v"] if doc else 0
+    _remember(course_id, version)
+    return version
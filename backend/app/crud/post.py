@@ -1,27 +1,53 @@
 # app/crud/post.py
 
-from typing import List, Optional
+from typing import List, Optional, Tuple, Union
 from datetime import datetime
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from app.db.mongodb import posts_collection
-from app.schemas.post import PostCreate, PostUpdate, PostDB
+from app.db.pagination import paginate
+from app.db.persistence import insert_document, update_document
+from app.schemas.post import PostCreate, PostUpdate, PostDB, PostSummary
+from app.crud.progress import record_post, forget_post_completions
+from app.crud.course_version import bump_course_version
+from app.services.gridfs_dedup import acquire_file, release_file
+
+# Unpinned posts are ordered by `position`, spaced POSITION_GAP apart so a
+# move only rewrites the moved post (it takes the midpoint of its new
+# neighbours). The unique (course_id, position) index on unpinned posts
+# rejects a concurrent writer that picked the same slot; it then retries.
+POSITION_GAP = 1024
+_REORDER_ATTEMPTS = 5
+
+
+class InvalidOrder(ValueError):
+    """Raised when a new order does not list exactly the course's unpinned posts."""
+
+
+class ReorderConflict(Exception):
+    """Raised when a reorder keeps losing races against concurrent editors."""
+
+
+async def _last_position(course_oid: ObjectId) -> int:
+    """Position of the last unpinned post of the course (0 when there is none)."""
+    last = await posts_collection.find_one(
+        {"course_id": course_oid, "ispinned": False},
+        {"position": 1},
+        sort=[("position", -1)]
+    )
+    return last["position"] if last else 0
+
 
 async def create_post(course_id: str, author_id: str, post_in: PostCreate) -> PostDB:
     """
     Insert a new post. 
-    Assigns position = (max existing position in that course) + 1,
+    Assigns position = (last position in that course) + POSITION_GAP,
     ispinned = False, pinnedAt = None.
     Includes due_date if provided.
     """
     now = datetime.utcnow()
-    # Determine max position among unpinned posts
-    agg_pipeline = [
-        {"$match": {"course_id": ObjectId(course_id), "ispinned": False}},
-        {"$group": {"_id": None, "maxPos": {"$max": "$position"}}}
-    ]
-    agg = await posts_collection.aggregate(agg_pipeline).to_list(length=1)
-    max_pos = agg[0]["maxPos"] if agg and agg[0].get("maxPos") is not None else 0
 
     # Build the new document
     doc = {
@@ -32,53 +58,66 @@ async def create_post(course_id: str, author_id: str, post_in: PostCreate) -> Po
         "type":       post_in.type,
         "file_id":    ObjectId(post_in.file_id) if post_in.file_id else None,
         "due_date":   post_in.due_date if post_in.due_date else None,  # ← include due_date
-        "position":   max_pos + 1,
+        "position":   None,
         "ispinned":   False,
         "pinnedAt":   None,
         "created_at": now,
         "updated_at": now
     }
 
-    # Insert and fetch the created document
-    res = await posts_collection.insert_one(doc)
-    created = await posts_collection.find_one({"_id": res.inserted_id})
-    if not created:
-        return None
-
-    # Convert ObjectId → str before handing to Pydantic
-    created["_id"]        = str(created["_id"])
-    created["course_id"]  = str(created["course_id"])
-    created["author_id"]  = str(created["author_id"])
-    if created.get("file_id"):
-        created["file_id"] = str(created["file_id"])
-    # due_date remains as datetime or None
+    # The post holds a reference on its attachment (UnknownFile if missing)
+    if doc["file_id"]:
+        await acquire_file(doc["file_id"])
+
+    # Insert at the bottom; retry if another post just took that slot.
+    # The document we built is what got stored.
+    for _ in range(_REORDER_ATTEMPTS):
+        doc["position"] = await _last_position(doc["course_id"]) + POSITION_GAP
+        try:
+            created = await insert_document(posts_collection, doc)
+            break
+        except DuplicateKeyError:
+            continue
+    else:
+        await release_file(doc["file_id"])
+        raise ReorderConflict("Could not append the post, please retry")
+    await record_post(course_id, 1)
+    await bump_course_version(course_id)
 
     return PostDB(**created)
 
 
-async def list_posts(course_id: str) -> List[PostDB]:
-    """
-    Return all posts for a course, with pinned posts first (ordered by pinnedAt DESC),
-    then unpinned posts ordered by position ASC. Includes due_date.
-    """
-    cursor = posts_collection.find({"course_id": ObjectId(course_id)})
-    posts: List[PostDB] = []
-    async for doc in cursor:
-        doc["_id"]        = str(doc["_id"])
-        doc["course_id"]  = str(doc["course_id"])
-        doc["author_id"]  = str(doc["author_id"])
-        if doc.get("file_id"):
-            doc["file_id"] = str(doc["file_id"])
-        # due_date is already a datetime or None
-        posts.append(PostDB(**doc))
+# Feed order: pinned posts first (most recently pinned on top), then
+# unpinned posts by position; _id breaks ties so cursors are stable.
+# The sort is served by the `course_feed` index (see app.db.indexes).
+POSTS_SORT = [("ispinned", -1), ("pinnedAt", -1), ("position", 1), ("_id", 1)]
 
-    pinned_posts   = [p for p in posts if p.ispinned]
-    unpinned_posts = [p for p in posts if not p.ispinned]
+# Feed projection for summary=True: everything but the post body
+SUMMARY_PROJECTION = {"content": 0}
 
-    pinned_posts.sort(key=lambda p: p.pinnedAt or datetime.min, reverse=True)
-    unpinned_posts.sort(key=lambda p: p.position)
 
-    return pinned_posts + unpinned_posts
+async def list_posts(
+    course_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    summary: bool = False
+) -> Tuple[Union[List[PostDB], List[PostSummary]], Optional[str]]:
+    """
+    Return the posts of a course in feed order, with pinned posts first
+    (ordered by pinnedAt DESC), then unpinned posts ordered by position ASC.
+    Includes due_date. With `limit`, returns one page plus the cursor of the next.
+    With `summary`, `content` is left out server-side (PostSummary items).
+    """
+    docs, next_cursor = await paginate(
+        posts_collection,
+        {"course_id": ObjectId(course_id)},
+        POSTS_SORT,
+        limit=limit,
+        cursor=cursor,
+        projection=SUMMARY_PROJECTION if summary else None
+    )
+    model = PostSummary if summary else PostDB
+    return [model(**doc) for doc in docs], next_cursor
 
 
 async def get_post(post_id: str) -> Optional[PostDB]:
@@ -88,15 +127,6 @@ async def get_post(post_id: str) -> Optional[PostDB]:
     doc = await posts_collection.find_one({"_id": ObjectId(post_id)})
     if not doc:
         return None
-
-    # Fixed: read from "_id", not "_1d"
-    doc["_id"]        = str(doc["_id"])
-    doc["course_id"]  = str(doc["course_id"])
-    doc["author_id"]  = str(doc["author_id"])
-    if doc.get("file_id"):
-        doc["file_id"] = str(doc["file_id"])
-    # due_date remains as datetime or None
-
     return PostDB(**doc)
 
 
@@ -118,19 +148,48 @@ async def update_post(post_id: str, post_in: PostUpdate) -> Optional[PostDB]:
     else:
         update_fields["file_id"] = None
 
-    res = await posts_collection.update_one(
+    # Reference the new attachment first (UnknownFile if missing), so it
+    # cannot be collected while the post is being updated
+    if update_fields["file_id"]:
+        await acquire_file(update_fields["file_id"])
+
+    # Pre-image, so we know which attachment was replaced; a plain $set makes
+    # the post-image easy to rebuild locally.
+    before = await posts_collection.find_one_and_update(
         {"_id": ObjectId(post_id)},
         {"$set": update_fields}
     )
-    if res.matched_count == 0:
+    if not before:
+        await release_file(update_fields["file_id"])
         return None
 
-    return await get_post(post_id)
+    # The previous attachment loses this post's reference (when it is the
+    # same file, this gives back the one taken above)
+    await release_file(before.get("file_id"))
+    await bump_course_version(before["course_id"])
+
+    doc = {**before, **update_fields}
+    return PostDB(**doc)
 
 
 async def delete_post(post_id: str) -> bool:
-    res = await posts_collection.delete_one({"_id": ObjectId(post_id)})
-    return (res.deleted_count == 1)
+    """
+    Delete the post, then drop its completions, adjust progress counters
+    and release its attachment.
+    """
+    doc = await posts_collection.find_one_and_delete(
+        {"_id": ObjectId(post_id)},
+        projection={"course_id": 1, "file_id": 1}
+    )
+    if not doc:
+        return False
+
+    course_id = str(doc["course_id"])
+    await release_file(doc.get("file_id"))
+    await record_post(course_id, -1)
+    await forget_post_completions(course_id, post_id)
+    await bump_course_version(course_id)
+    return True
 
 
 async def pin_post(post_id: str) -> Optional[PostDB]:
@@ -138,152 +197,180 @@ async def pin_post(post_id: str) -> Optional[PostDB]:
     Pin this post: set ispinned=True, pinnedAt=now.
     """
     now = datetime.utcnow()
-    res = await posts_collection.update_one(
+    doc = await update_document(
+        posts_collection,
         {"_id": ObjectId(post_id)},
         {"$set": {"ispinned": True, "pinnedAt": now, "updated_at": now}}
     )
-    if res.matched_count == 0:
-        return None
-
-    doc = await posts_collection.find_one({"_id": ObjectId(post_id)})
     if not doc:
         return None
+    await bump_course_version(doc["course_id"])
 
-    doc["_id"]        = str(doc["_id"])
-    doc["course_id"]  = str(doc["course_id"])
-    doc["author_id"]  = str(doc["author_id"])
-    if doc.get("file_id"):
-        doc["file_id"] = str(doc["file_id"])
     return PostDB(**doc)
 
 
-async def unpin_post(post_id: str) -> Optional[PostDB]:
+async def unpin_post(post_id: str, course_id: str) -> Optional[PostDB]:
     """
-    Unpin and assign a new position at the bottom of unpinned posts.
+    Unpin and assign a new position at the bottom of the course's unpinned posts.
     """
-    pipeline = [
-        {"$match": {"ispinned": False}},
-        {"$group": {"_id": None, "maxPos": {"$max": "$position"}}}
-    ]
-    agg = await posts_collection.aggregate(pipeline).to_list(length=1)
-    max_pos = agg[0]["maxPos"] if agg and agg[0].get("maxPos") is not None else 0
-
-    now = datetime.utcnow()
-    res = await posts_collection.update_one(
-        {"_id": ObjectId(post_id)},
-        {"$set": {
-            "ispinned":   False,
-            "pinnedAt":   None,
-            "position":   max_pos + 1,
-            "updated_at": now
-        }}
-    )
-    if res.matched_count == 0:
-        return None
+    course_oid = ObjectId(course_id)
+    for _ in range(_REORDER_ATTEMPTS):
+        now = datetime.utcnow()
+        try:
+            doc = await update_document(
+                posts_collection,
+                {"_id": ObjectId(post_id), "course_id": course_oid},
+                {"$set": {
+                    "ispinned":   False,
+                    "pinnedAt":   None,
+                    "position":   await _last_position(course_oid) + POSITION_GAP,
+                    "updated_at": now
+                }}
+            )
+        except DuplicateKeyError:
+            continue
+        if not doc:
+            return None
+        await bump_course_version(course_oid)
+        return PostDB(**doc)
+    raise ReorderConflict("Could not unpin the post, please retry")
 
-    doc = await posts_collection.find_one({"_id": ObjectId(post_id)})
-    if not doc:
-        return None
 
-    doc["_id"]        = str(doc["_id"])
-    doc["course_id"]  = str(doc["course_id"])
-    doc["author_id"]  = str(doc["author_id"])
-    if doc.get("file_id"):
-        doc["file_id"] = str(doc["file_id"])
-    return PostDB(**doc)
+async def _apply_order(course_oid: ObjectId, ids: List[ObjectId]) -> int:
+    """
+    Give `ids` the positions GAP, 2*GAP, … in one ordered bulk_write of two
+    passes: every post first goes to a temporary slot -1, -2, … (free, as
+    real positions are positive), then to its final slot, so no write
+    collides with a slot still held by a post that has not moved yet and
+    positions do not grow from one reorder to the next.
+    Each write is conditional on the post still being an unpinned post of
+    this course; returns how many final writes matched.
+    """
+    if not ids:
+        return 0
+    now = datetime.utcnow()
 
+    def write(_id: ObjectId, fields: dict) -> UpdateOne:
+        return UpdateOne({"_id": _id, "course_id": course_oid, "ispinned": False}, {"$set": fields})
 
-async def move_up(post_id: str) -> Optional[PostDB]:
+    ops = [write(_id, {"position": -(n + 1)}) for n, _id in enumerate(ids)]
+    ops += [
+        write(_id, {"position": (n + 1) * POSITION_GAP, "updated_at": now})
+        for n, _id in enumerate(ids)
+    ]
+    try:
+        res = await posts_collection.bulk_write(ops, ordered=True)
+    except BulkWriteError:
+        # A concurrent reorder took the same slots. The writes before the
+        # failing one stay applied: the order is only partially applied
+        # (posts still in their temporary slot sort first) until the
+        # caller retries or renumber_posts runs.
+        raise ReorderConflict("Posts were reordered concurrently, please retry")
+    finally:
+        await bump_course_version(course_oid)
+    # a post matches both of its writes or, if it changed meanwhile, neither
+    return res.matched_count // 2
+
+
+async def _unpinned(course_oid: ObjectId) -> List[dict]:
+    return await posts_collection.find(
+        {"course_id": course_oid, "ispinned": False},
+        {"position": 1}
+    ).sort([("position", 1), ("_id", 1)]).to_list(length=None)
+
+
+async def renumber_posts(course_id: str) -> int:
     """
-    Swap this unpinned post’s position with the post just above.
+    Re-space the unpinned posts of a course POSITION_GAP apart, keeping their
+    order (ties broken by _id). Used when a move finds no free slot left.
     """
-    doc = await posts_collection.find_one({"_id": ObjectId(post_id)})
-    if not doc or doc.get("ispinned", False):
-        return None
+    course_oid = ObjectId(course_id)
+    docs = await _unpinned(course_oid)
+    if not docs:
+        return 0
+    return await _apply_order(course_oid, [d["_id"] for d in docs])
 
-    current_pos = doc["position"]
-    if current_pos <= 1:
-        doc["_id"]        = str(doc["_id"])
-        doc["course_id"]  = str(doc["course_id"])
-        doc["author_id"]  = str(doc["author_id"])
-        if doc.get("file_id"):
-            doc["file_id"] = str(doc["file_id"])
-        return PostDB(**doc)
-
-    other_doc = await posts_collection.find_one({
-        "course_id": doc["course_id"],
-        "ispinned": False,
-        "position": current_pos - 1
-    })
-    if not other_doc:
-        doc["_id"]        = str(doc["_id"])
-        doc["course_id"]  = str(doc["course_id"])
-        doc["author_id"]  = str(doc["author_id"])
-        if doc.get("file_id"):
-            doc["file_id"] = str(doc["file_id"])
-        return PostDB(**doc)
 
-    now = datetime.utcnow()
-    await posts_collection.update_one(
-        {"_id": ObjectId(post_id)},
-        {"$set": {"position": current_pos - 1, "updated_at": now}}
-    )
-    await posts_collection.update_one(
-        {"_id": other_doc["_id"]},
-        {"$set": {"position": current_pos, "updated_at": now}}
-    )
+async def set_post_order(course_id: str, post_ids: List[str]) -> int:
+    """
+    Apply a full new order of the course's unpinned posts (first = top).
+    `post_ids` must list every unpinned post exactly once. Returns the
+    number of posts written.
+    """
+    course_oid = ObjectId(course_id)
+    if not all(ObjectId.is_valid(pid) for pid in post_ids):
+        raise InvalidOrder("Invalid post id")
+    ids = [ObjectId(pid) for pid in post_ids]
 
-    updated = await posts_collection.find_one({"_id": ObjectId(post_id)})
-    if not updated:
-        return None
+    docs = await _unpinned(course_oid)
+    if len(set(ids)) != len(ids) or set(ids) != {d["_id"] for d in docs}:
+        raise InvalidOrder("The order must list every unpinned post of the course exactly once")
 
-    updated["_id"]       = str(updated["_id"])
-    updated["course_id"] = str(updated["course_id"])
-    updated["author_id"] = str(updated["author_id"])
-    if updated.get("file_id"):
-        updated["file_id"] = str(updated["file_id"])
-    return PostDB(**updated)
+    written = await _apply_order(course_oid, ids)
+    if written != len(ids):
+        raise ReorderConflict("Posts changed while reordering, please retry")
+    return written
 
 
-async def move_down(post_id: str) -> Optional[PostDB]:
+async def _move(post_id: str, step: int) -> Optional[PostDB]:
     """
-    Swap this unpinned post’s position with the post just below.
+    Move an unpinned post one place up (step=-1) or down (step=1) by giving
+    it a position between its next two neighbours in that direction, so
+    only the moved post is written. The write is conditional on the post
+    still being where we read it; a lost race is retried.
     """
-    doc = await posts_collection.find_one({"_id": ObjectId(post_id)})
-    if not doc or doc.get("ispinned", False):
-        return None
+    oid = ObjectId(post_id)
+    for _ in range(_REORDER_ATTEMPTS):
+        doc = await posts_collection.find_one({"_id": oid})
+        if not doc or doc.get("ispinned", False):
+            return None
+
+        current_pos = doc["position"]
+        neighbours = await posts_collection.find(
+            {
+                "course_id": doc["course_id"],
+                "ispinned":  False,
+                "position":  {"$lt" if step < 0 else "$gt": current_pos}
+            },
+            {"position": 1}
+        ).sort("position", step).limit(2).to_list(length=2)
+        if not neighbours:
+            # already first / last
+            return PostDB(**doc)
+
+        near = neighbours[0]["position"]
+        if len(neighbours) > 1:
+            far = neighbours[1]["position"]
+        else:
+            far = 0 if step < 0 else near + 2 * POSITION_GAP
+        if abs(near - far) < 2:
+            # no free slot between them: re-space the course and try again
+            await renumber_posts(str(doc["course_id"]))
+            continue
+
+        try:
+            moved = await update_document(
+                posts_collection,
+                {"_id": oid, "ispinned": False, "position": current_pos},
+                {"$set": {"position": (near + far) // 2, "updated_at": datetime.utcnow()}}
+            )
+        except DuplicateKeyError:
+            continue
+        if moved:
+            await bump_course_version(moved["course_id"])
+            return PostDB(**moved)
+    raise ReorderConflict("Posts were reordered concurrently, please retry")
 
-    current_pos = doc["position"]
-    other_doc = await posts_collection.find_one({
-        "course_id": doc["course_id"],
-        "ispinned": False,
-        "position": current_pos + 1
-    })
-    if not other_doc:
-        doc["_id"]        = str(doc["_id"])
-        doc["course_id"]  = str(doc["course_id"])
-        doc["author_id"]  = str(doc["author_id"])
-        if doc.get("file_id"):
-            doc["file_id"] = str(doc["file_id"])
-        return PostDB(**doc)
 
-    now = datetime.utcnow()
-    await posts_collection.update_one(
-        {"_id": ObjectId(post_id)},
-        {"$set": {"position": current_pos + 1, "updated_at": now}}
-    )
-    await posts_collection.update_one(
-        {"_id": other_doc["_id"]},
-        {"$set": {"position": current_pos, "updated_at": now}}
-    )
+async def move_up(post_id: str) -> Optional[PostDB]:
+    """
+    Move this unpinned post above the post just above it.
+    """
+    return await _move(post_id, -1)
 
-    updated = await posts_collection.find_one({"_id": ObjectId(post_id)})
-    if not updated:
-        return None
 
-    updated["_id"]       = str(updated["_id"])
-    updated["course_id"] = str(updated["course_id"])
-    updated["author_id"] = str(updated["author_id"])
-    if updated.get("file_id"):
-        updated["file_id"] = str(updated["file_id"])
-    return PostDB(**updated)
+async def move_down(post_id: str) -> Optional[PostDB]:
+    """
+    Move this unpinned post below the post just below it.
+    """
+    return await _move(post_id, 1)
@@ -0,0 +1,179 @@
+# app/crud/progress.py
+from datetime import datetime
+from bson import ObjectId
+from typing import Dict, List
+from pymongo import UpdateOne
+
+from app.db.mongodb import (
+    courses_collection,
+    course_progress_collection,
+    completions_collection,
+    posts_collection
+)
+from app.schemas.progress import CourseProgress
+
+# Materialized counters, one document per (user_id, course_id):
+#   { user_id, course_id, completed, updated_at }
+# A document only exists once the user has completed something in the course;
+# a missing document therefore means 0 completed.
+#
+# The post total lives once per course, as `post_count` on the course document:
+# it starts at 0 in create_course and record_post $inc's it, so it never has
+# to be seeded from a count that a concurrent post could invalidate. Counters
+# written before `post_count` existed still carry a `total_posts`, used as a
+# fallback until the course has its own count.
+
+
+def _percent(completed: int, total: int) -> int:
+    if total <= 0:
+        return 0
+    return min(100, int((completed / total) * 100))
+
+
+async def record_completion(user_id: str, course_id: str, delta: int) -> None:
+    """Add `delta` (+1 / -1) to the user's completed count for the course."""
+    await course_progress_collection.update_one(
+        {"user_id": ObjectId(user_id), "course_id": ObjectId(course_id)},
+        {"$inc": {"completed": delta}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+async def record_post(course_id: str, delta: int) -> None:
+    """A post was added (+1) or removed (-1): adjust the course's post count."""
+    oid = ObjectId(course_id)
+    res = await courses_collection.update_one(
+        {"_id": oid, "post_count": {"$exists": True}},
+        {"$inc": {"post_count": delta}}
+    )
+    if res.matched_count:
+        return
+    # Course created before `post_count` existed: seed it once from the posts
+    # (this post is already inserted / deleted). Only the first seeder wins;
+    # rebuild_progress sets every course's count anyway.
+    total = await posts_collection.count_documents({"course_id": oid})
+    await courses_collection.update_one(
+        {"_id": oid, "post_count": {"$exists": False}},
+        {"$set": {"post_count": total}}
+    )
+
+
+async def post_counts(course_oids: List[ObjectId]) -> Dict[str, int]:
+    """`post_count` of the given courses; courses without one are left out."""
+    cursor = courses_collection.find(
+        {"_id": {"$in": course_oids}, "post_count": {"$exists": True}},
+        {"post_count": 1}
+    )
+    return {str(doc["_id"]): doc["post_count"] async for doc in cursor}
+
+
+async def forget_post_completions(course_id: str, post_id: str) -> None:
+    """Drop the completions of a deleted post and decrement the matching counters."""
+    user_ids = await completions_collection.distinct(
+        "user_id", {"post_id": ObjectId(post_id)}
+    )
+    if not user_ids:
+        return
+    await completions_collection.delete_many({"post_id": ObjectId(post_id)})
+    await course_progress_collection.update_many(
+        {"course_id": ObjectId(course_id), "user_id": {"$in": user_ids}},
+        {"$inc": {"completed": -1}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+
+
+async def list_progress(user_id: str, course_ids: List[str]) -> List[CourseProgress]:
+    """
+    Read the counters for the given courses in one query.
+    Courses without a counter document are reported with 0 completed.
+    """
+    oids = [ObjectId(cid) for cid in course_ids if ObjectId.is_valid(cid)]
+    found: Dict[str, dict] = {}
+    cursor = course_progress_collection.find(
+        {"user_id": ObjectId(user_id), "course_id": {"$in": oids}}
+    )
+    async for doc in cursor:
+        found[str(doc["course_id"])] = doc
+    totals = await post_counts(oids)
+
+    out: List[CourseProgress] = []
+    for cid in course_ids:
+        doc = found.get(cid, {})
+        completed = doc.get("completed", 0)
+        total     = totals.get(cid, doc.get("total_posts", 0))
+        out.append(CourseProgress(
+            user_id=user_id,
+            course_id=cid,
+            completed=completed,
+            total_posts=total,
+            progress=_percent(completed, total),
+            updated_at=doc.get("updated_at")
+        ))
+    return out
+
+
+async def rebuild_progress(batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Recompute every counter from `completions` and `post`, streaming the
+    grouped completions and writing them back in unordered bulk batches.
+    Counters that no longer have completions are reset to 0, and every
+    course gets its `post_count`.
+    """
+    run_at = datetime.utcnow()
+
+    # 1) Post totals per course (one row per course)
+    totals: Dict[ObjectId, int] = {}
+    async for row in posts_collection.aggregate([
+        {"$group": {"_id": "$course_id", "n": {"$sum": 1}}}
+    ]):
+        totals[row["_id"]] = row["n"]
+
+    # 2) Completed counts per (user, course), streamed
+    cursor = completions_collection.aggregate(
+        [{"$group": {
+            "_id": {"user_id": "$user_id", "course_id": "$course_id"},
+            "n":   {"$sum": 1}
+        }}],
+        allowDiskUse=True,
+        batchSize=batch_size
+    )
+    ops: List[UpdateOne] = []
+    upserted = 0
+    async for row in cursor:
+        key = row["_id"]
+        ops.append(UpdateOne(
+            {"user_id": key["user_id"], "course_id": key["course_id"]},
+            {"$set": {"completed": row["n"], "updated_at": run_at},
+             "$unset": {"total_posts": ""}},
+            upsert=True
+        ))
+        if len(ops) >= batch_size:
+            await course_progress_collection.bulk_write(ops, ordered=False)
+            upserted += len(ops)
+            ops = []
+    if ops:
+        await course_progress_collection.bulk_write(ops, ordered=False)
+        upserted += len(ops)
+
+    # 3) Anything not touched above has no completions left
+    stale = await course_progress_collection.update_many(
+        {"updated_at": {"$lt": run_at}},
+        {"$set": {"completed": 0, "updated_at": run_at}}
+    )
+    await course_progress_collection.update_many(
+        {"total_posts": {"$exists": True}},
+        {"$unset": {"total_posts": ""}}
+    )
+
+    # 4) Post totals onto the courses themselves
+    course_ops = [
+        UpdateOne({"_id": course_oid, "post_count": {"$ne": n}}, {"$set": {"post_count": n}})
+        for course_oid, n in totals.items()
+    ]
+    for start in range(0, len(course_ops), batch_size):
+        await courses_collection.bulk_write(course_ops[start:start + batch_size], ordered=False)
+    await courses_collection.update_many(
+        {"_id": {"$nin": list(totals)}, "post_count": {"$ne": 0}},
+        {"$set": {"post_count": 0}}
+    )
+
+    return {"counters": upserted, "reset": stale.modified_count}
@@ -1,16 +1,27 @@
 # app/crud/submission.py
 
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from datetime import datetime
 from bson import ObjectId
-
-from app.db.mongodb import submissions_collection, users_collection, posts_collection, fs
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.db.mongodb import (
+    submissions_collection,
+    users_collection,
+    posts_collection,
+    fs_files_collection
+)
+from app.db.persistence import insert_document
 from app.schemas.submission import (
     SubmissionCreate,
     SubmissionDB,
     SubmissionGrade,
-    SubmissionOut
+    SubmissionGradeItem,
+    SubmissionOut,
+    BulkGradeResult
 )
+from app.services.gridfs_dedup import release_file
 
 async def create_submission(
     course_id: str,
@@ -50,18 +61,73 @@ async def create_submission(
         "created_at": now,
         "updated_at": now
     }
-    res = await submissions_collection.insert_one(doc)
-    created = await submissions_collection.find_one({"_id": res.inserted_id})
-
-    # 3) Convert ObjectId → str so Pydantic can parse
-    created["_id"]        = str(created["_id"])
-    created["course_id"]  = str(created["course_id"])
-    created["post_id"]    = str(created["post_id"])
-    created["student_id"] = str(created["student_id"])
-    created["file_id"]    = str(created["file_id"])
+    created = await insert_document(submissions_collection, doc)
     return SubmissionDB(**created)
 
 
+def _enrichment_stages() -> List[dict]:
+    """
+    Join each submission with its student's name (from `profile`) and its
+    GridFS file's name / size / type, server-side, in the same query.
+    """
+    return [
+        {"$lookup": {
+            "from":         users_collection.name,
+            "localField":   "student_id",
+            "foreignField": "_id",
+            "pipeline":     [{"$project": {
+                "_id":        0,
+                "first_name": "$profile.firstName",
+                "last_name":  "$profile.lastName"
+            }}],
+            "as": "_student"
+        }},
+        {"$lookup": {
+            "from":         fs_files_collection.name,
+            "localField":   "file_id",
+            "foreignField": "_id",
+            "pipeline":     [{"$project": {
+                "_id":          0,
+                "filename":     1,
+                "length":       1,
+                "content_type": {"$ifNull": ["$metadata.contentType", "$metadata.content_type"]}
+            }}],
+            "as": "_file"
+        }},
+        {"$set": {
+            "first_name":        {"$first": "$_student.first_name"},
+            "last_name":         {"$first": "$_student.last_name"},
+            # newer submissions store their own file_name (uploads are deduplicated)
+            "file_name":         {"$ifNull": ["$file_name", {"$first": "$_file.filename"}]},
+            "file_size":         {"$first": "$_file.length"},
+            "file_content_type": {"$first": "$_file.content_type"}
+        }},
+        {"$unset": ["_student", "_file"]}
+    ]
+
+
+async def iter_submissions(
+    match: dict,
+    sort: Optional[dict] = None
+) -> AsyncIterator[SubmissionOut]:
+    """Stream enriched submissions one at a time (nothing held in memory)."""
+    pipeline = [{"$match": match}]
+    if sort:
+        pipeline.append({"$sort": sort})
+    async for doc in submissions_collection.aggregate(pipeline + _enrichment_stages()):
+        yield SubmissionOut(**doc)
+
+
+async def enrich_submissions(match: dict) -> List[SubmissionOut]:
+    """SubmissionOut for every submission matching `match`, in one round trip."""
+    return [sub async for sub in iter_submissions(match)]
+
+
+async def get_submission_out(submission_id: str) -> Optional[SubmissionOut]:
+    found = await enrich_submissions({"_id": ObjectId(submission_id)})
+    return found[0] if found else None
+
+
 async def list_submissions(
     course_id: str,
     post_id:   str
@@ -70,45 +136,10 @@ async def list_submissions(
     Returns all submissions for a given course_id/post_id.
     Each SubmissionOut includes first_name, last_name, file_name, status, grade, comment, etc.
     """
-    cursor = submissions_collection.find({
+    return await enrich_submissions({
         "course_id": ObjectId(course_id),
         "post_id":   ObjectId(post_id)
     })
-    out: List[SubmissionOut] = []
-
-    async for doc in cursor:
-        # 1) Convert the common ObjectId fields → str
-        doc["_id"]        = str(doc["_id"])
-        doc["course_id"]  = str(doc["course_id"])
-        doc["post_id"]    = str(doc["post_id"])
-        doc["student_id"] = str(doc["student_id"])
-        doc["file_id"]    = str(doc["file_id"])
-
-        # 2) Lookup the student's name
-        try:
-            user_obj = await users_collection.find_one({"_id": ObjectId(doc["student_id"])})
-        except:
-            user_obj = None
-
-        if user_obj:
-            doc["first_name"] = user_obj.get("first_name")
-            doc["last_name"]  = user_obj.get("last_name")
-        else:
-            doc["first_name"] = None
-            doc["last_name"]  = None
-
-        # 3) Lookup the file's original filename in GridFS
-        if doc.get("file_id"):
-            try:
-                grid_out = await fs.open_download_stream(ObjectId(doc["file_id"]))
-                doc["file_name"] = grid_out.filename
-            except Exception:
-                doc["file_name"] = None
-        else:
-            doc["file_name"] = None
-
-        out.append(SubmissionOut(**doc))
-    return out
 
 
 async def grade_submission(
@@ -134,44 +165,77 @@ async def grade_submission(
     )
     if res.matched_count == 0:
         return None
+    return await get_submission_out(submission_id)
 
-    doc = await submissions_collection.find_one({"_id": ObjectId(submission_id)})
-    if not doc:
-        return None
-
-    # Convert ObjectId → str
-    doc["_id"]        = str(doc["_id"])
-    doc["course_id"]  = str(doc["course_id"])
-    doc["post_id"]    = str(doc["post_id"])
-    doc["student_id"] = str(doc["student_id"])
-    doc["file_id"]    = str(doc["file_id"])
-
-    # Re‐lookup user name
-    try:
-        user_obj = await users_collection.find_one({"_id": ObjectId(doc["student_id"])})
-    except:
-        user_obj = None
-
-    if user_obj:
-        doc["first_name"] = user_obj.get("first_name")
-        doc["last_name"]  = user_obj.get("last_name")
-    else:
-        doc["first_name"] = None
-        doc["last_name"]  = None
 
-    # Re‐lookup GridFS filename
-    if doc.get("file_id"):
-        try:
-            grid_out = await fs.open_download_stream(ObjectId(doc["file_id"]))
-            doc["file_name"] = grid_out.filename
-        except Exception:
-            doc["file_name"] = None
-    else:
-        doc["file_name"] = None
+async def delete_submission(submission_id: str) -> bool:
+    doc = await submissions_collection.find_one_and_delete(
+        { "_id": ObjectId(submission_id) },
+        projection={"file_id": 1}
+    )
+    if not doc:
+        return False
+    await release_file(doc.get("file_id"))
+    return True
 
-    return SubmissionOut(**doc)
 
+async def bulk_grade_submissions(
+    course_id: str,
+    post_id:   str,
+    items:     List[SubmissionGradeItem]
+) -> List[BulkGradeResult]:
+    """
+    Grade many submissions of one post: one query to find which ids exist
+    under this course/post, one unordered bulk_write for all of them.
+    Returns one result per item, in input order.
+    """
+    results: List[Optional[BulkGradeResult]] = [None] * len(items)
+    oids: dict = {}
+    for i, item in enumerate(items):
+        if ObjectId.is_valid(item.submission_id):
+            oids[i] = ObjectId(item.submission_id)
+        else:
+            results[i] = BulkGradeResult(
+                submission_id=item.submission_id, status="invalid", error="Invalid submission id"
+            )
+
+    scope = {"course_id": ObjectId(course_id), "post_id": ObjectId(post_id)}
+    existing = set()
+    if oids:
+        cursor = submissions_collection.find(
+            {**scope, "_id": {"$in": list(set(oids.values()))}}, {"_id": 1}
+        )
+        existing = {doc["_id"] async for doc in cursor}
 
-async def delete_submission(submission_id: str) -> bool:
-    res = await submissions_collection.delete_one({ "_id": ObjectId(submission_id) })
-    return (res.deleted_count == 1)
+    now = datetime.utcnow()
+    ops, op_items = [], []
+    for i, oid in oids.items():
+        if oid not in existing:
+            results[i] = BulkGradeResult(submission_id=items[i].submission_id, status="not_found")
+            continue
+        ops.append(UpdateOne(
+            {**scope, "_id": oid},
+            {"$set": {
+                "grade":      items[i].grade,
+                "comment":    items[i].comment,
+                "status":     "graded",
+                "updated_at": now
+            }}
+        ))
+        op_items.append(i)
+
+    failed_ops: dict = {}
+    if ops:
+        try:
+            await submissions_collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            failed_ops = {err["index"]: err.get("errmsg") for err in e.details.get("writeErrors", [])}
+
+    for n, i in enumerate(op_items):
+        if n in failed_ops:
+            results[i] = BulkGradeResult(
+                submission_id=items[i].submission_id, status="error", error=failed_ops[n]
+            )
+        else:
+            results[i] = BulkGradeResult(submission_id=items[i].submission_id, status="graded")
+    return results
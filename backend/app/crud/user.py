@@ -1,32 +1,56 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from collections import defaultdict
 from datetime import datetime
 from bson import ObjectId
-
-from app.db.mongodb import users_collection
+from pymongo.errors import DuplicateKeyError
+
+from app.db.mongodb import users_collection, enrollments_collection, analytics_reads
+from app.db.pagination import paginate
+from app.db.persistence import insert_document, update_document
+from app.services.user_cache import user_cache
+from app.services.password_pool import password_pool
+from app.services.access_tracker import access_tracker, RECENT_ACCESSES
 from app.schemas.user import UserDB, Profile, Enrollment, Access
 from app.schemas.user import UserOut, EnrollmentUser
 
-async def _normalize_user_doc(doc: dict) -> UserDB:
-    """Convert ObjectId fields to str and return a UserDB."""
-    doc["_id"] = str(doc["_id"])
+# Enrollments live in their own collection, one document per
+# (user_id, course_id) with its enrolled_at; UserDB.enrollments is attached
+# when a user is loaded.
+_ENROLLMENT_FIELDS = {"_id": 0, "courseId": "$course_id", "enrolledAt": "$enrolled_at"}
 
-    # If roles were stored as plain strings, str(r) will just keep them unchanged.
-    doc["roles"] = [str(r) for r in doc.get("roles", [])]
 
-    # Normalize enrollments
-    doc["enrollments"] = [
-        {"courseId": str(e["courseId"]), "enrolledAt": e["enrolledAt"]}
-        for e in doc.get("enrollments", [])
-    ]
+def _enrollments_lookup() -> dict:
+    """$lookup filling `enrollments` (oldest first) on user documents."""
+    return {"$lookup": {
+        "from":         enrollments_collection.name,
+        "localField":   "_id",
+        "foreignField": "user_id",
+        "pipeline":     [{"$sort": {"enrolled_at": 1}}, {"$project": _ENROLLMENT_FIELDS}],
+        "as":           "enrollments"
+    }}
 
-    # Normalize accesses
-    doc["accesses"] = [
-        {"courseId": str(a["courseId"]), "accessedAt": a["accessedAt"]}
-        for a in doc.get("accesses", [])
-    ]
 
+async def _normalize_user_doc(doc: dict) -> UserDB:
+    """
+    Build a UserDB from a raw document; the ObjectIdStr fields (id,
+    enrollments / accesses courseId) take the ObjectIds as they are.
+    Enrollments are read from their collection unless `doc` already carries
+    them (from _enrollments_lookup()).
+    """
+    if "enrollments" not in doc:
+        doc["enrollments"] = await list_enrollments(doc["_id"])
     return UserDB(**doc)
 
+
+async def _find_user(query: dict) -> Optional[dict]:
+    """One user document with its enrollments, in a single round trip."""
+    docs = await users_collection.aggregate([
+        {"$match": query},
+        {"$limit": 1},
+        _enrollments_lookup()
+    ]).to_list(length=1)
+    return docs[0] if docs else None
+
 async def create_user(
     email: str,
     raw_password: str,
@@ -37,38 +61,48 @@ async def create_user(
     if await users_collection.find_one({"email": email}):
         return None
 
-    from app.services.auth import hash_password
-
     now = datetime.utcnow()
     username = f"{profile.firstName[0].lower()}{profile.lastName.lower()}"
 
     user_doc = {
         "email":        email,
         "username":     username,
-        "passwordHash": hash_password(raw_password),
+        "passwordHash": await password_pool.hash(raw_password),
         "profile":      profile.model_dump(),
         "roles":        roles or [],
-        "enrollments":  [],
         "accesses":     [],
         "createdAt":    now,
         "updatedAt":    now
     }
 
-    res = await users_collection.insert_one(user_doc)
-    doc = await users_collection.find_one({"_id": res.inserted_id})
-    return await _normalize_user_doc(doc)
+    try:
+        doc = await insert_document(users_collection, user_doc)
+    except DuplicateKeyError:
+        # a concurrent signup took the email after the check (email_unique)
+        return None
+    # a new user has no enrollments yet
+    return UserDB(**doc, enrollments=[])
 
 async def authenticate_user(email: str, password: str) -> Optional[UserDB]:
     """Verify credentials; return normalized UserDB or None."""
-    doc = await users_collection.find_one({"email": email})
+    doc = await _find_user({"email": email})
     if not doc:
         return None
 
-    from app.services.auth import verify_password
-
-    if not verify_password(password, doc.get("passwordHash", "")):
+    ok, new_hash = await password_pool.verify(password, doc.get("passwordHash", ""))
+    if not ok:
         return None
 
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made: upgrade it in place
+        # (conditional on the old hash so a concurrent password change wins)
+        await users_collection.update_one(
+            {"_id": doc["_id"], "passwordHash": doc["passwordHash"]},
+            {"$set": {"passwordHash": new_hash}}
+        )
+        doc["passwordHash"] = new_hash
+        user_cache.invalidate(str(doc["_id"]))
+
     return await _normalize_user_doc(doc)
 
 async def get_user_by_id(user_id: str) -> Optional[UserDB]:
@@ -78,76 +112,104 @@ async def get_user_by_id(user_id: str) -> Optional[UserDB]:
     except Exception:
         return None
 
-    doc = await users_collection.find_one({"_id": oid})
+    doc = await _find_user({"_id": oid})
     if not doc:
         return None
     return await _normalize_user_doc(doc)
 
-async def list_users() -> List[UserDB]:
-    """Return all users, normalized and sorted by creation time desc."""
-    out: List[UserDB] = []
-    cursor = users_collection.find().sort("createdAt", -1)
-    async for doc in cursor:
-        out.append(await _normalize_user_doc(doc))
-    return out
+USERS_SORT = [("createdAt", -1), ("_id", -1)]
+
+async def list_users(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[UserOut], Optional[str]]:
+    """
+    Return users (one page with `limit`) sorted by creation time desc.
+    Password hashes are never read. Admin listing: may be served by a secondary.
+    The page's enrollments come from one extra query.
+    """
+    docs, next_cursor = await paginate(
+        analytics_reads(users_collection), {}, USERS_SORT, limit, cursor,
+        projection={"passwordHash": 0, "enrollments": 0}
+    )
+    by_user = defaultdict(list)
+    if docs:
+        cursor_ = analytics_reads(enrollments_collection).find(
+            {"user_id": {"$in": [d["_id"] for d in docs]}}
+        ).sort("enrolled_at", 1)
+        async for e in cursor_:
+            by_user[e["user_id"]].append({"courseId": e["course_id"], "enrolledAt": e["enrolled_at"]})
+    return [UserOut(**doc, enrollments=by_user[doc["_id"]]) for doc in docs], next_cursor
 
 async def update_user(user_id: str, profile: Profile) -> Optional[UserDB]:
     """Update only the profile & updatedAt, then return fresh UserDB."""
     now = datetime.utcnow()
-    res = await users_collection.update_one(
+    doc = await update_document(
+        users_collection,
         {"_id": ObjectId(user_id)},
-        {"$set": {"profile": profile.model_dump(), "updatedAt": now}}
+        {"$set": {"profile": profile.model_dump(), "updatedAt": now}},
+        projection={"enrollments": 0}
     )
-    if res.matched_count == 0:
+    user_cache.invalidate(user_id)
+    if not doc:
         return None
-    return await get_user_by_id(user_id)
+    return await _normalize_user_doc(doc)
 
 async def list_enrollments(user_id: str) -> List[Enrollment]:
-    """List a user’s enrollments."""
-    doc = await users_collection.find_one(
-        {"_id": ObjectId(user_id)},
-        {"enrollments": 1}
-    )
-    if not doc:
-        return []
-    return [
-        Enrollment(courseId=str(e["courseId"]), enrolledAt=e["enrolledAt"])
-        for e in doc.get("enrollments", [])
-    ]
+    """List a user’s enrollments, oldest first."""
+    cursor = enrollments_collection.find(
+        {"user_id": ObjectId(user_id)},
+        _ENROLLMENT_FIELDS
+    ).sort("enrolled_at", 1)
+    return [Enrollment(**e) async for e in cursor]
 
 async def add_enrollment(user_id: str, course_id: str) -> Enrollment:
-    """Enroll a user in a course."""
-    now = datetime.utcnow()
-    entry = {"courseId": ObjectId(course_id), "enrolledAt": now}
-    await users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$push": {"enrollments": entry}}
-    )
-    return Enrollment(courseId=course_id, enrolledAt=now)
+    """Enroll a user in a course (enrolling twice keeps the first date)."""
+    key = {"user_id": ObjectId(user_id), "course_id": ObjectId(course_id)}
+    try:
+        doc = await update_document(
+            enrollments_collection,
+            key,
+            {"$setOnInsert": {"enrolled_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # a concurrent request enrolled the same pair first
+        doc = await enrollments_collection.find_one(key)
+    user_cache.invalidate(user_id)
+    return Enrollment(courseId=course_id, enrolledAt=doc["enrolled_at"])
 
 async def remove_enrollment(user_id: str, course_id: str) -> bool:
     """Remove a course from a user’s enrollments."""
-    res = await users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$pull": {"enrollments": {"courseId": ObjectId(course_id)}}}
+    res = await enrollments_collection.delete_one(
+        {"user_id": ObjectId(user_id), "course_id": ObjectId(course_id)}
     )
-    return res.modified_count > 0
+    user_cache.invalidate(user_id)
+    return res.deleted_count > 0
 
 async def list_users_by_course(course_id: str) -> List[EnrollmentUser]:
-    """Find all users in a course, return slim user info."""
-    oid = ObjectId(course_id)
-    cursor = users_collection.find(
-        {"enrollments.courseId": oid},
-        {"_id": 1, "email": 1, "profile.firstName": 1, "profile.lastName": 1}
-    )
-    out: List[EnrollmentUser] = []
-    async for raw in cursor:
-        raw["_id"] = str(raw["_id"])
-        prof = raw.pop("profile", {}) or {}
-        raw["first_name"] = prof.get("firstName", "")
-        raw["last_name"] = prof.get("lastName", "")
-        out.append(EnrollmentUser(**raw))
-    return out
+    """
+    Find all users in a course (in enrollment order), return slim user info.
+    Walks the (course_id, enrolled_at) index and joins each user by _id.
+    """
+    pipeline = [
+        {"$match": {"course_id": ObjectId(course_id)}},
+        {"$sort": {"enrolled_at": 1}},
+        {"$lookup": {
+            "from":         users_collection.name,
+            "localField":   "user_id",
+            "foreignField": "_id",
+            "pipeline":     [{"$project": {
+                "email":      1,
+                "first_name": {"$ifNull": ["$profile.firstName", ""]},
+                "last_name":  {"$ifNull": ["$profile.lastName", ""]}
+            }}],
+            "as":           "user"
+        }},
+        {"$unwind": "$user"},
+        {"$replaceWith": "$user"}
+    ]
+    return [EnrollmentUser(**raw) async for raw in enrollments_collection.aggregate(pipeline)]
 
 async def delete_user(user_id: str) -> bool:
     """Remove a user document entirely."""
@@ -156,6 +218,9 @@ async def delete_user(user_id: str) -> bool:
     except Exception:
         return False
     res = await users_collection.delete_one({"_id": oid})
+    if res.deleted_count == 1:
+        await enrollments_collection.delete_many({"user_id": oid})
+    user_cache.invalidate(user_id)
     return res.deleted_count == 1
 
 async def change_user_password(
@@ -171,51 +236,45 @@ async def change_user_password(
     if not doc:
         return False
 
-    from app.services.auth import verify_password, hash_password
-    if not verify_password(old_password, doc.get("passwordHash", "")):
+    ok, _ = await password_pool.verify(old_password, doc.get("passwordHash", ""))
+    if not ok:
         return False
 
-    new_hash = hash_password(new_password)
+    new_hash = await password_pool.hash(new_password)
     res = await users_collection.update_one(
         {"_id": oid},
         {"$set": {"passwordHash": new_hash, "updatedAt": datetime.utcnow()}}
     )
+    user_cache.invalidate(user_id)
     return res.modified_count == 1
 
 
 async def upsert_access(user_id: str, course_id: str) -> None:
     """
-    Record that `user_id` viewed `course_id` right now.
-    If an access entry already exists, update its timestamp; otherwise insert it.
+    Record that `user_id` viewed `course_id` right now. Views are coalesced
+    in memory and written in batches by the access tracker; the stored
+    `accesses` list keeps the RECENT_ACCESSES latest courses, newest first.
     """
-    now = datetime.utcnow()
-    oid = ObjectId(user_id)
-    coid = ObjectId(course_id)
-
-    # Try to update an existing entry
-    res = await users_collection.update_one(
-        {"_id": oid, "accesses.courseId": coid},
-        {"$set": {"accesses.$.accessedAt": now}}
-    )
-
-    if res.matched_count == 0:
-        # No existing entry → push a new one
-        await users_collection.update_one(
-            {"_id": oid},
-            {"$push": {"accesses": {"courseId": coid, "accessedAt": now}}}
-        )
+    await access_tracker.record(user_id, course_id)
 
 
 async def list_accesses(user_id: str, limit: int = 10) -> List[Access]:
     """
     Return up to `limit` Access objects, sorted by accessedAt descending.
+    The stored list is already in that order; views not flushed yet by
+    this worker are merged in.
     """
+    limit = min(limit, RECENT_ACCESSES)
     doc = await users_collection.find_one(
         {"_id": ObjectId(user_id)},
-        {"accesses": 1}
+        # expression form: returns only the slice (the plain {"$slice": n}
+        # projection would also return every other field of the user)
+        {"_id": 0, "accesses": {"$slice": [{"$ifNull": ["$accesses", []]}, limit]}}
     )
     raw = doc.get("accesses", []) if doc else []
-    # sort in-memory (or you could $slice + $sort in projection)
-    raw_sorted = sorted(raw, key=lambda a: a["accessedAt"], reverse=True)[:limit]
-    return [Access(courseId=str(a["courseId"]), accessedAt=a["accessedAt"])
-            for a in raw_sorted]
\ No newline at end of file
+    pending = access_tracker.pending_for(user_id)
+    if pending:
+        fresh = {a["courseId"] for a in pending}
+        raw = [a for a in raw if a["courseId"] not in fresh] + pending
+        raw = sorted(raw, key=lambda a: a["accessedAt"], reverse=True)[:limit]
+    return [Access(**a) for a in raw]
\ No newline at end of file
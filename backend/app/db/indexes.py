@@ -0,0 +1,262 @@
+# app/db/indexes.py
+#
+# Declarative index registry for the collections in app.db.mongodb.
+# ensure_indexes() is idempotent (create_indexes is a no-op for indexes that
+# already exist with the same spec), so it runs on every startup.
+# verify_query_plans() explains each query shape the CRUD layer issues and
+# reports the ones the planner would answer with a collection scan.
+# Collections that need creation options (the time-series activity log) are
+# created first by ensure_collections().
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+
+from app.db.mongodb import (
+    db,
+    users_collection,
+    courses_collection,
+    posts_collection,
+    submissions_collection,
+    activity_logs_collection,
+    activity_daily_collection,
+    forums_collection,
+    messages_collection,
+    completions_collection,
+    course_progress_collection,
+    enrollments_collection,
+    fs_files_collection
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+# Activity logs older than this are expired by the server (0 = keep forever)
+ACTIVITY_LOG_TTL_DAYS = int(os.getenv("ACTIVITY_LOG_TTL_DAYS", "180"))
+
+INDEXES: List[Tuple[Any, List[IndexModel]]] = [
+    (users_collection, [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("createdAt", DESCENDING), ("_id", DESCENDING)], name="created_id_desc"),
+    ]),
+    (courses_collection, [
+        IndexModel([("created_at", DESCENDING)], name="created_desc"),
+        IndexModel([("created_by", ASCENDING)], name="created_by"),
+    ]),
+    (posts_collection, [
+        IndexModel(
+            [("course_id", ASCENDING), ("ispinned", ASCENDING), ("position", ASCENDING)],
+            name="course_pinned_position"
+        ),
+        # no two unpinned posts of a course share a slot (see crud.post)
+        IndexModel(
+            [("course_id", ASCENDING), ("position", ASCENDING)],
+            name="course_position_unique",
+            unique=True,
+            partialFilterExpression={"ispinned": False}
+        ),
+        # feed order (list_posts)
+        IndexModel(
+            [("course_id", ASCENDING), ("ispinned", DESCENDING), ("pinnedAt", DESCENDING),
+             ("position", ASCENDING), ("_id", ASCENDING)],
+            name="course_feed"
+        ),
+    ]),
+    (submissions_collection, [
+        IndexModel([("course_id", ASCENDING), ("post_id", ASCENDING)], name="course_post"),
+    ]),
+    (activity_logs_collection, [
+        IndexModel([("meta.user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_timestamp"),
+        IndexModel([("meta.course_id", ASCENDING), ("timestamp", DESCENDING)], name="course_timestamp"),
+        IndexModel([("meta.action", ASCENDING), ("timestamp", DESCENDING)], name="action_timestamp"),
+    ]),
+    (activity_daily_collection, [
+        IndexModel([("day", ASCENDING), ("action", ASCENDING)], name="day_action"),
+        IndexModel([("course_id", ASCENDING), ("day", ASCENDING)], name="course_day"),
+    ]),
+    (forums_collection, [
+        IndexModel([("course_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="course_updated_id"),
+    ]),
+    (messages_collection, [
+        IndexModel([("thread_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="thread_created_id"),
+        # serve_forum_image: which message (and course) shows a file
+        IndexModel([("image_id", ASCENDING)], name="image", sparse=True),
+        IndexModel([("thumbnail_id", ASCENDING)], name="thumbnail", sparse=True),
+    ]),
+    (completions_collection, [
+        IndexModel(
+            [("user_id", ASCENDING), ("course_id", ASCENDING), ("post_id", ASCENDING)],
+            name="user_course_post_unique",
+            unique=True
+        ),
+        IndexModel([("post_id", ASCENDING)], name="post"),
+    ]),
+    (course_progress_collection, [
+        IndexModel([("user_id", ASCENDING), ("course_id", ASCENDING)], name="user_course_unique", unique=True),
+        IndexModel([("course_id", ASCENDING)], name="course"),
+    ]),
+    (enrollments_collection, [
+        IndexModel([("user_id", ASCENDING), ("course_id", ASCENDING)], name="user_course_unique", unique=True),
+        IndexModel([("course_id", ASCENDING), ("enrolled_at", ASCENDING)], name="course_enrolled"),
+    ]),
+    (fs_files_collection, [
+        IndexModel([("metadata.sha256", ASCENDING), ("length", ASCENDING)], name="sha256_length"),
+        IndexModel([("metadata.refs", ASCENDING), ("uploadDate", ASCENDING)], name="refs_uploaded"),
+    ]),
+]
+
+
+# What to run when a unique index is refused because of existing duplicates
+UNIQUE_FIX_HINTS: Dict[str, str] = {
+    "email_unique":           "merge or rename the duplicate accounts",
+    "course_position_unique": "run python -m app.scripts.renumber_posts",
+}
+
+# Indexes an earlier registry created whose keys have since changed. A spec
+# change always comes with a new name (re-creating a name with other keys
+# fails with IndexKeySpecsConflict); the old index is dropped once the new
+# one exists.
+RETIRED_INDEXES: List[Tuple[Any, str, str]] = [
+    # (collection, old name, replacement)
+    (users_collection,    "created_desc",   "created_id_desc"),
+    (forums_collection,   "course_updated", "course_updated_id"),
+    (messages_collection, "thread_created", "thread_created_id"),
+]
+
+
+def _query_shapes() -> List[Tuple[Any, dict, Optional[list]]]:
+    """
+    (collection, filter, sort) for every query shape the CRUD layer relies on.
+    Values only need the right BSON type; they are never matched against data.
+    """
+    oid = ObjectId()
+    return [
+        (users_collection,           {"email": "x@example.com"},                         None),
+        (courses_collection,         {"created_by": {"$in": ["x", oid]}},                None),
+        (posts_collection,           {"course_id": oid},                                 None),
+        (posts_collection,           {"course_id": oid, "ispinned": False, "position": 1}, None),
+        (posts_collection,           {"course_id": oid, "ispinned": False},              [("position", -1)]),
+        (submissions_collection,     {"course_id": oid, "post_id": oid},                 None),
+        (activity_logs_collection,   {"meta.user_id": oid},                              [("timestamp", -1)]),
+        (activity_logs_collection,   {"meta.course_id": oid, "timestamp": {"$gte": oid.generation_time}}, None),
+        (activity_logs_collection,   {"meta.action": "login"},                           [("timestamp", -1)]),
+        (activity_daily_collection,  {"day": {"$gte": oid.generation_time}},             [("day", 1), ("action", 1)]),
+        (activity_daily_collection,  {"course_id": oid, "day": {"$gte": oid.generation_time}}, [("day", 1), ("action", 1)]),
+        (forums_collection,          {"course_id": oid},                                 [("updated_at", -1), ("_id", -1)]),
+        (messages_collection,        {"thread_id": oid},                                 [("created_at", 1), ("_id", 1)]),
+        (messages_collection,        {"$or": [{"image_id": oid}, {"thumbnail_id": oid}]}, None),
+        (completions_collection,     {"user_id": oid, "course_id": oid},                 None),
+        (completions_collection,     {"user_id": oid, "course_id": oid, "post_id": oid}, None),
+        (completions_collection,     {"post_id": oid},                                   None),
+        (course_progress_collection, {"user_id": oid, "course_id": {"$in": [oid]}},      None),
+        (course_progress_collection, {"course_id": oid},                                 None),
+        (enrollments_collection,     {"user_id": oid},                                   None),
+        (enrollments_collection,     {"user_id": oid, "course_id": oid},                 None),
+        (enrollments_collection,     {"course_id": oid},                                 [("enrolled_at", 1)]),
+        (fs_files_collection,        {"metadata.sha256": "x", "length": 1},              None),
+    ]
+
+
+async def ensure_collections() -> None:
+    """
+    Create the time-series activity log collection, or bring its expiry in
+    line with ACTIVITY_LOG_TTL_DAYS when it already exists.
+    """
+    name = activity_logs_collection.name
+    ttl = ACTIVITY_LOG_TTL_DAYS * 86400 or None
+    try:
+        await db.create_collection(
+            name,
+            timeseries={"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"},
+            **({"expireAfterSeconds": ttl} if ttl else {})
+        )
+        logger.info(f"Created time-series collection {name}")
+    except CollectionInvalid:
+        try:
+            await db.command({"collMod": name, "expireAfterSeconds": ttl or "off"})
+        except PyMongoError as e:
+            logger.error(f"Could not set the expiry of {name}: {e}")
+    except PyMongoError as e:
+        logger.error(f"Could not create {name}: {e}")
+
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create every registered index; returns {collection: [index names]}."""
+    await ensure_collections()
+    created: Dict[str, List[str]] = {}
+    for coll, models in INDEXES:
+        # createIndexes is all-or-nothing: a unique index that existing data
+        # violates goes in its own call so it cannot block the others
+        plain = [m for m in models if not m.document.get("unique")]
+        batches = ([plain] if plain else []) + [[m] for m in models if m.document.get("unique")]
+        for batch in batches:
+            try:
+                created.setdefault(coll.name, []).extend(await coll.create_indexes(batch))
+            except PyMongoError as e:
+                names = [m.document["name"] for m in batch]
+                hint = "".join(f" ({UNIQUE_FIX_HINTS[n]})" for n in names if n in UNIQUE_FIX_HINTS)
+                logger.error(f"Could not create {coll.name} index(es) {', '.join(names)}: {e}{hint}")
+    await drop_retired_indexes(created)
+    return created
+
+
+async def drop_retired_indexes(created: Dict[str, List[str]]) -> None:
+    """Drop RETIRED_INDEXES whose replacement was just created."""
+    for coll, name, replacement in RETIRED_INDEXES:
+        if replacement not in created.get(coll.name, []):
+            continue    # replacement failed: keep serving from the old one
+        try:
+            await coll.drop_index(name)
+            logger.info(f"Dropped retired index {coll.name}.{name}")
+        except OperationFailure:
+            pass        # never created, or already dropped
+
+
+def _stages(plan: dict) -> List[str]:
+    """Flatten the stage names of an explain() winning plan."""
+    out = [plan.get("stage", "")]
+    if "inputStage" in plan:
+        out += _stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        out += _stages(child)
+    if "queryPlan" in plan:          # slot-based engine wraps the classic plan
+        out += _stages(plan["queryPlan"])
+    return out
+
+
+def _winning_plan(res: dict) -> Optional[dict]:
+    """
+    Winning plan of a find explain: at the top level for plain collections,
+    under the first `$cursor` stage when the server ran it as an aggregation
+    (time-series collections, which are views over their buckets).
+    """
+    if "queryPlanner" in res:
+        return res["queryPlanner"].get("winningPlan")
+    for stage in res.get("stages", []):
+        if "$cursor" in stage:
+            return stage["$cursor"].get("queryPlanner", {}).get("winningPlan")
+    return None
+
+
+async def verify_query_plans() -> List[str]:
+    """
+    Explain every registered query shape.
+    Returns a list of human-readable failures (empty when all are index-backed).
+    """
+    failures: List[str] = []
+    for coll, filt, sort in _query_shapes():
+        cmd: Dict[str, Any] = {"find": coll.name, "filter": filt}
+        if sort:
+            cmd["sort"] = dict(sort)
+        res = await db.command({"explain": cmd, "verbosity": "queryPlanner"})
+        plan = _winning_plan(res)
+        if plan is None:
+            failures.append(f"{coll.name} {filt} sort={sort}: no winning plan in explain output")
+            continue
+        stages = _stages(plan)
+        if "COLLSCAN" in stages:
+            failures.append(f"{coll.name} {filt} sort={sort}: COLLSCAN")
+    return failures
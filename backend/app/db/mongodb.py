@@ -1,20 +1,100 @@
+from importlib.util import find_spec
+from typing import List, Optional
+
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo.read_preferences import SecondaryPreferred
 from os import getenv
 
 # Connection URI (falls back to local if not set)
 MONGO_URI = getenv("MONGODB_URI", "mongodb://localhost:27017")
-client    = AsyncIOMotorClient(MONGO_URI)
 
-db = client.coursey
+
+def _ms(name: str, default: str) -> Optional[int]:
+    """Millisecond setting from the environment; 0 means no limit."""
+    value = int(getenv(name, default))
+    return value or None
+
+
+def _positive_ms(name: str, default: str) -> int:
+    """Millisecond setting that must be bounded (the driver has no "no limit")."""
+    value = int(getenv(name, default))
+    if value <= 0:
+        raise RuntimeError(f"{name} must be a positive number of milliseconds")
+    return value
+
+
+def _compressors() -> List[str]:
+    """
+    Wire compressors to offer, in order of preference, minus those whose
+    Python module is missing (zstd needs `zstandard`, snappy `python-snappy`).
+    """
+    wanted = [c.strip() for c in getenv("MONGODB_COMPRESSORS", "zstd,snappy,zlib").split(",") if c.strip()]
+    modules = {"zstd": "zstandard", "snappy": "snappy"}
+    return [c for c in wanted if c not in modules or find_spec(modules[c]) is not None]
+
+
+def _tag_sets(spec: str) -> List[dict]:
+    """'nodeType:ANALYTICS,region:eu;nodeType:ANALYTICS' -> tag sets, then any member."""
+    sets = []
+    for group in filter(None, (g.strip() for g in spec.split(";"))):
+        sets.append(dict(pair.split(":", 1) for pair in group.split(",")))
+    return sets + [{}] if sets else [{}]
+
+
+# Client tuning; every value can be overridden per deployment
+CLIENT_OPTIONS = {
+    "appname":                  getenv("MONGODB_APPNAME", "coursey"),
+    "maxPoolSize":              int(getenv("MONGODB_MAX_POOL_SIZE", "100")),
+    "minPoolSize":              int(getenv("MONGODB_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS":            _ms("MONGODB_MAX_IDLE_TIME_MS", "300000"),
+    "serverSelectionTimeoutMS": _positive_ms("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"),
+    "connectTimeoutMS":         _ms("MONGODB_CONNECT_TIMEOUT_MS", "5000"),
+    "socketTimeoutMS":          _ms("MONGODB_SOCKET_TIMEOUT_MS", "30000"),
+    "compressors":              _compressors(),
+}
+
+client    = AsyncIOMotorClient(MONGO_URI, **CLIENT_OPTIONS)
+
+db = client[getenv("MONGODB_DB", "coursey")]
+
+# Dashboards / admin listings read from secondaries (tagged ones first) when
+# the deployment has them, never more than MAX_STALENESS seconds behind the
+# primary (90 is the server minimum, -1 disables the bound). On a standalone
+# server or when no secondary qualifies, reads go to the primary.
+ANALYTICS_MAX_STALENESS = int(getenv("MONGODB_ANALYTICS_MAX_STALENESS", "120"))
+ANALYTICS_READ_PREFERENCE = SecondaryPreferred(
+    tag_sets=_tag_sets(getenv("MONGODB_ANALYTICS_TAGS", "")),
+    max_staleness=ANALYTICS_MAX_STALENESS
+)
+
+
+def analytics_reads(collection):
+    """The same collection, read with ANALYTICS_READ_PREFERENCE."""
+    return collection.with_options(read_preference=ANALYTICS_READ_PREFERENCE)
+
 
 users_collection         = db.get_collection("user")
-courses_collection       = db.get_collection("course")
+courses_collection       = db.get_collection("courses")
 posts_collection         = db.get_collection("post")
 submissions_collection   = db.get_collection("submissions")
-activity_logs_collection = db.get_collection("activity_logs")
+# Activity logs: time-series collection (timeField "timestamp", metaField
+# "meta" = user_id / action / course_id), created by app.db.indexes.
+# `activity_logs` is the plain collection they are migrated from.
+activity_logs_collection = db.get_collection("activity_events")
+legacy_activity_logs_collection = db.get_collection("activity_logs")
+# Daily activity summaries built from the logs by app.crud.analytics
+activity_daily_collection = db.get_collection("activity_daily")
+rollup_state_collection   = db.get_collection("rollup_state")
 forums_collection   = db.get_collection("forums")
 messages_collection = db.get_collection("messages")
 completions_collection = db.get_collection("completions")
+course_progress_collection = db.get_collection("course_progress")
+course_versions_collection = db.get_collection("course_versions")
+enrollments_collection   = db.get_collection("enrollments")
 
 # GridFS bucket for storing uploaded files
 fs = AsyncIOMotorGridFSBucket(db)
+fs_files_collection = db.get_collection("fs.files")
+
+# GridFS bucket for forum message images and their thumbnails
+forum_fs = AsyncIOMotorGridFSBucket(db, bucket_name="forum_images")
@@ -0,0 +1,86 @@
+# app/db/pagination.py
+#
+# Keyset (cursor) pagination. A sort is a list of (field, direction) ending
+# with `_id` as tie-breaker; a cursor is the last returned document's values
+# for those fields, BSON-encoded (so datetimes / ObjectIds / bools keep their
+# type) and base64url'd into an opaque string.
+# The next page is fetched with a range filter on the sort key, so page N
+# costs the same index walk as page 1 — no skip().
+
+import base64
+from typing import Any, List, Optional, Tuple
+
+import bson
+from bson.errors import BSONError
+
+Sort = List[Tuple[str, int]]
+
+# Response header carrying the cursor of the next page (list endpoints keep
+# returning a plain JSON array)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def _get(doc: dict, dotted: str) -> Any:
+    for part in dotted.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+def encode_cursor(doc: dict, sort: Sort) -> str:
+    raw = bson.encode({"k": [_get(doc, field) for field, _ in sort]})
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: Sort) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = bson.decode(base64.urlsafe_b64decode(padded))["k"]
+    except (ValueError, KeyError, TypeError, BSONError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def keyset_filter(sort: Sort, values: List[Any]) -> dict:
+    """
+    Documents strictly after `values` in `sort` order:
+      (k0 > v0) OR (k0 = v0 AND k1 > v1) OR …   ("<" for descending keys)
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        branch[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+async def paginate(
+    collection,
+    query: dict,
+    sort: Sort,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Return (documents, next_cursor). With limit=None every matching document
+    is returned (in order) and next_cursor is None.
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+
+    find = collection.find(query, projection).sort(sort)
+    if limit is None:
+        return await find.to_list(length=None), None
+
+    docs = await find.limit(limit + 1).to_list(length=limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1], sort)
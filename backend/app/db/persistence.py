@@ -0,0 +1,33 @@
+# app/db/persistence.py
+#
+# Write helpers that hand back the stored document without a second query:
+# inserts return the document we sent plus its new _id, updates go through
+# find_one_and_update(return_document=AFTER).
+
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+
+async def insert_document(collection, doc: dict) -> dict:
+    """Insert `doc` and return it with its `_id` set (no read-back)."""
+    res = await collection.insert_one(doc)
+    doc["_id"] = res.inserted_id
+    return doc
+
+
+async def update_document(
+    collection,
+    query: dict,
+    update: dict,
+    projection: Optional[dict] = None,
+    upsert: bool = False
+) -> Optional[dict]:
+    """Apply `update` to the first match and return it as it is now, or None."""
+    return await collection.find_one_and_update(
+        query,
+        update,
+        projection=projection,
+        upsert=upsert,
+        return_document=ReturnDocument.AFTER
+    )
@@ -1,17 +1,25 @@
 # /app/main.py
 
 import logging
+from os import getenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.db.mongodb import users_collection
+from app.db.indexes import ensure_indexes
+from app.db.pagination import NEXT_CURSOR_HEADER
 from app.schemas.user import Profile
 from app.crud.user import create_user
+from app.services.activity_writer import activity_writer
+from app.services.password_pool import password_pool
+from app.services.access_tracker import access_tracker
+from app.services.activity_rollup import activity_rollup
 
 from app.routers import auth, course, user, post, submission, files
 from app.routers.activity import router as activity_router
 from app.routers.forum import router as forum_router
 from app.routers.dashboard import router as dashboard_router
 from app.routers.completion import router as completion_router
+from app.routers.analytics import router as analytics_router
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -27,8 +35,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+@app.on_event("startup")
+async def create_indexes():
+    """
+    Apply the index registry (idempotent). Set ENSURE_INDEXES=0 to skip,
+    e.g. when indexes are managed with `python -m app.scripts.indexes`.
+    """
+    if getenv("ENSURE_INDEXES", "1") != "0":
+        await ensure_indexes()
+
 @app.on_event("startup")
 async def seed_admin_user():
     """
@@ -54,6 +72,44 @@ async def seed_admin_user():
         except Exception as e:
             logger.error(f"Failed to seed admin user: {e}")
 
+@app.on_event("startup")
+async def start_activity_writer():
+    await activity_writer.start()
+
+@app.on_event("shutdown")
+async def stop_activity_writer():
+    """
+    Flush any queued activity logs before the process exits.
+    """
+    await activity_writer.stop()
+
+@app.on_event("startup")
+async def start_access_tracker():
+    await access_tracker.start()
+
+@app.on_event("shutdown")
+async def stop_access_tracker():
+    """
+    Write the course accesses still coalesced in memory.
+    """
+    await access_tracker.stop()
+
+@app.on_event("startup")
+async def start_activity_rollup():
+    """
+    Summarize activity logs into `activity_daily` every
+    ACTIVITY_ROLLUP_INTERVAL seconds (0 = only via POST /analytics/rollup).
+    """
+    await activity_rollup.start()
+
+@app.on_event("shutdown")
+async def stop_activity_rollup():
+    await activity_rollup.stop()
+
+@app.on_event("shutdown")
+async def stop_password_pool():
+    password_pool.shutdown()
+
 # Include all routers
 app.include_router(auth.router)
 app.include_router(course.router)
@@ -65,3 +121,4 @@ app.include_router(activity_router)
 app.include_router(forum_router)
 app.include_router(dashboard_router)
 app.include_router(completion_router)
+app.include_router(analytics_router)
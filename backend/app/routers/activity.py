@@ -1,32 +1,61 @@
 # File: app/routers/activity.py
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from typing import List, Optional
+from datetime import datetime
 from app.schemas.activity import ActivityLogCreate, ActivityLogDB
 from app.crud.activity import create_activity_log, list_activity_logs
-from app.services.auth import get_current_active_user
-from app.schemas.user import UserDB
+from app.services.auth import get_current_principal, Principal
+from app.services.activity_writer import activity_writer
+from app.services.fast_json import fast_json
+from app.db.pagination import InvalidCursor, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
 
 router = APIRouter(
     prefix="/activity-logs",
     tags=["activity-logs"],
-    dependencies=[Depends(get_current_active_user)]  # sécuriser l’accès
+    dependencies=[Depends(get_current_principal)]  # sécuriser l’accès
 )
 
 @router.post("/", response_model=ActivityLogDB)
 async def api_create_activity_log(
     log_in: ActivityLogCreate,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     # On force l’ID de l’utilisateur authentifié,
     # même si le client envoie un user_id différent ou vide.
     log_in.user_id = current_user.id
-    return await create_activity_log(log_in)
+    return await create_activity_log(log_in, return_document=True)
+
+def _require_admin(current_user: Principal) -> None:
+    if "admin" not in [r.lower() for r in current_user.roles]:
+        raise HTTPException(status_code=403, detail="Réservé aux admins")
+
+@router.get("/stats", response_model=dict)
+async def api_activity_writer_stats(current_user: Principal = Depends(get_current_principal)):
+    """Profondeur de la file et compteurs de l'écrivain de logs (admins)."""
+    _require_admin(current_user)
+    return activity_writer.stats()
 
 @router.get("/", response_model=List[ActivityLogDB])
 async def api_list_activity_logs(
+    response: Response,
     user_id: Optional[str] = None,
-    current_user: UserDB = Depends(get_current_active_user)
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    course_id: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="Logs at or after this time"),
+    until: Optional[datetime] = Query(None, description="Logs before this time"),
+    current_user: Principal = Depends(get_current_principal)
 ):
     # On pourrait ajouter une vérification sur le rôle pour n’autoriser que l’admin.
-    return await list_activity_logs(user_id)
+    # Toujours paginé : la collection de logs n'est jamais renvoyée en entier.
+    try:
+        logs, next_cursor = await list_activity_logs(
+            user_id, limit, cursor, course_id=course_id, action=action, since=since, until=until
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fast_json(List[ActivityLogDB], logs, response)
@@ -0,0 +1,93 @@
+# app/routers/analytics.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from app.crud.analytics import list_daily_activity, rollup_watermark
+from app.crud.course import get_course
+from app.schemas.analytics import DailyActivity, RollupResult
+from app.services.activity_rollup import activity_rollup
+from app.services.auth import get_current_principal, Principal
+from app.services.fast_json import fast_json
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+    dependencies=[Depends(get_current_principal)]
+)
+
+# Longest window the activity endpoints return (days)
+MAX_DAYS = 366
+
+
+def _require_admin(current_user: Principal) -> None:
+    if "admin" not in [r.lower() for r in current_user.roles]:
+        raise HTTPException(status_code=403, detail="Only admins can read analytics")
+
+
+def _since(days: int) -> datetime:
+    """00:00 UTC of the first of the last `days` days (today included)."""
+    return datetime.utcnow() - timedelta(days=days - 1)
+
+
+@router.post("/rollup", response_model=RollupResult)
+async def api_run_rollup(
+    rebuild: bool = False,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Summarize the activity logs written since the last rollup now, instead
+    of waiting for the scheduler. `rebuild` recomputes every retained day.
+    """
+    _require_admin(current_user)
+    return await activity_rollup.run(rebuild=rebuild)
+
+
+@router.get("/rollup", response_model=dict)
+async def api_rollup_stats(current_user: Principal = Depends(get_current_principal)):
+    """Scheduler counters and the stored watermark."""
+    _require_admin(current_user)
+    return {**activity_rollup.stats(), "watermark": await rollup_watermark()}
+
+
+@router.get("/activity", response_model=List[DailyActivity])
+async def api_daily_activity(
+    days: int = Query(7, ge=1, le=MAX_DAYS),
+    course_id: Optional[str] = None,
+    action: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Daily (course, action) counts and distinct users, from the summaries.
+    Activity more recent than the last rollup is not included yet.
+    """
+    _require_admin(current_user)
+    if course_id and not ObjectId.is_valid(course_id):
+        raise HTTPException(status_code=400, detail="Invalid course_id")
+    rows = await list_daily_activity(_since(days), course_id=course_id, action=action)
+    return fast_json(List[DailyActivity], rows)
+
+
+@router.get("/courses/{course_id}/activity", response_model=List[DailyActivity])
+async def api_course_activity(
+    course_id: str,
+    days: int = Query(30, ge=1, le=MAX_DAYS),
+    action: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Engagement of one course, for admins and the professor who created it."""
+    if not ObjectId.is_valid(course_id):
+        raise HTTPException(status_code=400, detail="Invalid course_id")
+    course = await get_course(course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    roles = [r.lower() for r in current_user.roles]
+    if "admin" not in roles and str(course.created_by) != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the course's author can read its analytics"
+        )
+    rows = await list_daily_activity(_since(days), course_id=course_id, action=action)
+    return fast_json(List[DailyActivity], rows)
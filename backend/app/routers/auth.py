@@ -5,7 +5,7 @@ from datetime import datetime
 
 from app.schemas.user import SignupIn, LoginIn, Token, UserDB
 from app.crud.user import create_user, authenticate_user
-from app.services.auth import create_access_token, get_current_active_user
+from app.services.auth import create_access_token, get_current_active_user, token_claims
 
 from app.schemas.activity import ActivityLogCreate
 from app.crud.activity import create_activity_log
@@ -25,7 +25,7 @@ async def signup(data: SignupIn):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # 2) Issue a JWT token
-    token = create_access_token({"sub": user.id})
+    token = create_access_token(token_claims(user))
 
     # 3) Log the "signup" activity
     log = ActivityLogCreate(
@@ -55,7 +55,7 @@ async def login(credentials: LoginIn):
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     # 2) Issue a JWT token
-    token = create_access_token({"sub": user.id})
+    token = create_access_token(token_claims(user))
 
     # 3) Log the successful "login" activity
     log = ActivityLogCreate(
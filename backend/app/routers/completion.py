@@ -8,13 +8,12 @@ from app.crud.completion import (
     delete_completion,
     list_completions
 )
-from app.services.auth import get_current_active_user
-from app.schemas.user import UserDB
+from app.services.auth import get_current_principal, Principal
 
 router = APIRouter(
     prefix="/courses",
     tags=["completions"],
-    dependencies=[Depends(get_current_active_user)]
+    dependencies=[Depends(get_current_principal)]
 )
 
 @router.post(
@@ -25,7 +24,7 @@ router = APIRouter(
 async def mark_post_complete(
     course_id: str,
     post_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     try:
         return await create_completion(current_user.id, course_id, post_id)
@@ -39,7 +38,7 @@ async def mark_post_complete(
 async def unmark_post_complete(
     course_id: str,
     post_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     success = await delete_completion(current_user.id, course_id, post_id)
     if not success:
@@ -51,6 +50,6 @@ async def unmark_post_complete(
 )
 async def get_course_completions(
     course_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     return await list_completions(current_user.id, course_id)
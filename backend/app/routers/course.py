@@ -1,10 +1,10 @@
 # /app/routers/course.py
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
 from typing import List
 from datetime import datetime
 
-from app.schemas.course import CourseCreate, CourseOut
+from app.schemas.course import CourseCreate, CourseOut, CourseDB
 from app.crud.course import (
     create_course,
     get_course,
@@ -13,8 +13,17 @@ from app.crud.course import (
     update_course,
     delete_course
 )
-from app.services.auth import get_current_active_user
+from app.services.auth import (
+    get_current_active_user,
+    get_current_principal,
+    Principal,
+    create_access_token,
+    token_claims
+)
 from app.schemas.user import UserDB
+from app.services.fast_json import fast_json
+from app.services.etag import weak_etag, not_modified
+from app.crud.course_version import get_course_version
 
 from app.schemas.activity import ActivityLogCreate
 from app.crud.activity import create_activity_log
@@ -24,14 +33,14 @@ from app.crud.user import upsert_access
 router = APIRouter(
     prefix="/courses",
     tags=["courses"],
-    dependencies=[Depends(get_current_active_user)]
+    dependencies=[Depends(get_current_principal)]
 )
 
 
 @router.post("/", response_model=CourseOut)
 async def api_create_course(
     course_in: CourseCreate,
-    current_user: UserDB = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     # Seuls les admins peuvent créer des cours
     roles_lower = [r.lower() for r in current_user.roles]
@@ -55,7 +64,7 @@ async def api_create_course(
 
 @router.get("/", response_model=List[CourseOut])
 async def api_list_courses(
-    current_user: UserDB = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     - Si l'utilisateur est admin → renvoie tous les cours.
@@ -74,13 +83,13 @@ async def api_list_courses(
         metadata={"count": len(courses)}
     )
     await create_activity_log(log)
-    return courses
+    return fast_json(List[CourseDB], courses)
 
 @router.put("/{course_id}", response_model=CourseOut)
 async def api_update_course(
     course_id: str,
     course_in: CourseCreate,
-    current_user: UserDB = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     # Seuls les admins peuvent mettre à jour un cours
     roles_lower = [r.lower() for r in current_user.roles]
@@ -107,7 +116,7 @@ async def api_update_course(
 @router.delete("/{course_id}", response_model=dict)
 async def api_delete_course(
     course_id: str,
-    current_user: UserDB = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     # Seuls les admins peuvent supprimer un cours
     roles_lower = [r.lower() for r in current_user.roles]
@@ -162,13 +171,20 @@ async def api_enroll_in_course(
         metadata={"course_id": course_id}
     )
     await create_activity_log(log)
+
+    # Les claims du token (JWT_CLAIMS_MODE) ne connaissent pas encore ce cours :
+    # on renvoie un token à jour
+    claims = token_claims(current_user)
+    if "enr" in claims:
+        claims["enr"].append(course_id)
+        return {"enrolled": True, "access_token": create_access_token(claims)}
     return {"enrolled": True}
 
 
 @router.get("/{course_id}/enrolled", response_model=List[dict])
 async def api_list_enrolled_users(
     course_id: str,
-    current_user: UserDB = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     # Seuls les admins et les teachers inscrits peuvent voir la liste des inscrits
     roles_lower = [r.lower() for r in current_user.roles]
@@ -202,12 +218,10 @@ async def api_list_enrolled_users(
 @router.get("/{course_id}", response_model=CourseOut)
 async def api_get_course(
     course_id: str,
-    current_user: UserDB = Depends(get_current_active_user),
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
 ):
-    course = await get_course(course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-
     # Non-admin users must be enrolled
     roles_lower = [r.lower() for r in current_user.roles]
     if "admin" not in roles_lower:
@@ -218,6 +232,17 @@ async def api_get_course(
                 detail="Vous n'êtes pas autorisé à voir ce cours."
             )
 
+    # Unchanged course: no fetch, no view logged, only the access is recorded
+    etag = weak_etag("course", course_id, await get_course_version(course_id))
+    cached = not_modified(request, response, etag)
+    if cached:
+        await upsert_access(current_user.id, course_id)
+        return cached
+
+    course = await get_course(course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+
     # Log the view and record access
     await create_activity_log(ActivityLogCreate(
         user_id=current_user.id,
@@ -5,97 +5,123 @@ from typing import Dict, Any, List
 from datetime import datetime, timedelta
 from bson import ObjectId
 
-from app.services.auth import get_current_active_user
-from app.schemas.user import UserDB
+from app.services.auth import get_current_principal, Principal
+from app.crud.analytics import activity_by_action, rollup_watermark
 from app.db.mongodb import (
     users_collection,
     courses_collection,
     posts_collection,
     submissions_collection,
-    activity_logs_collection
+    course_progress_collection,
+    enrollments_collection,
+    analytics_reads
 )
 
 router = APIRouter(
     prefix="/dashboard",
     tags=["dashboard"],
-    dependencies=[Depends(get_current_active_user)]
+    dependencies=[Depends(get_current_principal)]
 )
 
 @router.get("/overview", response_model=Dict[str, Any])
-async def get_overview(current_user: UserDB = Depends(get_current_active_user)):
+async def get_overview(current_user: Principal = Depends(get_current_principal)):
     roles = [r.lower() for r in current_user.roles]
     now = datetime.utcnow()
 
     if "admin" in roles:
-        # — Admin sees global KPIs
+        # — Admin sees global KPIs (read from a secondary when available)
         totals = {
-            "users":   await users_collection.count_documents({}),
-            "courses": await courses_collection.count_documents({}),
-            "posts":   await posts_collection.count_documents({})
+            "users":   await analytics_reads(users_collection).count_documents({}),
+            "courses": await analytics_reads(courses_collection).count_documents({}),
+            "posts":   await analytics_reads(posts_collection).count_documents({})
         }
         # submissions by status
-        agg = await submissions_collection.aggregate([
+        agg = await analytics_reads(submissions_collection).aggregate([
             {"$group": {"_id": "$status", "count": {"$sum": 1}}}
         ]).to_list(length=None)
         subs = {d["_id"]: d["count"] for d in agg}
 
-        # activity last 7d
-        week_ago = now - timedelta(days=7)
-        agg2 = await activity_logs_collection.aggregate([
-            {"$match": {"timestamp": {"$gte": week_ago}}},
-            {"$group": {"_id": "$action", "count": {"$sum": 1}}}
-        ]).to_list(length=None)
-        acts = {d["_id"]: d["count"] for d in agg2}
+        # activity of the last 7 days (today included), from the daily
+        # summaries; activityAsOf is the end of what they cover
+        acts = await activity_by_action(now - timedelta(days=6))
 
         return {
             "role": "admin",
             "totals": totals,
             "submissions": subs,
-            "activityLast7Days": acts
+            "activityLast7Days": acts,
+            "activityAsOf": await rollup_watermark()
         }
 
     elif "professor" in roles:
-        # — Teacher sees courses they created + enrolled counts
-        created_cursor = courses_collection.find({"created_by": ObjectId(current_user.id)})
+        # — Teacher sees courses they created + enrolled counts, in one aggregation
+        # (created_by is stored as the creator's id string)
+        pipeline = [
+            {"$match": {"created_by": {"$in": [current_user.id, ObjectId(current_user.id)]}}},
+            {"$lookup": {
+                "from": enrollments_collection.name,
+                "localField": "_id",
+                "foreignField": "course_id",
+                "pipeline": [{"$count": "n"}],
+                "as": "enrolled"
+            }},
+            {"$project": {
+                "title": 1,
+                "code":  1,
+                "enrolledCount": {"$ifNull": [{"$arrayElemAt": ["$enrolled.n", 0]}, 0]}
+            }}
+        ]
         out: List[Dict[str, Any]] = []
-        async for c in created_cursor:
-            cid = str(c["_id"])
-            title = c["title"]
-            code  = c["code"]
-            # count enrolled users
-            count = await users_collection.count_documents({"enrollments.courseId": ObjectId(cid)})
-            out.append({"id": cid, "title": title, "code": code, "enrolledCount": count})
+        async for c in analytics_reads(courses_collection).aggregate(pipeline):
+            out.append({
+                "id": str(c["_id"]),
+                "title": c["title"],
+                "code": c["code"],
+                "enrolledCount": c["enrolledCount"]
+            })
         return {"role": "teacher", "coursesCreated": out}
 
     else:
         # — Student sees enrolled courses + progress
-        # 1) list enrollments
-        enrolled = current_user.enrollments
-        courses = []
-        for e in enrolled:
-            cid = e.courseId
-            # fetch course info
-            c = await courses_collection.find_one({"_id": ObjectId(cid)})
-            if not c: continue
-            title = c["title"]
-            code  = c["code"]
-            # compute progress: viewed posts / total posts
-            total_posts = await posts_collection.count_documents({"course_id": ObjectId(cid)})
-            # count "view_post" in activity_logs for this user/course
-            viewed_agg = await activity_logs_collection.aggregate([
-                {"$match": {
-                    "user_id": ObjectId(current_user.id),
-                    "action": "view_post",
-                    "metadata.course_id": cid
-                }},
-                {"$group": {"_id": None, "count": {"$sum": 1}}}
-            ]).to_list(length=1)
-            viewed = viewed_agg[0]["count"] if viewed_agg else 0
-            percent = int((viewed / total_posts) * 100) if total_posts > 0 else 0
-            courses.append({
-                "id": cid,
-                "title": title,
-                "code": code,
+        # One aggregation over the enrolled courses, joined with this
+        # student's materialized counters in `course_progress`.
+        course_ids = [e.courseId for e in current_user.enrollments if ObjectId.is_valid(e.courseId)]
+        if not course_ids:
+            return {"role": "student", "enrolledCourses": []}
+
+        uid = ObjectId(current_user.id)
+        pipeline = [
+            {"$match": {"_id": {"$in": [ObjectId(cid) for cid in course_ids]}}},
+            {"$lookup": {
+                "from": course_progress_collection.name,
+                "let": {"cid": "$_id"},
+                "pipeline": [
+                    {"$match": {"user_id": uid}},
+                    {"$match": {"$expr": {"$eq": ["$course_id", "$$cid"]}}},
+                    {"$project": {"_id": 0, "completed": 1, "total_posts": 1}}
+                ],
+                "as": "counters"
+            }},
+            {"$project": {
+                "title": 1,
+                "code":  1,
+                "total": {"$ifNull": [
+                    "$post_count",
+                    {"$ifNull": [{"$arrayElemAt": ["$counters.total_posts", 0]}, 0]}
+                ]},
+                "done":  {"$ifNull": [{"$arrayElemAt": ["$counters.completed", 0]}, 0]}
+            }}
+        ]
+        by_id: Dict[str, Dict[str, Any]] = {}
+        async for c in courses_collection.aggregate(pipeline):
+            total, done = c["total"], c["done"]
+            percent = min(100, int((done / total) * 100)) if total > 0 else 0
+            by_id[str(c["_id"])] = {
+                "id": str(c["_id"]),
+                "title": c["title"],
+                "code": c["code"],
                 "progress": percent
-            })
+            }
+        # keep the enrollment order
+        courses = [by_id[cid] for cid in course_ids if cid in by_id]
         return {"role": "student", "enrolledCourses": courses}
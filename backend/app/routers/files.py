@@ -1,16 +1,26 @@
 # /app/routers/files.py
 
-import io
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request
+from fastapi.security import OAuth2PasswordBearer
+from typing import Optional
+from fastapi.responses import JSONResponse
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorGridFSBucket
 from starlette.status import HTTP_201_CREATED
 
-from app.db.mongodb import db   # your named Motor database
+from app.db.mongodb import db, forum_fs, forums_collection, messages_collection   # your named Motor database
+from app.crud.course import get_course
+from app.services.auth import get_current_principal
+from app.services.signed_urls import valid_signature
+from app.services.gridfs_stream import stream_gridfs_file
+from app.services.gridfs_upload import store_upload, AVATAR_MAX_BYTES
 
 router = APIRouter(prefix="/files", tags=["files"])
 
+# Bearer token when there is one: image URLs are usually followed by the
+# browser (<img src>), which cannot send it and relies on the signature
+optional_token = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
+
 # GridFS bucket “avatars”
 _fs = AsyncIOMotorGridFSBucket(db, bucket_name="avatars")
 
@@ -27,19 +37,15 @@ async def upload_avatar(
     if not file.content_type.startswith("image/"):
         raise HTTPException(400, "Only images are allowed")
 
-    grid_in = _fs.open_upload_stream(
-        file.filename,
-        metadata={"contentType": file.content_type}
+    stored = await store_upload(
+        _fs,
+        file,
+        AVATAR_MAX_BYTES,
+        metadata={"contentType": file.content_type},
+        request=request
     )
 
-    data = await file.read()
-    try:
-        await grid_in.write(data)
-    finally:
-        await grid_in.close()
-        await file.close()
-
-    fid = str(grid_in._id)
+    fid = str(stored.file_id)
     # Cast the URL object to string here:
     public_url = str(request.url_for("serve_avatar", file_id=fid))
 
@@ -52,22 +58,47 @@ async def upload_avatar(
     )
 
 @router.get("/{file_id}", name="serve_avatar")
-async def serve_avatar(file_id: str):
-    # validate ObjectId
-    try:
-        oid = ObjectId(file_id)
-    except Exception:
-        raise HTTPException(400, "Invalid file ID")
+async def serve_avatar(file_id: str, request: Request):
+    # streamed chunk by chunk, with Range / ETag support
+    return await stream_gridfs_file(request, _fs, file_id, disposition="inline")
 
-    # open the GridFS download stream
-    try:
-        grid_out = await _fs.open_download_stream(oid)
-    except Exception:
-        raise HTTPException(404, "File not found")
 
-    data = await grid_out.read()
-    return StreamingResponse(
-        io.BytesIO(data),
-        media_type=grid_out.metadata.get("contentType", "application/octet-stream"),
-        headers={"Content-Disposition": f'inline; filename="{grid_out.filename}"'}
+async def _forum_image_course(file_id: ObjectId) -> Optional[str]:
+    """Course of the forum message showing this image or thumbnail."""
+    msg = await messages_collection.find_one(
+        {"$or": [{"image_id": file_id}, {"thumbnail_id": file_id}]},
+        {"thread_id": 1}
     )
+    if not msg:
+        return None
+    thread = await forums_collection.find_one({"_id": msg["thread_id"]}, {"course_id": 1})
+    return str(thread["course_id"]) if thread else None
+
+
+@router.get("/forum/{file_id}", name="serve_forum_image")
+async def serve_forum_image(
+    file_id: str,
+    request: Request,
+    exp: Optional[int] = None,
+    sig: Optional[str] = None,
+    token: Optional[str] = Depends(optional_token)
+):
+    """
+    Forum message images and their thumbnails. Either through the signed
+    URL handed out by the thread detail, or with a bearer token of a user
+    enrolled in the image's course.
+    """
+    if not valid_signature(file_id, exp, sig):
+        if not token:
+            raise HTTPException(status_code=401, detail="Signed URL expired or missing")
+        current_user = await get_current_principal(token)
+        if "admin" not in [r.lower() for r in current_user.roles]:
+            course_id = await _forum_image_course(ObjectId(file_id)) if ObjectId.is_valid(file_id) else None
+            if course_id is None:
+                raise HTTPException(status_code=404, detail="File not found")
+            if course_id not in [e.courseId for e in current_user.enrollments]:
+                # the course's creator need not be enrolled
+                course = await get_course(course_id)
+                if not course or str(course.created_by) != current_user.id:
+                    raise HTTPException(status_code=403, detail="Not enrolled in this course")
+    return await stream_gridfs_file(request, forum_fs, file_id, disposition="inline")
@@ -1,5 +1,5 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Response, Query, BackgroundTasks
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
@@ -10,20 +10,66 @@ from app.schemas.forum import (
     ForumThreadDetail,
     ForumMessageOut,
 )
-from app.services.auth import get_current_active_user
-from app.schemas.user import UserDB
+from app.services.auth import get_current_principal, Principal
+from app.services.gridfs_upload import store_upload, FORUM_IMAGE_MAX_BYTES
+from app.services.forum_images import generate_thumbnail
+from app.services.fast_json import fast_json
+from app.services.etag import weak_etag, not_modified
+from app.services.signed_urls import signed_url, url_window
 
-from app.db.mongodb import forums_collection, messages_collection
+from app.db.mongodb import forums_collection, messages_collection, forum_fs
+from app.db.pagination import paginate, InvalidCursor, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
+from app.db.persistence import insert_document
 
 from app.schemas.activity import ActivityLogCreate
 from app.crud.activity import create_activity_log
+from app.crud.course import get_course
+from app.crud.course_version import get_course_version, bump_course_version
 
 router = APIRouter(
     prefix="/courses/{course_id}/forums",
     tags=["forums"],
-    dependencies=[Depends(get_current_active_user)]
+    dependencies=[Depends(get_current_principal)]
 )
 
+THREADS_SORT  = [("updated_at", -1), ("_id", -1)]
+MESSAGES_SORT = [("created_at", 1), ("_id", 1)]
+
+
+def _image_url(request: Request, file_id, window: int) -> str:
+    """Signed /files/forum/{id} URL: usable by <img src> without a bearer token."""
+    url = str(request.url_for("serve_forum_image", file_id=str(file_id)))
+    return signed_url(url, str(file_id), window)
+
+
+async def _require_member(course_id: str, current_user: Principal) -> None:
+    """Admins, users enrolled in the course, or the course's creator."""
+    if "admin" in [r.lower() for r in current_user.roles]:
+        return
+    if course_id in [e.courseId for e in current_user.enrollments]:
+        return
+    course = await get_course(course_id)
+    if not course or str(course.created_by) != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+
+
+def _message_out(msg: dict, request: Request, window: int) -> ForumMessageOut:
+    """Build the API view of a message; image bytes are served by /files/forum/{id}."""
+    image_id = msg.get("image_id")
+    thumb_id = msg.get("thumbnail_id")
+    # Trusted database data: construct without validating
+    return ForumMessageOut.model_construct(
+        id=str(msg["_id"]),
+        thread_id=str(msg["thread_id"]),
+        author_id=str(msg["author_id"]),
+        content=msg.get("content"),
+        image_url=_image_url(request, image_id, window) if image_id else None,
+        thumbnail_url=_image_url(request, thumb_id, window) if thumb_id else None,
+        image_width=msg.get("image_width"),
+        image_height=msg.get("image_height"),
+        created_at=msg["created_at"]
+    )
+
 
 #
 # 1) Create a new forum thread under a given course
@@ -32,7 +78,7 @@ router = APIRouter(
 async def create_thread(
     course_id: str,
     thread_in: ForumThreadCreate,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     try:
         course_obj = ObjectId(course_id)
@@ -47,22 +93,15 @@ async def create_thread(
         "created_at": now,
         "updated_at": now
     }
-    res = await forums_collection.insert_one(doc)
-    created = await forums_collection.find_one({"_id": res.inserted_id})
-    if not created:
-        raise HTTPException(status_code=500, detail="Thread creation failed")
-
-    # Convert ObjectId → str
-    created["_id"]       = str(created["_id"])
-    created["course_id"] = str(created["course_id"])
-    created["author_id"] = str(created["author_id"])
+    created = await insert_document(forums_collection, doc)
+    await bump_course_version(course_obj)
 
     # Log "create_thread" activity
     log = ActivityLogCreate(
         user_id=current_user.id,
         action="create_thread",
         timestamp=datetime.utcnow(),
-        metadata={"course_id": course_id, "thread_id": created["_id"]}
+        metadata={"course_id": course_id, "thread_id": str(created["_id"])}
     )
     await create_activity_log(log)
 
@@ -75,23 +114,34 @@ async def create_thread(
 @router.get("/", response_model=List[ForumThreadOut])
 async def list_threads(
     course_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal)
 ):
     try:
         course_obj = ObjectId(course_id)
     except:
         raise HTTPException(status_code=400, detail="Invalid course ID")
 
-    cursor = forums_collection.find({"course_id": course_obj})
-    out = []
-    async for doc in cursor:
-        doc["_id"]       = str(doc["_id"])
-        doc["course_id"] = str(doc["course_id"])
-        doc["author_id"] = str(doc["author_id"])
-        out.append(ForumThreadOut(**doc))
+    # Unchanged list: answered from the course version alone
+    etag = weak_etag("threads", course_id, await get_course_version(course_id))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    # sorted by updated_at descending, server-side
+    try:
+        docs, next_cursor = await paginate(
+            forums_collection, {"course_id": course_obj}, THREADS_SORT, limit, cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
-    # sort by updated_at descending
-    out.sort(key=lambda t: t.updated_at, reverse=True)
+    out = [ForumThreadOut(**doc) for doc in docs]
 
     # Log "list_threads" activity
     log = ActivityLogCreate(
@@ -102,7 +152,7 @@ async def list_threads(
     )
     await create_activity_log(log)
 
-    return out
+    return fast_json(List[ForumThreadOut], out, response)
 
 
 #
@@ -112,7 +162,11 @@ async def list_threads(
 async def get_thread_detail(
     course_id: str,
     thread_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal)
 ):
     # Validate IDs
     try:
@@ -121,27 +175,35 @@ async def get_thread_detail(
     except:
         raise HTTPException(status_code=400, detail="Invalid ID")
 
+    await _require_member(course_id, current_user)
+
+    # Messages bump the course version too; the signing window is part of
+    # the ETag so a revalidated body never carries expired image URLs
+    window = url_window()
+    etag = weak_etag("thread", course_id, thread_id, await get_course_version(course_id), window)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
     # Fetch the thread document
     thread_doc = await forums_collection.find_one({"_id": thread_obj})
     if not thread_doc or str(thread_doc["course_id"]) != course_id:
         raise HTTPException(status_code=404, detail="Thread not found")
 
-    # Convert thread OIDs → str
-    thread_doc["_id"]       = str(thread_doc["_id"])
-    thread_doc["course_id"] = str(thread_doc["course_id"])
-    thread_doc["author_id"] = str(thread_doc["author_id"])
-
-    # Fetch all messages under that thread
-    cursor = messages_collection.find({"thread_id": thread_obj})
-    messages_out: List[dict] = []
-    async for msg in cursor:
-        msg["_id"]       = str(msg["_id"])
-        msg["thread_id"] = str(msg["thread_id"])
-        msg["author_id"] = str(msg["author_id"])
-        # If missing keys, ensure they exist
-        msg["content"]    = msg.get("content")    # may be None
-        msg["image_data"] = msg.get("image_data") # may be None
-        messages_out.append(ForumMessageOut(**msg).dict())
+    # Fetch the messages under that thread, oldest first
+    # (never the legacy inline image bytes)
+    try:
+        msgs, next_cursor = await paginate(
+            messages_collection,
+            {"thread_id": thread_obj},
+            MESSAGES_SORT,
+            limit,
+            cursor,
+            projection={"image_data": 0}
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    messages_out = [_message_out(msg, request, window) for msg in msgs]
 
     # Log "view_thread" activity
     log = ActivityLogCreate(
@@ -152,7 +214,9 @@ async def get_thread_detail(
     )
     await create_activity_log(log)
 
-    return ForumThreadDetail(**{**thread_doc, "messages": messages_out})
+    # messages are already ForumMessageOut instances: not validated again
+    detail = ForumThreadDetail(**{**thread_doc, "messages": messages_out, "next_cursor": next_cursor})
+    return fast_json(ForumThreadDetail, detail, response)
 
 
 #
@@ -162,9 +226,11 @@ async def get_thread_detail(
 async def create_message(
     course_id: str,
     thread_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
     content: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     # Validate IDs
     try:
@@ -193,30 +259,32 @@ async def create_message(
     if content:
         msg_doc["content"] = content
 
-    # If an image was uploaded, read its bytes and store under `image_data`
+    # If an image was uploaded, stream it into GridFS and keep only its id
     if image:
-        raw_bytes = await image.read()
-        msg_doc["image_data"] = raw_bytes
+        if image.content_type and not image.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail="Only images are allowed")
+        stored = await store_upload(
+            forum_fs,
+            image,
+            FORUM_IMAGE_MAX_BYTES,
+            metadata={"uploaded_by": current_user.id, "thread_id": thread_id},
+            request=request
+        )
+        msg_doc["image_id"] = stored.file_id
 
     # Insert into MongoDB
-    res = await messages_collection.insert_one(msg_doc)
-    created = await messages_collection.find_one({"_id": res.inserted_id})
-    if not created:
-        raise HTTPException(status_code=500, detail="Message creation failed")
-
-    # Convert ObjectId → str for Pydantic
-    created["_id"]       = str(created["_id"])
-    created["thread_id"] = str(created["thread_id"])
-    created["author_id"] = str(created["author_id"])
-    # Make sure missing keys are explicit
-    created["content"]    = created.get("content")
-    created["image_data"] = created.get("image_data")
+    created = await insert_document(messages_collection, msg_doc)
+
+    # Dimensions + preview are filled in after the response is sent
+    if created.get("image_id"):
+        background_tasks.add_task(generate_thumbnail, created["_id"], created["image_id"], course_id)
 
     # Also update thread's updated_at
     await forums_collection.update_one(
         {"_id": thread_obj},
         {"$set": {"updated_at": now}}
     )
+    await bump_course_version(course_obj)
 
     # Log "create_message" activity
     log = ActivityLogCreate(
@@ -226,9 +294,9 @@ async def create_message(
         metadata={
             "course_id":  course_id,
             "thread_id":  thread_id,
-            "message_id": created["_id"]
+            "message_id": str(created["_id"])
         }
     )
     await create_activity_log(log)
 
-    return ForumMessageOut(**created)
+    return _message_out(created, request, url_window())
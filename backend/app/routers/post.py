@@ -1,12 +1,11 @@
 # app/routers/post.py
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response, Query, Body
+from typing import List, Optional, Union
 from datetime import datetime
 from bson import ObjectId
-from motor.motor_asyncio import AsyncIOMotorGridFSBucket
 
-from app.schemas.post import PostCreate, PostOut, PostUpdate
+from app.schemas.post import PostCreate, PostOut, PostUpdate, PostDB, PostSummary
 from app.crud.post import (
     create_post,
     list_posts,
@@ -16,27 +15,52 @@ from app.crud.post import (
     pin_post,
     unpin_post,
     move_up,
-    move_down
+    move_down,
+    set_post_order,
+    InvalidOrder,
+    ReorderConflict
 )
-from app.services.auth import get_current_active_user
-from app.schemas.user import UserDB
+from app.services.auth import get_current_principal, Principal
 from app.schemas.activity import ActivityLogCreate
 from app.crud.activity import create_activity_log
-from app.db.mongodb import posts_collection
+from app.db.mongodb import posts_collection, submissions_collection, fs
+from app.services.fast_json import fast_json
+from app.db.pagination import InvalidCursor, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
+from app.services.gridfs_stream import stream_gridfs_file
+from app.services.gridfs_upload import POST_FILE_MAX_BYTES
+from app.services.gridfs_dedup import store_deduplicated, release_file, UnknownFile
+from app.services.etag import weak_etag, not_modified
+from app.crud.course_version import get_course_version, bump_course_version
 
 router = APIRouter(
     prefix="/courses/{course_id}/posts",
     tags=["posts"],
-    dependencies=[Depends(get_current_active_user)]
+    dependencies=[Depends(get_current_principal)]
 )
 
 
-@router.get("/", response_model=List[PostOut])
+@router.get("/", response_model=Union[List[PostOut], List[PostSummary]])
 async def api_list_posts(
     course_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = Query(False, description="Leave out each post's content"),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    posts = await list_posts(course_id)
+    # Unchanged feed: answered from the course version alone
+    etag = weak_etag("posts", course_id, await get_course_version(course_id))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    try:
+        posts, next_cursor = await list_posts(course_id, limit, cursor, summary)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     # Log "list_posts" activity
     await create_activity_log(ActivityLogCreate(
@@ -46,16 +70,21 @@ async def api_list_posts(
         metadata={"course_id": course_id, "count": len(posts)}
     ))
 
-    return posts
+    return fast_json(List[PostSummary] if summary else List[PostDB], posts, response)
 
 
 @router.post("/", response_model=PostOut)
 async def api_create_post(
     course_id: str,
     post_in: PostCreate,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    post = await create_post(course_id, current_user.id, post_in)
+    try:
+        post = await create_post(course_id, current_user.id, post_in)
+    except UnknownFile as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ReorderConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     # Log "create_post" activity
     await create_activity_log(ActivityLogCreate(
@@ -68,11 +97,39 @@ async def api_create_post(
     return post
 
 
+@router.put("/order", response_model=dict)
+async def api_set_post_order(
+    course_id: str,
+    post_ids: List[str] = Body(..., embed=True),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Reorder all unpinned posts at once: `post_ids` is the complete list,
+    top first. Applied in a single bulk write.
+    """
+    try:
+        count = await set_post_order(course_id, post_ids)
+    except InvalidOrder as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ReorderConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    # Log "reorder_posts" activity
+    await create_activity_log(ActivityLogCreate(
+        user_id=current_user.id,
+        action="reorder_posts",
+        timestamp=datetime.utcnow(),
+        metadata={"course_id": course_id, "count": count}
+    ))
+
+    return {"reordered": count}
+
+
 @router.get("/{post_id}", response_model=PostOut)
 async def api_get_post(
     course_id: str,
     post_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     post = await get_post(post_id)
     if not post or post.course_id != course_id:
@@ -94,9 +151,12 @@ async def api_update_post(
     course_id: str,
     post_id: str,
     post_in: PostUpdate,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    updated = await update_post(post_id, post_in)
+    try:
+        updated = await update_post(post_id, post_in)
+    except UnknownFile as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not updated or updated.course_id != course_id:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -115,7 +175,7 @@ async def api_update_post(
 async def api_delete_post(
     course_id: str,
     post_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     ok = await delete_post(post_id)
     if not ok:
@@ -136,7 +196,7 @@ async def api_delete_post(
 async def api_pin_post(
     course_id: str,
     post_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     pinned = await pin_post(post_id)
     if not pinned or pinned.course_id != course_id:
@@ -157,10 +217,13 @@ async def api_pin_post(
 async def api_unpin_post(
     course_id: str,
     post_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    unp = await unpin_post(post_id)
-    if not unp or unp.course_id != course_id:
+    try:
+        unp = await unpin_post(post_id, course_id)
+    except ReorderConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not unp:
         raise HTTPException(status_code=404, detail="Post not found")
 
     # Log "unpin_post" activity
@@ -178,9 +241,12 @@ async def api_unpin_post(
 async def api_move_up(
     course_id: str,
     post_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    moved = await move_up(post_id)
+    try:
+        moved = await move_up(post_id)
+    except ReorderConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not moved or moved.course_id != course_id:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -199,9 +265,12 @@ async def api_move_up(
 async def api_move_down(
     course_id: str,
     post_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    moved = await move_down(post_id)
+    try:
+        moved = await move_down(post_id)
+    except ReorderConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not moved or moved.course_id != course_id:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -223,34 +292,29 @@ async def api_move_down(
 )
 async def upload_file_to_gridfs(
     course_id: str,
+    request: Request,
     file: UploadFile = File(...)
 ):
-    bucket = AsyncIOMotorGridFSBucket(posts_collection.database)
-    data = await file.read()
-    # this returns a Motor ObjectId
-    gridfs_id = await bucket.upload_from_stream(file.filename, data)
-
-    return {"file_id": str(gridfs_id)}
+    # no reference yet: create_post / update_post take one when they attach it
+    stored = await store_deduplicated(file, POST_FILE_MAX_BYTES, request=request, refs=0)
+    return {"file_id": str(stored.file_id)}
 
 @router.post("/{post_id}/upload", response_model=dict)
 async def upload_post_file(
     course_id: str,
     post_id: str,
+    request: Request,
     file: UploadFile = File(...)
 ):
     """
     Upload a file into GridFS, attach its ID and original filename to the Post,
     and return {"file_id": "...", "file_name": "..."}.
     """
-    bucket = AsyncIOMotorGridFSBucket(posts_collection.database)
-    grid_in = bucket.open_upload_stream(file.filename)   # no await here
-    contents = await file.read()
-    await grid_in.write(contents)
-    await grid_in.close()
-    file_id = grid_in._id
+    stored = await store_deduplicated(file, POST_FILE_MAX_BYTES, request=request)
+    file_id = stored.file_id
 
     # store file_id + file_name in the post document
-    await posts_collection.update_one(
+    before = await posts_collection.find_one_and_update(
         {"_id": ObjectId(post_id)},
         {
           "$set": {
@@ -258,8 +322,18 @@ async def upload_post_file(
             "file_name":  file.filename,
             "updated_at": datetime.utcnow()
           }
-        }
+        },
+        projection={"file_id": 1, "course_id": 1}
     )
+    if not before:
+        # no post to hold the reference store_deduplicated just took
+        await release_file(file_id)
+        raise HTTPException(status_code=404, detail="Post not found")
+    # the post now holds exactly one reference: drop the previous
+    # attachment's, or the extra one when the same bytes were re-uploaded
+    if before.get("file_id"):
+        await release_file(before["file_id"])
+    await bump_course_version(before["course_id"])
 
     return {"file_id": str(file_id), "file_name": file.filename}
 
@@ -268,19 +342,29 @@ async def upload_post_file(
 async def get_post_file(
     course_id: str,
     post_id: str,
-    file_id: str
+    file_id: str,
+    request: Request
 ):
     """
     Stream the file from GridFS with a Content-Disposition header so browsers
-    will download it with the correct name.
+    will download it with the correct name. Supports Range and conditional GETs.
     """
-    bucket = AsyncIOMotorGridFSBucket(posts_collection.database)
-    grid_out = await bucket.open_download_stream(ObjectId(file_id))
-    data = await grid_out.read()
-    return Response(
-      content=data,
-      media_type="application/octet-stream",
-      headers={
-        "Content-Disposition": f'attachment; filename="{grid_out.filename}"'
-      }
-    )
\ No newline at end of file
+    # The name recorded by the post (or submission) that holds this file:
+    # a deduplicated blob is shared, its GridFS filename is the first upload's
+    owner = None
+    if all(ObjectId.is_valid(i) for i in (course_id, post_id, file_id)):
+        key = {"file_id": ObjectId(file_id)}
+        owner = (
+            await posts_collection.find_one({"_id": ObjectId(post_id), **key}, {"file_name": 1})
+            or await submissions_collection.find_one(
+                {"course_id": ObjectId(course_id), "post_id": ObjectId(post_id), **key},
+                {"file_name": 1}
+            )
+        )
+    return await stream_gridfs_file(
+        request,
+        fs,
+        file_id,
+        media_type="application/octet-stream",
+        filename=(owner or {}).get("file_name")
+    )
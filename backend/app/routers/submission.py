@@ -1,40 +1,56 @@
 # app/routers/submission.py
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body
-from typing import List, Optional, Union
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, Request, Query
+from fastapi.responses import StreamingResponse
+import os
+import re
+from typing import AsyncIterator, List, Optional, Union
+from datetime import datetime, timezone
 from bson import ObjectId
 
 from app.schemas.submission import (
     SubmissionDB,
     SubmissionOut,
     SubmissionGrade,
-    SubmissionCreate
+    SubmissionCreate,
+    SubmissionGradeItem,
+    BulkGradeResult,
+    BulkGradeResponse
 )
-from app.services.auth import get_current_active_user
-from app.schemas.user import UserDB
-from app.db.mongodb import submissions_collection, users_collection, posts_collection, fs
+from app.services.auth import get_current_principal, Principal
+from app.services.gridfs_upload import SUBMISSION_MAX_BYTES
+from app.services.gridfs_dedup import store_deduplicated
+from app.services.fast_json import fast_json
+from app.services.grade_csv import iter_grade_rows
+from app.services.zip_stream import stream_zip, ZipEntry
+from app.db.mongodb import submissions_collection, posts_collection, fs
+from app.db.persistence import insert_document
+from app.crud.course import get_course
 from app.crud.submission import (
     list_submissions,
+    get_submission_out,
+    iter_submissions,
+    bulk_grade_submissions,
     create_submission as _create_submission,
     delete_submission as _delete_submission
 )
 
 from app.schemas.activity import ActivityLogCreate
-from app.crud.activity import create_activity_log
+from app.crud.activity import create_activity_log, create_activity_logs
 
 router = APIRouter(
     prefix="/courses/{course_id}/posts/{post_id}/submissions",
     tags=["submissions"],
-    dependencies=[Depends(get_current_active_user)]
+    dependencies=[Depends(get_current_principal)]
 )
 
 @router.post("/", response_model=SubmissionOut)
 async def api_create_submission(
     course_id:      str,
     post_id:        str,
+    request:        Request,
     file:           UploadFile = File(...),
-    current_user:   UserDB = Depends(get_current_active_user)
+    current_user:   Principal = Depends(get_current_principal)
 ):
     """
     1) Read the post's due_date from posts_collection.
@@ -53,21 +69,20 @@ async def api_create_submission(
     else:
         initial_status = "submitted"
 
-    # Upload file into GridFS
-    contents = await file.read()
-    grid_in = fs.open_upload_stream(
-        filename=file.filename,
+    # Stream the file into GridFS (or reuse an identical blob)
+    stored = await store_deduplicated(
+        file,
+        SUBMISSION_MAX_BYTES,
         metadata={
             "content_type": file.content_type,
             "uploaded_by":  current_user.id,
             "course_id":    course_id,
             "post_id":      post_id,
             "uploaded_at":  now
-        }
+        },
+        request=request
     )
-    grid_in.write(contents)
-    grid_in.close()
-    file_obj_id = grid_in._id
+    file_obj_id = stored.file_id
 
     # Insert submission document
     doc = {
@@ -75,25 +90,14 @@ async def api_create_submission(
         "post_id":    ObjectId(post_id),
         "student_id": ObjectId(current_user.id),
         "file_id":    ObjectId(file_obj_id),
+        "file_name":  stored.filename,
         "status":     initial_status,
         "grade":      None,
         "comment":    None,
         "created_at": now,
         "updated_at": now
     }
-    res = await submissions_collection.insert_one(doc)
-    created = await submissions_collection.find_one({"_id": res.inserted_id})
-
-    if not created:
-        raise HTTPException(status_code=500, detail="Failed to create submission")
-
-    # Convert ObjectId → str
-    created["_id"]        = str(created["_id"])
-    created["course_id"]  = str(created["course_id"])
-    created["post_id"]    = str(created["post_id"])
-    created["student_id"] = str(created["student_id"])
-    created["file_id"]    = str(created["file_id"])
-
+    created = await insert_document(submissions_collection, doc)
     submission_out = SubmissionDB(**created)
 
     # Log activity: submit_homework
@@ -117,7 +121,7 @@ async def api_create_submission(
 async def api_list_submissions(
     course_id: str,
     post_id:   str,
-    current_user:   UserDB = Depends(get_current_active_user)
+    current_user:   Principal = Depends(get_current_principal)
 ):
     """
     Return all submissions for a given course_id/post_id.
@@ -134,7 +138,165 @@ async def api_list_submissions(
     )
     await create_activity_log(log)
 
-    return submissions
+    return fast_json(List[SubmissionOut], submissions)
+
+
+# Largest number of grades applied by one bulk_write
+BULK_GRADE_BATCH = 1000
+
+
+# Roles allowed to grade ("teacher" is still found on older accounts)
+GRADER_ROLES = {"professor", "teacher"}
+
+
+async def _require_grader(course_id: str, current_user: Principal) -> None:
+    """Admins, or the professor who created the course."""
+    roles = {r.lower() for r in current_user.roles}
+    if "admin" in roles:
+        return
+    if not roles & GRADER_ROLES:
+        raise HTTPException(status_code=403, detail="Only teachers can grade submissions")
+    course = await get_course(course_id) if ObjectId.is_valid(course_id) else None
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if str(course.created_by) != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the course's author can grade its submissions")
+
+
+async def _grade_batch(
+    course_id: str,
+    post_id: str,
+    items: List[SubmissionGradeItem],
+    current_user: Principal
+) -> List[BulkGradeResult]:
+    """Apply one batch of grades and log every successful one in a single batch."""
+    results = await bulk_grade_submissions(course_id, post_id, items)
+    now = datetime.utcnow()
+    await create_activity_logs([
+        ActivityLogCreate(
+            user_id=current_user.id,
+            action="grade_submission",
+            timestamp=now,
+            metadata={
+                "course_id": course_id,
+                "post_id": post_id,
+                "submission_id": item.submission_id,
+                "grade": item.grade,
+                "comment": item.comment,
+                "bulk": True
+            }
+        )
+        for item, result in zip(items, results) if result.status == "graded"
+    ])
+    return results
+
+
+def _bulk_response(results: List[BulkGradeResult]) -> BulkGradeResponse:
+    graded = sum(1 for r in results if r.status == "graded")
+    return BulkGradeResponse(graded=graded, failed=len(results) - graded, results=results)
+
+
+@router.post("/grades", response_model=BulkGradeResponse)
+async def api_bulk_grade_submissions(
+    course_id:    str,
+    post_id:      str,
+    items:        List[SubmissionGradeItem] = Body(..., max_length=BULK_GRADE_BATCH),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Grade many submissions at once: [{submission_id, grade, comment}, ...].
+    Returns one result per entry, in order (graded / not_found / invalid / error).
+    """
+    await _require_grader(course_id, current_user)
+    return _bulk_response(await _grade_batch(course_id, post_id, items, current_user))
+
+
+@router.post("/grades/csv", response_model=BulkGradeResponse)
+async def api_import_grades_csv(
+    course_id:    str,
+    post_id:      str,
+    request:      Request,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Import grades from a CSV request body (text/csv): `submission_id,grade,comment`,
+    optional header row. The body is parsed as it streams in and applied in
+    batches of BULK_GRADE_BATCH rows; each result carries its CSV row number.
+    """
+    await _require_grader(course_id, current_user)
+    results: List[BulkGradeResult] = []
+    batch: List[tuple] = []
+
+    async def flush():
+        items = [item for _, item in batch]
+        for (row, _), result in zip(batch, await _grade_batch(course_id, post_id, items, current_user)):
+            result.row = row
+            results.append(result)
+        batch.clear()
+
+    async for row, parsed in iter_grade_rows(request.stream()):
+        if isinstance(parsed, BulkGradeResult):
+            results.append(parsed)
+            continue
+        batch.append((row, parsed))
+        if len(batch) >= BULK_GRADE_BATCH:
+            await flush()
+    if batch:
+        await flush()
+
+    results.sort(key=lambda r: r.row)
+    return _bulk_response(results)
+
+
+def _safe(part: Optional[str]) -> str:
+    return re.sub(r"[^\w.-]+", "-", (part or "").strip()).strip("-").lower() or "unknown"
+
+
+async def _zip_entries(match: dict) -> AsyncIterator[ZipEntry]:
+    """`lastname_firstname_status.ext` for each submission, oldest first."""
+    seen = set()
+    async for sub in iter_submissions(match, sort={"created_at": 1, "_id": 1}):
+        ext = os.path.splitext(sub.file_name or "")[1].lower()
+        base = f"{_safe(sub.last_name)}_{_safe(sub.first_name)}_{sub.status}"
+        name, n = base + ext, 1
+        while name in seen:
+            n += 1
+            name = f"{base}_{n}{ext}"
+        seen.add(name)
+        yield name, ObjectId(sub.file_id), sub.created_at
+
+
+@router.get("/export")
+async def api_export_submissions(
+    course_id:    str,
+    post_id:      str,
+    since:        Optional[datetime] = Query(None, description="Only submissions made after this time"),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Stream a ZIP of every submission file of this post, built on the fly
+    from GridFS. Pass `since` (e.g. the time of the previous export) to get
+    only the submissions that came in after it.
+    """
+    await _require_grader(course_id, current_user)
+    match: dict = {"course_id": ObjectId(course_id), "post_id": ObjectId(post_id)}
+    if since:
+        # created_at is stored as naive UTC
+        if since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        match["created_at"] = {"$gt": since}
+
+    await create_activity_log(ActivityLogCreate(
+        user_id=current_user.id,
+        action="export_submissions",
+        timestamp=datetime.utcnow(),
+        metadata={"course_id": course_id, "post_id": post_id, "since": since}
+    ))
+    return StreamingResponse(
+        stream_zip(fs, _zip_entries(match)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="submissions-{post_id}.zip"'}
+    )
 
 
 @router.patch(
@@ -146,7 +308,7 @@ async def api_update_submission(
     post_id:        str,
     submission_id:  str,
     payload:        Union[SubmissionGrade, dict] = Body(...),
-    current_user:   UserDB = Depends(get_current_active_user)
+    current_user:   Principal = Depends(get_current_principal)
 ):
     """
     Supports two scenarios:
@@ -154,29 +316,27 @@ async def api_update_submission(
     2) { "grade": int, "comment": str } → set status="graded", grade, comment, updated_at.
     Always return the updated SubmissionOut, and log the appropriate activity.
     """
-    # 1) Fetch existing submission
-    doc = await submissions_collection.find_one({"_id": ObjectId(submission_id)})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Submission not found")
-
     now = datetime.utcnow()
+    query: dict = {"_id": ObjectId(submission_id)}
     update_data: dict = {}
     activity_action = None
 
-    # 2) Determine which fields to update
+    # 1) Determine which fields to update
     if "status" in payload:
         new_status = payload.get("status")
         if new_status not in {"submitted", "late", "graded"}:
             raise HTTPException(status_code=400, detail="Invalid status value")
+        if new_status == "graded":
+            await _require_grader(course_id, current_user)
         # Once graded, we do not allow changing it back via this path
-        if doc.get("status") == "graded":
-            raise HTTPException(status_code=400, detail="Cannot change status after grading")
+        query["status"] = {"$ne": "graded"}
         update_data["status"] = new_status
         update_data["updated_at"] = now
         activity_action = "update_submission_status"
 
     elif ("grade" in payload) and ("comment" in payload):
         # Grade + comment path → set status = "graded"
+        await _require_grader(course_id, current_user)
         grade_value = payload["grade"]
         comment_value = payload["comment"]
         update_data["grade"]   = grade_value
@@ -188,52 +348,27 @@ async def api_update_submission(
     else:
         raise HTTPException(status_code=400, detail="Must supply either 'status' or both 'grade' and 'comment'")
 
-    # 3) Perform the update
-    result = await submissions_collection.update_one(
-        {"_id": ObjectId(submission_id)},
-        {"$set": update_data}
-    )
+    # Grading is checked against this course: the submission must belong to it
+    if update_data["status"] == "graded":
+        query["course_id"] = ObjectId(course_id)
+        query["post_id"] = ObjectId(post_id)
+
+    # 2) Perform the update
+    result = await submissions_collection.update_one(query, {"$set": update_data})
     if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Submission not found after update attempt")
-
-    # 4) Fetch the newly updated document
-    updated_doc = await submissions_collection.find_one({"_id": ObjectId(submission_id)})
-    if not updated_doc:
-        raise HTTPException(status_code=404, detail="Submission not found after update")
-
-    # Convert ObjectId → str
-    updated_doc["_id"]        = str(updated_doc["_id"])
-    updated_doc["course_id"]  = str(updated_doc["course_id"])
-    updated_doc["post_id"]    = str(updated_doc["post_id"])
-    updated_doc["student_id"] = str(updated_doc["student_id"])
-    updated_doc["file_id"]    = str(updated_doc["file_id"])
-
-    # 5) Re‐lookup student's first_name/last_name
-    try:
-        user_obj = await users_collection.find_one({"_id": ObjectId(updated_doc["student_id"])})
-    except:
-        user_obj = None
-
-    if user_obj:
-        updated_doc["first_name"] = user_obj.get("first_name")
-        updated_doc["last_name"]  = user_obj.get("last_name")
-    else:
-        updated_doc["first_name"] = None
-        updated_doc["last_name"]  = None
-
-    # 6) Re‐lookup GridFS filename
-    if updated_doc.get("file_id"):
-        try:
-            grid_out = await fs.open_download_stream(ObjectId(updated_doc["file_id"]))
-            updated_doc["file_name"] = grid_out.filename
-        except:
-            updated_doc["file_name"] = None
-    else:
-        updated_doc["file_name"] = None
+        # Nothing matched: either it does not exist or it is already graded
+        if "status" in query and await submissions_collection.count_documents(
+            {"_id": query["_id"]}, limit=1
+        ):
+            raise HTTPException(status_code=400, detail="Cannot change status after grading")
+        raise HTTPException(status_code=404, detail="Submission not found")
 
-    submission_out = SubmissionOut(**updated_doc)
+    # 3) Read it back with the student's name and file info joined in
+    submission_out = await get_submission_out(submission_id)
+    if not submission_out:
+        raise HTTPException(status_code=404, detail="Submission not found")
 
-    # 7) Log the activity
+    # 4) Log the activity
     if activity_action:
         log_metadata = {
             "course_id": course_id,
@@ -262,7 +397,7 @@ async def api_delete_submission(
     course_id:      str,
     post_id:        str,
     submission_id:  str,
-    current_user:   UserDB = Depends(get_current_active_user)
+    current_user:   Principal = Depends(get_current_principal)
 ):
     """
     Delete a submission and log "delete_submission" activity.
@@ -1,7 +1,7 @@
 # /app/routers/user.py
 
-from fastapi import APIRouter, Depends, HTTPException, Body, Query, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response, status
+from typing import List, Optional
 from datetime import datetime
 
 from app.crud.user import (
@@ -15,11 +15,17 @@ from app.crud.user import (
     list_accesses,         # <— make sure this is imported
 )
 from app.schemas.user import UserOut, Profile, Enrollment, Access       # <— and Access
-from app.services.auth import get_current_active_user
+from app.services.auth import get_current_active_user, get_current_principal, Principal
+from app.services.fast_json import fast_json
+from app.db.pagination import InvalidCursor, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
 from app.schemas.user import UserDB
 
 from app.schemas.activity import ActivityLogCreate
 from app.crud.activity import create_activity_log
+from app.crud.progress import list_progress
+from app.services.user_cache import user_cache
+from app.services.access_tracker import access_tracker
+from app.schemas.progress import CourseProgress
 
 from pydantic import BaseModel, Field
 
@@ -28,7 +34,7 @@ from app.crud.user import change_user_password
 router = APIRouter(
     prefix="/users",
     tags=["users"],
-    dependencies=[Depends(get_current_active_user)]
+    dependencies=[Depends(get_current_principal)]
 )
 
 @router.get("/me", response_model=UserOut)
@@ -54,7 +60,7 @@ async def read_current_user(current_user: UserDB = Depends(get_current_active_us
 )
 async def read_my_accesses(
     limit: int = Query(10, gt=0, description="Maximum number of entries to return"),
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Fetch the current user's most recent course accesses,
@@ -71,24 +77,73 @@ async def read_my_accesses(
     return accesses
 # --- END NEW ENDPOINT ---
 
+@router.get(
+    "/me/progress",
+    response_model=List[CourseProgress],
+    summary="Get your progress in several courses at once",
+    description="Reads the materialized per-course counters; defaults to all enrolled courses."
+)
+async def read_my_progress(
+    course_ids: Optional[List[str]] = Query(None, description="Course ids (repeat the parameter)"),
+    current_user: Principal = Depends(get_current_principal)
+):
+    if not course_ids:
+        course_ids = [e.courseId for e in current_user.enrollments]
+    return await list_progress(current_user.id, course_ids)
+
+def _require_admin(current_user: Principal) -> None:
+    if "admin" not in [r.lower() for r in current_user.roles]:
+        raise HTTPException(status_code=403, detail="Only admins can read internal metrics")
+
+@router.get(
+    "/cache/stats",
+    response_model=dict,
+    summary="User cache metrics",
+    description="Size, hit / miss counters and hit ratio of the in-process cache behind authentication."
+)
+async def read_user_cache_stats(current_user: Principal = Depends(get_current_principal)):
+    _require_admin(current_user)
+    return user_cache.stats()
+
+@router.get(
+    "/accesses/stats",
+    response_model=dict,
+    summary="Access tracker metrics",
+    description="Pending (user, course) pairs and flush counters of the in-process access tracker."
+)
+async def read_access_tracker_stats(current_user: Principal = Depends(get_current_principal)):
+    _require_admin(current_user)
+    return access_tracker.stats()
+
 @router.get("/", response_model=List[UserOut])
-async def read_users(current_user: UserDB = Depends(get_current_active_user)):
+async def read_users(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal)
+):
     """
-    List all users.
+    List users, newest first. Pass `limit` to page through them; the next
+    page's cursor comes back in the X-Next-Cursor header.
     """
-    users = await list_users()
+    try:
+        users, next_cursor = await list_users(limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     await create_activity_log(ActivityLogCreate(
         user_id=current_user.id,
         action="list_users",
         timestamp=datetime.utcnow(),
         metadata={"count": len(users)}
     ))
-    return users
+    return fast_json(List[UserOut], users, response)
 
 @router.get("/{user_id}", response_model=UserOut)
 async def read_user(
     user_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Get a single user by ID.
@@ -109,7 +164,7 @@ async def read_user(
 async def update_user_profile(
     user_id: str,
     profile: Profile,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Update profile for the given user.
@@ -133,7 +188,7 @@ async def update_user_profile(
 @router.get("/{user_id}/enrollments", response_model=List[Enrollment])
 async def get_enrollments(
     user_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     List all enrollments for a user.
@@ -152,7 +207,7 @@ async def get_enrollments(
 async def enroll_course(
     user_id: str,
     data: dict = Body(...),
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Enroll the user in a course.
@@ -175,7 +230,7 @@ async def enroll_course(
 async def unenroll_course(
     user_id: str,
     course_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Remove the user's enrollment from a course.
@@ -197,7 +252,7 @@ async def unenroll_course(
 )
 async def delete_user_endpoint(
     user_id: str,
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Delete a user (admins only).
@@ -221,7 +276,7 @@ class ChangePwdIn(BaseModel):
 async def change_password_endpoint(
     user_id: str,
     data: ChangePwdIn = Body(...),
-    current_user: UserDB = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Change the user's password.
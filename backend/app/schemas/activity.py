@@ -4,8 +4,10 @@ from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 
+from app.schemas.objectid import ObjectIdStr
+
 class ActivityLogBase(BaseModel):
-    user_id:   str
+    user_id:   ObjectIdStr
     action:    str                   # ex. "login", "view_course", "submit_homework", etc.
     timestamp: datetime
     metadata:  Optional[Dict[str, Any]] = None
@@ -15,7 +17,7 @@ class ActivityLogCreate(ActivityLogBase):
     pass
 
 class ActivityLogDB(ActivityLogBase):
-    id: str = Field(..., alias="_id")
+    id: ObjectIdStr = Field(..., alias="_id")
 
     class Config:
         validate_by_name = True
@@ -0,0 +1,19 @@
+# app/schemas/analytics.py
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from app.schemas.objectid import ObjectIdStr
+
+class DailyActivity(BaseModel):
+    """One row of `activity_daily`: a (day, course, action) summary."""
+    day:       datetime                 # 00:00 UTC
+    course_id: Optional[ObjectIdStr] = None
+    action:    str
+    count:     int
+    users:     int                      # distinct identified users
+
+class RollupResult(BaseModel):
+    since:     Optional[datetime] = None   # first day recomputed
+    watermark: Optional[datetime] = None   # logs before this are summarized
+    rows:      int = 0                     # summary rows written
@@ -2,14 +2,16 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
 
+from app.schemas.objectid import ObjectIdStr
+
 class CompletionCreate(BaseModel):
     user_id:    str = Field(..., description="ID of the student")
     course_id:  str = Field(..., description="ID of the course")
     post_id:    str = Field(..., description="ID of the post")
 
 class Completion(BaseModel):
-    id:         str         = Field(..., alias="_id")
-    user_id:    str
-    course_id:  str
-    post_id:    str
+    id:         ObjectIdStr = Field(..., alias="_id")
+    user_id:    ObjectIdStr
+    course_id:  ObjectIdStr
+    post_id:    ObjectIdStr
     created_at: datetime
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
+from app.schemas.objectid import ObjectIdStr
+
 class CourseBase(BaseModel):
     title: str
     description: str
@@ -14,10 +16,10 @@ class CourseCreate(CourseBase):
 
 class CourseDB(CourseBase):
     """How a course is stored in the database"""
-    id: str = Field(..., alias="_id")
+    id: ObjectIdStr = Field(..., alias="_id")
     created_at: datetime
     updated_at: datetime
-    created_by: str
+    created_by: ObjectIdStr
 
     model_config = {
         "validate_by_name": True,   # allow passing `id` instead of `_id`
@@ -1,7 +1,8 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
-import base64
+
+from app.schemas.objectid import ObjectIdStr
 
 
 # ─── When the client POSTs a new thread, we only need "title" ───
@@ -11,10 +12,10 @@ class ForumThreadCreate(BaseModel):
 
 # ─── What we store in MongoDB & return for thread-list or detail ───
 class ForumThreadDB(BaseModel):
-    id:          str       = Field(..., alias="_id")
-    course_id:   str
+    id:          ObjectIdStr = Field(..., alias="_id")
+    course_id:   ObjectIdStr
     title:       str
-    author_id:   str
+    author_id:   ObjectIdStr
     created_at:  datetime
     updated_at:  datetime
     # NOTE: messages themselves are fetched separately in get-thread-detail
@@ -36,30 +37,32 @@ class ForumThreadOut(ForumThreadDB):
 
 # ─── When showing one thread WITH its messages ───
 class ForumMessageOut(BaseModel):
-    id:          str        = Field(..., alias="_id")
-    thread_id:   str
-    author_id:   str
+    id:          ObjectIdStr = Field(..., alias="_id")
+    thread_id:   ObjectIdStr
+    author_id:   ObjectIdStr
     content:     Optional[str]       # may be None if the message only has an image
-    image_data:  Optional[bytes]     # raw bytes stored in MongoDB
+    # The image itself lives in GridFS; these point at the file endpoint
+    image_url:     Optional[str] = None
+    thumbnail_url: Optional[str] = None   # None until the thumbnail is generated
+    image_width:   Optional[int] = None
+    image_height:  Optional[int] = None
 
     created_at:  datetime
 
     model_config = {
         "populate_by_name": True,
         "from_attributes":  True,
-        # datetime → isostring, bytes → base64‐encoded string
-        "json_encoders": {
-            datetime: lambda dt: dt.isoformat(),
-            bytes:    lambda b: base64.b64encode(b).decode("utf-8")
-        }
+        "json_encoders":    { datetime: lambda dt: dt.isoformat() }
     }
 
 
 class ForumThreadDetail(ForumThreadDB):
     """
-    In the detail endpoint, we include all messages under `messages: List[ForumMessageOut]`.
+    In the detail endpoint, we include the messages under `messages: List[ForumMessageOut]`
+    (one page of them when `limit` is given; `next_cursor` fetches the next one).
     """
-    messages: List[ForumMessageOut] = []
+    messages:    List[ForumMessageOut] = []
+    next_cursor: Optional[str] = None
 
 
 # ─── We still require only "content" or an image when the client POSTs a new message ───
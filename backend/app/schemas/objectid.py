@@ -0,0 +1,18 @@
+# app/schemas/objectid.py
+#
+# ObjectId <-> str at the model boundary. Fields typed ObjectIdStr accept the
+# raw ObjectId straight out of Mongo (or an already-stringified id) and always
+# hold / serialize a 24-char hex string, so CRUD code can validate documents as
+# they come back from the driver instead of converting every id by hand.
+
+from typing import Annotated, Any
+
+from bson import ObjectId
+from pydantic import BeforeValidator
+
+
+def _oid_to_str(value: Any) -> Any:
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+ObjectIdStr = Annotated[str, BeforeValidator(_oid_to_str)]
@@ -4,11 +4,13 @@ from pydantic import BaseModel, Field
 from typing import Optional, Literal
 from datetime import datetime
 
+from app.schemas.objectid import ObjectIdStr
+
 class PostBase(BaseModel):
     title:    str
     content:  str
     type:     Literal["lecture","reminder","homework"]
-    file_id:  Optional[str]     = None
+    file_id:  Optional[ObjectIdStr] = None
     file_name: Optional[str]     = None 
     due_date: Optional[datetime] = None
 
@@ -26,9 +28,9 @@ class PostDB(PostBase):
     - Uses `_id` alias for Mongo ObjectId
     - Tracks ordering (position), pin state, and timestamps
     """
-    id:         str               = Field(..., alias="_id")
-    course_id:  str
-    author_id:  str
+    id:         ObjectIdStr       = Field(..., alias="_id")
+    course_id:  ObjectIdStr
+    author_id:  ObjectIdStr
     position:   int               # order among unpinned posts
     ispinned:   bool
     pinnedAt:   Optional[datetime] = None
@@ -41,6 +43,27 @@ class PostDB(PostBase):
         "json_encoders":    { datetime: lambda dt: dt.isoformat() }
     }
 
+class PostSummary(BaseModel):
+    """
+    Feed entry without `content`: enough to render the course's post list,
+    the body is fetched when a post is opened.
+    """
+    id:         ObjectIdStr       = Field(..., alias="_id")
+    course_id:  ObjectIdStr
+    author_id:  ObjectIdStr
+    title:      str
+    type:       Literal["lecture","reminder","homework"]
+    file_id:    Optional[ObjectIdStr] = None
+    file_name:  Optional[str]      = None
+    due_date:   Optional[datetime] = None
+    position:   int
+    ispinned:   bool
+    pinnedAt:   Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = {"populate_by_name": True}
+
 class PostOut(PostDB):
     """What we return to the client; includes file_id & due_date via inheritance."""
     pass
@@ -0,0 +1,14 @@
+# app/schemas/progress.py
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from app.schemas.objectid import ObjectIdStr
+
+class CourseProgress(BaseModel):
+    user_id:     ObjectIdStr
+    course_id:   ObjectIdStr
+    completed:   int = 0
+    total_posts: int = 0
+    progress:    int = 0            # percent, 0–100
+    updated_at:  Optional[datetime] = None
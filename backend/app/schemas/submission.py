@@ -1,9 +1,11 @@
 # app/schemas/submission.py
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
+from app.schemas.objectid import ObjectIdStr
+
 class SubmissionCreate(BaseModel):
     file_id: str
     model_config = {"validate_by_name": True}
@@ -15,12 +17,31 @@ class SubmissionGrade(BaseModel):
     model_config = {"validate_by_name": True}
 
 
+class SubmissionGradeItem(SubmissionGrade):
+    """One line of a bulk grading request."""
+    submission_id: str
+    comment:       str = ""
+
+
+class BulkGradeResult(BaseModel):
+    submission_id: str
+    status:        Literal["graded", "not_found", "invalid", "error"]
+    row:           Optional[int] = None   # CSV line number, for imports
+    error:         Optional[str] = None
+
+
+class BulkGradeResponse(BaseModel):
+    graded:  int
+    failed:  int
+    results: List[BulkGradeResult]
+
+
 class SubmissionDB(BaseModel):
-    id:         str     = Field(..., alias="_id")
-    course_id:  str
-    post_id:    str
-    student_id: str
-    file_id:    str
+    id:         ObjectIdStr = Field(..., alias="_id")
+    course_id:  ObjectIdStr
+    post_id:    ObjectIdStr
+    student_id: ObjectIdStr
+    file_id:    ObjectIdStr
     status:     str
     grade:      Optional[int]
     comment:    Optional[str]
@@ -39,6 +60,8 @@ class SubmissionOut(SubmissionDB):
     last_name:  Optional[str] = None
 
     file_name:  Optional[str] = None
+    file_size:         Optional[int] = None   # bytes, from the GridFS file
+    file_content_type: Optional[str] = None
 
     model_config = {
         "extra": "allow"
@@ -2,6 +2,8 @@ from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
 from datetime import datetime
 
+from app.schemas.objectid import ObjectIdStr
+
 class LoginIn(BaseModel):
     email: EmailStr
     password: str
@@ -31,7 +33,7 @@ class SignupIn(BaseModel):
     model_config = {"validate_by_name": True}
     
 class Enrollment(BaseModel):
-    courseId:   str
+    courseId:   ObjectIdStr
     enrolledAt: datetime
 
     model_config = {
@@ -44,7 +46,7 @@ class EnrollmentUser(BaseModel):
     A slim representation of “User” for the /courses/{id}/enrolled endpoint:
     only includes: _id, email, first_name, last_name.
     """
-    id:         str      = Field(..., alias="_id")
+    id:         ObjectIdStr = Field(..., alias="_id")
     email:      EmailStr
     first_name: str
     last_name:  str
@@ -54,7 +56,7 @@ class EnrollmentUser(BaseModel):
         form_attributes = True
 
 class Access(BaseModel):
-    courseId:   str
+    courseId:   ObjectIdStr
     accessedAt: datetime
 
     model_config = {
@@ -63,7 +65,7 @@ class Access(BaseModel):
     }
 
 class UserDB(BaseModel):
-    id:           str             = Field(..., alias="_id")
+    id:           ObjectIdStr     = Field(..., alias="_id")
     email:        EmailStr
     username:     str
     passwordHash: str
@@ -79,8 +81,22 @@ class UserDB(BaseModel):
         "from_attributes":  True
     }
 
+class EnrollmentRef(BaseModel):
+    courseId: str
+
+class TokenUser(BaseModel):
+    """
+    The caller as described by its JWT claims (see JWT_CLAIMS_MODE):
+    same id / roles / enrollments attributes as UserDB, nothing else.
+    """
+    id:          str                 = Field(..., alias="_id")
+    roles:       List[str]           = []
+    enrollments: List[EnrollmentRef] = []
+
+    model_config = {"validate_by_name": True}
+
 class UserOut(BaseModel):
-    id:        str       = Field(..., alias="_id")
+    id:        ObjectIdStr = Field(..., alias="_id")
     email:     EmailStr
     username:  str
     profile:   Profile
@@ -0,0 +1,77 @@
+# app/scripts/bench_codec.py
+#
+# Decode a 10k-post course feed: hand conversion of every ObjectId field
+# before building PostDB (the old CRUD code) vs. validating the raw
+# documents through the ObjectIdStr fields. In memory, no database needed.
+# Usage:  python -m app.scripts.bench_codec [--posts 10000] [--rounds 5]
+
+import argparse
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.schemas.post import PostDB
+
+
+def _docs(n: int) -> list:
+    course, author, now = ObjectId(), ObjectId(), datetime.utcnow()
+    return [{
+        "_id":        ObjectId(),
+        "course_id":  course,
+        "author_id":  author,
+        "title":      f"Post {i}",
+        "content":    "x" * 200,
+        "type":       "lecture",
+        "file_id":    ObjectId() if i % 3 == 0 else None,
+        "due_date":   None,
+        "position":   i,
+        "ispinned":   False,
+        "pinnedAt":   None,
+        "created_at": now,
+        "updated_at": now,
+    } for i in range(n)]
+
+
+def _hand_converted(docs: list) -> list:
+    out = []
+    for doc in docs:
+        doc = dict(doc)
+        doc["_id"]       = str(doc["_id"])
+        doc["course_id"] = str(doc["course_id"])
+        doc["author_id"] = str(doc["author_id"])
+        if doc.get("file_id"):
+            doc["file_id"] = str(doc["file_id"])
+        out.append(PostDB(**doc))
+    return out
+
+
+def _codec(docs: list) -> list:
+    return [PostDB(**doc) for doc in docs]
+
+
+def _best(fn, docs: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ObjectId decoding")
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = _docs(args.posts)
+    assert _hand_converted(docs[:10]) == _codec(docs[:10])
+    hand = _best(_hand_converted, docs, args.rounds)
+    codec = _best(_codec, docs, args.rounds)
+    print(f"{args.posts} posts: hand conversion {hand:.1f} ms, ObjectIdStr {codec:.1f} ms "
+          f"({hand / codec:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
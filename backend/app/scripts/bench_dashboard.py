@@ -0,0 +1,118 @@
+# app/scripts/bench_dashboard.py
+#
+# GET /dashboard/overview latency against the number of enrollments, for
+# the student branch (one student enrolled in N courses) and the professor
+# branch (one professor who created N courses, --students enrolled in
+# each), against a local mongod. Both branches are a single aggregation,
+# so the command count stays at 1 and the latency should stay roughly flat
+# as N grows.
+# Seeds a scratch database (dropped afterwards).
+# Usage:  python -m app.scripts.bench_dashboard [--sizes 1,10,100,1000] [--students 20] [--rounds 5]
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import InsertOne, monitoring
+
+BATCH = 5000
+
+
+class _Commands(monitoring.CommandListener):
+    """Counts the commands sent to the server."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def _seed(n: int, students: int) -> tuple:
+    """One student and one professor, each tied to `n` new courses."""
+    from app.db.mongodb import courses_collection, enrollments_collection, course_progress_collection
+
+    student, professor = ObjectId(), ObjectId()
+    now = datetime.utcnow()
+    courses = [ObjectId() for _ in range(n)]
+    await courses_collection.insert_many([
+        {"_id": c, "title": f"Course {i}", "code": f"C{i}", "description": "-",
+         "created_by": str(professor), "post_count": 10}
+        for i, c in enumerate(courses)
+    ])
+    rows = [InsertOne({"user_id": student, "course_id": c, "enrolled_at": now}) for c in courses]
+    rows += [
+        InsertOne({"user_id": ObjectId(), "course_id": c, "enrolled_at": now})
+        for c in courses for _ in range(students)
+    ]
+    for start in range(0, len(rows), BATCH):
+        await enrollments_collection.bulk_write(rows[start:start + BATCH], ordered=False)
+    await course_progress_collection.insert_many([
+        {"user_id": student, "course_id": c, "completed": i % 5}
+        for i, c in enumerate(courses)
+    ])
+    return student, professor, courses
+
+
+async def _best(fn, rounds: int, commands: _Commands) -> tuple:
+    best, sent = float("inf"), 0
+    for _ in range(rounds):
+        commands.count = 0
+        t0 = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - t0)
+        sent = commands.count
+    return best * 1000, sent
+
+
+async def _run(args, commands: _Commands) -> None:
+    # Imported here so MONGODB_DB points at the scratch database
+    from app.db.indexes import ensure_indexes
+    from app.db.mongodb import client, db
+    from app.routers.dashboard import get_overview
+    from app.schemas.user import TokenUser, EnrollmentRef
+
+    await ensure_indexes()
+    print(f"{'enrollments':>11}  {'student':>10} {'cmds':>4}  {'professor':>10} {'cmds':>4}")
+    for n in args.sizes:
+        student, professor, courses = await _seed(n, args.students)
+        as_student = TokenUser(
+            _id=str(student), roles=["student"],
+            enrollments=[EnrollmentRef(courseId=str(c)) for c in courses]
+        )
+        as_professor = TokenUser(_id=str(professor), roles=["professor"], enrollments=[])
+
+        s_ms, s_cmds = await _best(lambda: get_overview(as_student), args.rounds, commands)
+        p_ms, p_cmds = await _best(lambda: get_overview(as_professor), args.rounds, commands)
+        print(f"{n:>11}  {s_ms:8.1f}ms {s_cmds:>4}  {p_ms:8.1f}ms {p_cmds:>4}")
+
+    await client.drop_database(db.name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard overview against enrollment count")
+    parser.add_argument("--sizes", default="1,10,100,1000", help="comma-separated enrollment counts")
+    parser.add_argument("--students", type=int, default=20, help="other students per course (professor branch)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--db", default="coursey_bench_dashboard", help="scratch database (dropped)")
+    args = parser.parse_args()
+    args.sizes = [int(n) for n in args.sizes.split(",") if n.strip()]
+
+    os.environ["MONGODB_DB"] = args.db
+    commands = _Commands()
+    # registered before the client is created (app.db.mongodb is imported in _run)
+    monitoring.register(commands)
+    asyncio.run(_run(args, commands))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# app/scripts/bench_passwords.py
+#
+# Event-loop latency during a login burst, bcrypt inline vs. on the pool.
+# A probe task stands in for an unrelated endpoint hit every millisecond and
+# records how late each hit is served. No database or server needed.
+# Usage:  python -m app.scripts.bench_passwords [--logins 20] [--concurrency 10]
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services.password_pool import PasswordPool, pwd_context
+
+
+async def _probe(samples: list, stop: asyncio.Event) -> None:
+    """
+    One simulated request per millisecond; latency is measured from when it
+    was due, so requests that arrive while the loop is blocked all count.
+    """
+    loop = asyncio.get_running_loop()
+    due = loop.time()
+    while not stop.is_set():
+        await asyncio.sleep(max(due - loop.time(), 0))
+        now = loop.time()
+        while due <= now:
+            samples.append((now - due) * 1000)
+            due += 0.001
+
+
+async def _burst(verify, hashed: str, logins: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            await verify("correct horse", hashed)
+
+    samples: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(samples, stop))
+    await asyncio.sleep(0.01)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await probe
+
+    samples.sort()
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "probe_p50_ms": round(statistics.median(samples), 1),
+        "probe_p99_ms": round(samples[int(len(samples) * 0.99) - 1], 1),
+        "probe_max_ms": round(samples[-1], 1),
+    }
+
+
+async def _main(logins: int, concurrency: int) -> None:
+    hashed = pwd_context.hash("correct horse")
+
+    async def inline(plain, h):
+        await asyncio.sleep(0)      # the user lookup that precedes it
+        return pwd_context.verify(plain, h)
+
+    pool = PasswordPool(max_pending=logins)
+    print("inline:", await _burst(inline, hashed, logins, concurrency))
+    print("pool:  ", await _burst(pool.verify, hashed, logins, concurrency))
+    pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt offloading")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(_main(args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# app/scripts/bench_roster.py
+#
+# Roster queries on a large course, embedded `user.enrollments` arrays
+# (multikey index) vs. the `enrollments` collection, against a local mongod.
+# Seeds a scratch database (dropped afterwards) with --students users, each
+# enrolled in the benchmarked course plus --extra other courses.
+# Usage:  python -m app.scripts.bench_roster [--students 50000] [--extra 8] [--rounds 5]
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, InsertOne
+
+BATCH = 5000
+
+
+async def _seed(users, legacy, enrollments, students: int, extra: int, course: ObjectId) -> ObjectId:
+    others = [ObjectId() for _ in range(extra)]
+    now = datetime.utcnow()
+    probe = None
+    for start in range(0, students, BATCH):
+        new_docs, legacy_docs, rows = [], [], []
+        for i in range(start, min(start + BATCH, students)):
+            uid = ObjectId()
+            probe = probe or uid
+            when = now - timedelta(seconds=students - i)
+            courses = [course] + others
+            base = {
+                "_id": uid, "email": f"s{i}@example.com", "username": f"s{i}",
+                "passwordHash": "x" * 60, "roles": ["student"], "accesses": [],
+                "profile": {"firstName": f"F{i}", "lastName": f"L{i}", "phoneNumber": None},
+                "createdAt": when, "updatedAt": when,
+            }
+            new_docs.append(InsertOne(base))
+            legacy_docs.append(InsertOne({**base, "enrollments": [
+                {"courseId": c, "enrolledAt": when} for c in courses
+            ]}))
+            rows += [InsertOne({"user_id": uid, "course_id": c, "enrolled_at": when}) for c in courses]
+        await users.bulk_write(new_docs, ordered=False)
+        await legacy.bulk_write(legacy_docs, ordered=False)
+        await enrollments.bulk_write(rows, ordered=False)
+    await legacy.create_index([("enrollments.courseId", ASCENDING)])
+    return probe
+
+
+async def _best(fn, rounds: int) -> tuple:
+    best, n = float("inf"), 0
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        n = await fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, n
+
+
+async def _run(args) -> None:
+    # Imported here so MONGODB_DB points at the scratch database
+    from app.db.indexes import ensure_indexes
+    from app.db.mongodb import client, db, users_collection, enrollments_collection
+    from app.crud.user import list_users_by_course, list_enrollments
+
+    legacy = db.get_collection("user_embedded")
+    course = ObjectId()
+    await ensure_indexes()
+    t0 = time.perf_counter()
+    probe = await _seed(users_collection, legacy, enrollments_collection,
+                        args.students, args.extra, course)
+    print(f"seeded {args.students} students in {time.perf_counter() - t0:.1f}s")
+
+    async def legacy_roster():
+        cursor = legacy.find(
+            {"enrollments.courseId": course},
+            {"_id": 1, "email": 1, "profile.firstName": 1, "profile.lastName": 1}
+        )
+        return len(await cursor.to_list(length=None))
+
+    async def new_roster():
+        return len(await list_users_by_course(str(course)))
+
+    async def legacy_user():
+        doc = await legacy.find_one({"_id": probe}, {"enrollments": 1})
+        return len(doc["enrollments"])
+
+    async def new_user():
+        return len(await list_enrollments(str(probe)))
+
+    for label, fn in [
+        ("roster, embedded arrays", legacy_roster),
+        ("roster, enrollments",     new_roster),
+        ("one user, embedded",      legacy_user),
+        ("one user, enrollments",   new_user),
+    ]:
+        ms, n = await _best(fn, args.rounds)
+        print(f"{label:26} {ms:9.1f} ms  ({n} rows)")
+
+    await client.drop_database(db.name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark roster queries on a large course")
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--extra", type=int, default=8, help="other courses per student")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--db", default="coursey_bench_roster", help="scratch database (dropped)")
+    args = parser.parse_args()
+
+    os.environ["MONGODB_DB"] = args.db
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# app/scripts/check_fast_json.py
+#
+# Check that every endpoint answering through fast_json emits exactly the
+# bytes FastAPI's regular response_model path would: sample documents are
+# validated the way the CRUD layer does, then serialized both ways.
+# Exits non-zero on the first mismatch.
+# Usage:  python -m app.scripts.check_fast_json
+
+import asyncio
+import sys
+from datetime import datetime
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app.main import app
+from app.schemas.activity import ActivityLogDB
+from app.schemas.course import CourseDB
+from app.schemas.forum import ForumThreadOut, ForumThreadDetail, ForumMessageOut
+from app.schemas.post import PostDB
+from app.schemas.submission import SubmissionOut
+from app.schemas.user import UserOut
+from app.services.fast_json import fast_json
+
+NOW = datetime(2025, 3, 1, 8, 30, 15, 123456)
+
+
+def _samples() -> dict:
+    """route name -> (type given to fast_json, content)"""
+    oid = ObjectId
+    posts = [PostDB(**{
+        "_id": oid(), "course_id": oid(), "author_id": oid(), "title": "Séance 1 — intro",
+        "content": "Contenu « accentué » ✓", "type": t, "file_id": f, "file_name": n,
+        "due_date": d, "position": i, "ispinned": i == 0, "pinnedAt": NOW if i == 0 else None,
+        "created_at": NOW, "updated_at": NOW,
+    }) for i, (t, f, n, d) in enumerate([
+        ("lecture", None, None, None),
+        ("homework", oid(), "td1.pdf", NOW),
+        ("reminder", None, None, datetime(2025, 1, 1)),
+    ])]
+    subs = [SubmissionOut(**{
+        "_id": oid(), "course_id": oid(), "post_id": oid(), "student_id": oid(), "file_id": oid(),
+        "file_name": "rendu.zip", "file_size": 2048, "status": s, "grade": g, "comment": c,
+        "created_at": NOW, "updated_at": NOW, "first_name": "Zoé", "last_name": None,
+    }) for s, g, c in [("submitted", None, None), ("graded", 17, "Très bien")]]
+    logs = [ActivityLogDB(**{
+        "_id": oid(), "user_id": u, "action": "login", "timestamp": NOW, "metadata": m,
+    }) for u, m in [(oid(), {"email": "a@b.fr"}), ("anonymous", None), (oid(), {"n": 1.5, "l": [1, "x"]})]]
+    courses = [CourseDB(**{
+        "_id": oid(), "title": "Algèbre", "description": "…", "code": "MAT101", "background": b,
+        "created_at": NOW, "updated_at": NOW, "created_by": cb,
+    }) for b, cb in [(None, str(oid())), ("#fff", oid())]]
+    users = [UserOut(**{
+        "_id": oid(), "email": "zoe@example.com", "username": "zdupont",
+        "profile": {"firstName": "Zoé", "lastName": "Dupont", "phoneNumber": None},
+        "roles": ["student"], "enrollments": [{"courseId": oid(), "enrolledAt": NOW}],
+        "accesses": [], "createdAt": NOW, "updatedAt": NOW,
+    })]
+    threads = [ForumThreadOut(**{
+        "_id": oid(), "course_id": oid(), "title": "Question ⁇", "author_id": oid(),
+        "created_at": NOW, "updated_at": NOW,
+    })]
+    messages = [ForumMessageOut.model_construct(
+        id=str(oid()), thread_id=str(oid()), author_id=str(oid()), content=c,
+        image_url=u, thumbnail_url=None, image_width=w, image_height=w, created_at=NOW
+    ) for c, u, w in [("Bonjour", None, None), (None, "http://x/files/forum/1", 640)]]
+    detail = ForumThreadDetail(**{
+        "_id": oid(), "course_id": oid(), "title": "t", "author_id": oid(),
+        "created_at": NOW, "updated_at": NOW, "messages": messages, "next_cursor": "abc",
+    })
+    return {
+        "api_list_posts":         (List[PostDB], posts),
+        "api_list_submissions":   (List[SubmissionOut], subs),
+        "api_list_activity_logs": (List[ActivityLogDB], logs),
+        "api_list_courses":       (List[CourseDB], courses),
+        "read_users":             (List[UserOut], users),
+        "list_threads":           (List[ForumThreadOut], threads),
+        "get_thread_detail":      (ForumThreadDetail, detail),
+    }
+
+
+async def _check() -> int:
+    routes = {r.name: r for r in app.routes if isinstance(r, APIRoute)}
+    failures = 0
+    for name, (tp, content) in _samples().items():
+        route = routes[name]
+        expected = JSONResponse(
+            await serialize_response(field=route.response_field, response_content=content)
+        ).body
+        got = fast_json(tp, content).body
+        status = "ok" if got == expected else "MISMATCH"
+        print(f"{name:24} {len(got):6} bytes  {status}")
+        if got != expected:
+            failures += 1
+            print(f"  expected: {expected[:300]!r}\n  got:      {got[:300]!r}")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    sys.exit(asyncio.run(_check()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# app/scripts/check_read_routing.py
+#
+# Check where reads land on a replica set: the analytics paths (admin
+# overview, activity-log and user listings) must be served by a secondary,
+# regular reads (course feed, current user) by the primary.
+# Needs a local replica set with at least one secondary, e.g.
+#   mongod --replSet rs0 --port 27017 … ; mongod --replSet rs0 --port 27018 …
+#   MONGODB_URI="mongodb://localhost:27017,localhost:27018/?replicaSet=rs0"
+# Runs in a scratch database (dropped afterwards); exits non-zero when a read
+# lands on the wrong member.
+# Usage:  python -m app.scripts.check_read_routing [--db coursey_routing]
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+
+from pymongo import WriteConcern, monitoring
+
+_READS = {"find", "aggregate", "count", "countDocuments"}
+
+
+class _Where(monitoring.CommandListener):
+    """Records the server address of every read command."""
+
+    def __init__(self):
+        self.reads = defaultdict(set)
+
+    def started(self, event):
+        if event.command_name in _READS:
+            self.reads[event.command_name].add(event.connection_id)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def _run(where: _Where) -> int:
+    # Imported here: the listener has to be registered before the client exists
+    from app.db.mongodb import client, db, courses_collection
+    from app.crud import user, activity, post
+    from app.routers.dashboard import get_overview
+    from app.schemas.user import Profile, TokenUser
+
+    await db.command("ping")
+    await client.admin.command("ping")
+    # let the topology discover every member
+    await asyncio.sleep(2)
+    primary = client.primary
+    secondaries = client.secondaries
+    if not primary or not secondaries:
+        print("Needs a replica set with a secondary (see the header of this script)")
+        return 2
+
+    u = await user.create_user("routing@example.com", "pw", Profile(firstName="R", lastName="R"))
+    # acknowledged by every member, so the secondaries have all the data
+    course = await courses_collection.with_options(
+        write_concern=WriteConcern(w=len(secondaries) + 1, wtimeout=10000)
+    ).insert_one({"title": "R", "code": "R", "description": "-"})
+    admin = TokenUser(_id=u.id, roles=["admin"], enrollments=[])
+
+    async def reads_of(label, coro, expected):
+        where.reads.clear()
+        await coro
+        seen = set().union(*where.reads.values()) if where.reads else set()
+        ok = bool(seen) and seen <= expected
+        print(f"{label:22} {sorted(map(str, seen))}  {'ok' if ok else 'WRONG MEMBER'}")
+        return ok
+
+    ok = [
+        await reads_of("get_overview (admin)", get_overview(admin), secondaries),
+        await reads_of("list_users",           user.list_users(limit=10), secondaries),
+        await reads_of("list_activity_logs",   activity.list_activity_logs(limit=10), secondaries),
+        await reads_of("list_posts",           post.list_posts(str(course.inserted_id)), {primary}),
+        await reads_of("get_user_by_id",       user.get_user_by_id(u.id), {primary}),
+    ]
+
+    await client.drop_database(db.name)
+    return 0 if all(ok) else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check which replica set member serves each read path")
+    parser.add_argument("--db", default="coursey_routing", help="scratch database (dropped)")
+    args = parser.parse_args()
+
+    os.environ["MONGODB_DB"] = args.db
+    where = _Where()
+    monitoring.register(where)
+    sys.exit(asyncio.run(_run(where)))
+
+
+if __name__ == "__main__":
+    main()
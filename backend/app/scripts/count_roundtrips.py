@@ -0,0 +1,121 @@
+# app/scripts/count_roundtrips.py
+#
+# Count the Mongo commands each CRUD write issues, against a local mongod.
+# Runs in a scratch database (dropped afterwards) and exits non-zero when an
+# operation needs more round trips than its budget.
+# Usage:  python -m app.scripts.count_roundtrips [--db coursey_roundtrips]
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+from pymongo import monitoring
+
+# Connection handshakes and session bookkeeping are not round trips we control
+_IGNORED = {"hello", "ismaster", "isMaster", "endSessions", "ping", "buildInfo",
+            "saslStart", "saslContinue"}
+
+# operation -> max commands it may send
+BUDGETS = {
+    "create_user":        2,   # email check + insert
+    "update_user":        1,
+    "create_course":      1,
+    "update_course":      2,   # update + course version
+    "create_post":        4,   # last position + insert + progress counter + course version
+    "update_post":        2,   # update + course version
+    "pin_post":           2,   # update + course version
+    "move_up":            4,   # post + its two neighbours + conditional update + course version
+    "set_post_order":     3,   # unpinned ids + one bulk_write + course version
+    "create_completion":  2,   # insert + progress counter
+    "create_submission":  2,   # post due date + insert
+    "grade_submission":   2,   # update + enriched read ($lookup user / fs.files)
+    "create_activity_log": 1,
+}
+
+
+class _Counter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands: Counter = Counter()
+
+    def started(self, event):
+        if event.command_name not in _IGNORED:
+            target = event.command.get(event.command_name)
+            self.commands[f"{event.command_name} {target}"] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def _run(counter: _Counter) -> int:
+    # Imported here: the listener has to be registered before the client exists
+    from app.db.mongodb import client, db
+    from app.schemas.user import Profile
+    from app.schemas.course import CourseCreate
+    from app.schemas.post import PostCreate, PostUpdate
+    from app.schemas.submission import SubmissionCreate, SubmissionGrade
+    from app.schemas.activity import ActivityLogCreate
+    from app.crud import user, course, post, completion, submission, activity
+
+    async def measure(name, coro):
+        counter.commands.clear()
+        result = await coro
+        used = sum(counter.commands.values())
+        flag = "ok" if used <= BUDGETS[name] else "OVER BUDGET"
+        print(f"{name:20} {used:2} / {BUDGETS[name]}  {flag}  {dict(counter.commands)}")
+        return result, used <= BUDGETS[name]
+
+    await db.command("ping")
+    profile = Profile(firstName="Round", lastName="Trip")
+    ok = []
+
+    u, r = await measure("create_user", user.create_user("rt@example.com", "pw", profile)); ok.append(r)
+    _, r = await measure("update_user", user.update_user(u.id, profile)); ok.append(r)
+
+    course_in = CourseCreate(title="RT", description="-", code="RT1")
+    c, r = await measure("create_course", course.create_course(course_in, u.id)); ok.append(r)
+    _, r = await measure("update_course", course.update_course(c.id, course_in)); ok.append(r)
+
+    post_in = PostCreate(title="p", content="c", type="homework")
+    p, r = await measure("create_post", post.create_post(c.id, u.id, post_in)); ok.append(r)
+    _, r = await measure("update_post", post.update_post(p.id, PostUpdate(**post_in.model_dump()))); ok.append(r)
+    _, r = await measure("pin_post", post.pin_post(p.id)); ok.append(r)
+    p2 = await post.create_post(c.id, u.id, post_in)
+    p3 = await post.create_post(c.id, u.id, post_in)
+    _, r = await measure("move_up", post.move_up(p3.id)); ok.append(r)
+    _, r = await measure("set_post_order", post.set_post_order(c.id, [p2.id, p3.id])); ok.append(r)
+
+    _, r = await measure("create_completion", completion.create_completion(u.id, c.id, p.id)); ok.append(r)
+
+    sub_in = SubmissionCreate(file_id=str(p.id))
+    s, r = await measure("create_submission", submission.create_submission(c.id, p.id, u.id, sub_in)); ok.append(r)
+    _, r = await measure(
+        "grade_submission",
+        submission.grade_submission(c.id, p.id, s.id, SubmissionGrade(grade=10, comment="ok"))
+    ); ok.append(r)
+
+    log_in = ActivityLogCreate(user_id=u.id, action="rt", timestamp=datetime.utcnow(), metadata={})
+    _, r = await measure("create_activity_log", activity.create_activity_log(log_in, return_document=True)); ok.append(r)
+
+    await client.drop_database(db.name)
+    return 0 if all(ok) else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count Mongo round trips per CRUD write")
+    parser.add_argument("--db", default="coursey_roundtrips", help="scratch database (dropped)")
+    args = parser.parse_args()
+
+    os.environ["MONGODB_DB"] = args.db
+    counter = _Counter()
+    monitoring.register(counter)
+    sys.exit(asyncio.run(_run(counter)))
+
+
+if __name__ == "__main__":
+    main()
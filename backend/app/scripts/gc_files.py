@@ -0,0 +1,33 @@
+# app/scripts/gc_files.py
+#
+# Remove GridFS blobs that no post or submission references any more.
+# Usage:  python -m app.scripts.gc_files [--grace-minutes 60] [--reconcile]
+
+import argparse
+import asyncio
+from datetime import timedelta
+
+from app.services.gridfs_dedup import collect_garbage, reconcile_refs
+
+
+async def run(grace_minutes: int, reconcile: bool) -> None:
+    if reconcile:
+        changed = await reconcile_refs()
+        print(f"Recounted references, {changed} blobs corrected")
+    removed = await collect_garbage(timedelta(minutes=grace_minutes))
+    print(f"Removed {removed} unreferenced blobs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Garbage-collect unreferenced GridFS files")
+    parser.add_argument("--grace-minutes", type=int, default=60,
+                        help="keep unreferenced uploads younger than this")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="recount references from posts and submissions first")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.grace_minutes, args.reconcile))
+
+
+if __name__ == "__main__":
+    main()
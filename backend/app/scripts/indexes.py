@@ -0,0 +1,40 @@
+# app/scripts/indexes.py
+#
+# Apply the index registry and/or check that every CRUD query shape is index-backed.
+# Usage:  python -m app.scripts.indexes [--verify] [--no-create]
+# Exits with status 1 when --verify finds a COLLSCAN.
+
+import argparse
+import asyncio
+import sys
+
+from app.db.indexes import ensure_indexes, verify_query_plans
+
+
+async def run(create: bool, verify: bool) -> int:
+    if create:
+        created = await ensure_indexes()
+        for coll, names in created.items():
+            print(f"{coll}: {', '.join(names)}")
+
+    if verify:
+        failures = await verify_query_plans()
+        for line in failures:
+            print(f"FAIL {line}")
+        if failures:
+            return 1
+        print("All query shapes are index-backed")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create and verify MongoDB indexes")
+    parser.add_argument("--verify", action="store_true", help="explain() each query shape, fail on COLLSCAN")
+    parser.add_argument("--no-create", action="store_true", help="only verify, do not create indexes")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(create=not args.no_create, verify=args.verify)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# app/scripts/migrate_activity_logs.py
+#
+# Copy the plain `activity_logs` collection into the time-series activity
+# log collection, a batch at a time in _id order. Copied logs keep their
+# _id, so the script is safe to interrupt and re-run: it resumes after the
+# last _id recorded in `migrations`. Only the first batch of a run can have
+# been (partly) copied already, by a run stopped before it saved its
+# watermark; that batch is checked against the (meta.user_id, timestamp)
+# index, since a time-series collection has no _id index.
+# Logs older than the configured retention are not copied.
+# The old collection is left in place; drop it once the copy is verified.
+# Usage:  python -m app.scripts.migrate_activity_logs [--batch-size 5000]
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from app.crud.activity import log_document
+from app.db.indexes import ACTIVITY_LOG_TTL_DAYS, ensure_indexes
+from app.db.mongodb import db, activity_logs_collection, legacy_activity_logs_collection
+
+STATE_ID = "activity_logs_timeseries"
+
+
+async def _already_copied(batch: list) -> set:
+    """_ids of this batch already in the time-series collection."""
+    bounds = {}
+    for log in batch:
+        if not log.get("timestamp"):
+            continue
+        # meta.user_id as it was stored (None for anonymous logs)
+        key = log_document(log.get("user_id"), "", log["timestamp"], None)["meta"]["user_id"]
+        lo, hi = bounds.get(key, (log["timestamp"], log["timestamp"]))
+        bounds[key] = (min(lo, log["timestamp"]), max(hi, log["timestamp"]))
+    if not bounds:
+        return set()
+    query = {
+        "$or": [
+            {"meta.user_id": user_id, "timestamp": {"$gte": lo, "$lte": hi}}
+            for user_id, (lo, hi) in bounds.items()
+        ],
+        # residual filter on the buckets the index bounds select
+        "_id": {"$in": [log["_id"] for log in batch]}
+    }
+    return {d["_id"] async for d in activity_logs_collection.find(query, {"_id": 1})}
+
+
+async def migrate(batch_size: int) -> int:
+    await ensure_indexes()
+    state = db.get_collection("migrations")
+    last = await state.find_one({"_id": STATE_ID})
+
+    query: dict = {}
+    if ACTIVITY_LOG_TTL_DAYS:
+        query["timestamp"] = {"$gte": datetime.utcnow() - timedelta(days=ACTIVITY_LOG_TTL_DAYS)}
+    last_id = last["last_id"] if last else None
+
+    copied = 0
+    first = True
+    while True:
+        page = dict(query, **({"_id": {"$gt": last_id}} if last_id else {}))
+        batch = await legacy_activity_logs_collection.find(page).sort("_id", 1) \
+            .limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return copied
+
+        ids = [log["_id"] for log in batch]
+        present = await _already_copied(batch) if first else set()
+        first = False
+        docs = [
+            {"_id": log["_id"], **log_document(
+                log.get("user_id"), log.get("action", ""), log["timestamp"], log.get("metadata")
+            )}
+            for log in batch if log["_id"] not in present and log.get("timestamp")
+        ]
+        if docs:
+            await activity_logs_collection.insert_many(docs, ordered=False)
+
+        last_id = ids[-1]
+        await state.update_one({"_id": STATE_ID}, {"$set": {"last_id": last_id}}, upsert=True)
+        copied += len(docs)
+        print(f"… {copied} logs copied")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Copy activity logs into the time-series collection")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    copied = asyncio.run(migrate(args.batch_size))
+    print(f"Done: {copied} logs copied to {activity_logs_collection.name}")
+
+
+if __name__ == "__main__":
+    main()
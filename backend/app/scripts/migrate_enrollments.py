@@ -0,0 +1,94 @@
+# app/scripts/migrate_enrollments.py
+#
+# Move the embedded `user.enrollments` arrays into the `enrollments`
+# collection, a batch of users at a time, then drop the old multikey index.
+# Safe to interrupt and re-run: a user's array is only removed after its
+# entries were upserted, and upserts of already-copied pairs are no-ops
+# (the first enrolledAt wins). Legacy string course ids are converted to
+# ObjectIds; entries whose courseId is not a valid id are kept on the user
+# under `enrollments_unmigrated` and reported.
+# Usage:  python -m app.scripts.migrate_enrollments [--batch-size 500]
+
+import argparse
+import asyncio
+from typing import Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+from app.db.indexes import ensure_indexes
+from app.db.mongodb import users_collection, enrollments_collection
+
+
+def _course_oid(value) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if isinstance(value, str) and ObjectId.is_valid(value) else None
+
+
+async def migrate(batch_size: int) -> Tuple[int, int]:
+    # the unique (user_id, course_id) index makes the upserts idempotent
+    await ensure_indexes()
+    copied = skipped = 0
+    while True:
+        batch = await users_collection.find(
+            {"enrollments": {"$exists": True}},
+            {"enrollments": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        ops, unmigrated = [], []
+        for user in batch:
+            invalid = []
+            for e in user.get("enrollments") or []:
+                course_id = _course_oid(e.get("courseId"))
+                if course_id is None:
+                    invalid.append(e)
+                    continue
+                ops.append(UpdateOne(
+                    {"user_id": user["_id"], "course_id": course_id},
+                    # entries without a date get the user's creation time
+                    {"$setOnInsert": {"enrolled_at": e.get("enrolledAt")
+                                      or user["_id"].generation_time.replace(tzinfo=None)}},
+                    upsert=True
+                ))
+            if invalid:
+                print(f"user {user['_id']}: {len(invalid)} enrollment(s) with an invalid courseId kept aside")
+                unmigrated.append(UpdateOne(
+                    {"_id": user["_id"]},
+                    {"$push": {"enrollments_unmigrated": {"$each": invalid}}}
+                ))
+                skipped += len(invalid)
+        if ops:
+            await enrollments_collection.bulk_write(ops, ordered=False)
+        if unmigrated:
+            await users_collection.bulk_write(unmigrated, ordered=False)
+        await users_collection.update_many(
+            {"_id": {"$in": [user["_id"] for user in batch]}},
+            {"$unset": {"enrollments": ""}}
+        )
+        copied += len(ops)
+        print(f"… {copied} enrollments copied, {skipped} skipped")
+
+    try:
+        await users_collection.drop_index("enrollments_course")
+    except OperationFailure:
+        pass    # already dropped
+    return copied, skipped
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move embedded enrollments into their own collection")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    copied, skipped = asyncio.run(migrate(args.batch_size))
+    print(f"Done: {copied} enrollments in the enrollments collection")
+    if skipped:
+        print(f"{skipped} entries had no valid courseId: see `enrollments_unmigrated` on those users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# app/scripts/migrate_forum_images.py
+#
+# Move inline `messages.image_data` bytes into the forum_images GridFS bucket,
+# a batch at a time. Safe to interrupt and re-run: only messages that still
+# carry `image_data` are picked up.
+# Usage:  python -m app.scripts.migrate_forum_images [--batch-size 100]
+
+import argparse
+import asyncio
+
+from app.db.mongodb import forum_fs, messages_collection
+from app.services.forum_images import generate_thumbnail, sniff_content_type
+
+
+async def migrate(batch_size: int) -> int:
+    moved = 0
+    while True:
+        batch = await messages_collection.find(
+            {"image_data": {"$exists": True}},
+            {"image_data": 1, "author_id": 1}
+        ).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return moved
+
+        for msg in batch:
+            data = msg["image_data"]
+            if not data:
+                await messages_collection.update_one(
+                    {"_id": msg["_id"]}, {"$unset": {"image_data": ""}}
+                )
+                continue
+
+            image_id = await forum_fs.upload_from_stream(
+                f"{msg['_id']}",
+                data,
+                metadata={
+                    "contentType": sniff_content_type(data),
+                    "uploaded_by": str(msg.get("author_id")),
+                    "message_id":  msg["_id"]
+                }
+            )
+            await messages_collection.update_one(
+                {"_id": msg["_id"]},
+                {"$set": {"image_id": image_id}, "$unset": {"image_data": ""}}
+            )
+            await generate_thumbnail(msg["_id"], image_id)
+            moved += 1
+        print(f"… {moved} images moved")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move inline forum images into GridFS")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    moved = asyncio.run(migrate(args.batch_size))
+    print(f"Done: {moved} images moved to GridFS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# app/scripts/rebuild_progress.py
+#
+# Recompute the `course_progress` counters from `completions` and `post`.
+# Usage:  python -m app.scripts.rebuild_progress [--batch-size 1000]
+
+import argparse
+import asyncio
+
+from app.crud.progress import rebuild_progress
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild course progress counters")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    result = asyncio.run(rebuild_progress(batch_size=args.batch_size))
+    print(f"Rebuilt {result['counters']} counters, reset {result['reset']} stale ones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# app/scripts/renumber_posts.py
+#
+# Re-space the unpinned posts of every course POSITION_GAP apart (keeping
+# their current order). Run once before creating the unique
+# course_position_unique index on a database that may hold duplicate
+# positions left by the old swap-based moves.
+# Usage:  python -m app.scripts.renumber_posts
+
+import argparse
+import asyncio
+
+from app.db.mongodb import posts_collection
+from app.crud.post import renumber_posts
+
+
+async def _run() -> int:
+    courses = await posts_collection.distinct("course_id", {"ispinned": False})
+    total = 0
+    for course_id in courses:
+        total += await renumber_posts(str(course_id))
+    print(f"Renumbered {total} posts in {len(courses)} courses")
+    return total
+
+
+def main() -> None:
+    argparse.ArgumentParser(description="Re-space post positions in every course").parse_args()
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# app/scripts/rollup_activity.py
+#
+# Summarize the activity logs into `activity_daily` (what the API scheduler
+# does every ACTIVITY_ROLLUP_INTERVAL seconds), e.g. from cron with
+# ACTIVITY_ROLLUP_INTERVAL=0 on the API processes.
+# --rebuild recomputes every day still covered by the logs.
+# --check then compares the per-action totals of the last --days days with
+# the same aggregation run directly on the logs (up to the watermark), and
+# exits non-zero on any difference.
+# Usage:  python -m app.scripts.rollup_activity [--rebuild] [--check] [--days 7]
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.db.mongodb import activity_logs_collection
+from app.crud.analytics import activity_by_action, rollup_activity, rollup_watermark, day_start
+
+
+async def _check(days: int) -> bool:
+    watermark = await rollup_watermark()
+    if watermark is None:
+        print("Nothing rolled up yet")
+        return True
+    since = day_start(datetime.utcnow() - timedelta(days=days - 1))
+
+    t0 = time.perf_counter()
+    raw = await activity_logs_collection.aggregate([
+        {"$match": {"timestamp": {"$gte": since, "$lt": watermark}}},
+        {"$group": {"_id": "$_id", "action": {"$first": "$meta.action"}}},
+        {"$group": {"_id": "$action", "count": {"$sum": 1}}}
+    ]).to_list(length=None)
+    raw_ms = (time.perf_counter() - t0) * 1000
+    raw = {r["_id"]: r["count"] for r in raw}
+
+    t0 = time.perf_counter()
+    summed = await activity_by_action(since)
+    sum_ms = (time.perf_counter() - t0) * 1000
+
+    ok = True
+    for action in sorted(set(raw) | set(summed), key=str):
+        mark = "" if raw.get(action, 0) == summed.get(action, 0) else "  MISMATCH"
+        ok = ok and not mark
+        print(f"{str(action):28} logs={raw.get(action, 0):>9}  summaries={summed.get(action, 0):>9}{mark}")
+    print(f"logs: {raw_ms:.1f} ms, summaries: {sum_ms:.1f} ms (as of {watermark:%Y-%m-%d %H:%M:%S})")
+    return ok
+
+
+async def _run(args) -> int:
+    result = await rollup_activity(rebuild=args.rebuild)
+    print(f"Rolled up from {result.since} to {result.watermark}: {result.rows} summary rows")
+    if args.check and not await _check(args.days):
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Roll activity logs up into daily summaries")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every retained day")
+    parser.add_argument("--check", action="store_true", help="compare the summaries with the raw logs")
+    parser.add_argument("--days", type=int, default=7, help="window compared by --check")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# app/scripts/trim_accesses.py
+#
+# Bring existing `user.accesses` arrays to the shape the access tracker
+# maintains: sorted by accessedAt (newest first), one entry per course and
+# at most RECENT_ACCESSES long. One update_many; safe to re-run.
+# Usage:  python -m app.scripts.trim_accesses
+
+import argparse
+import asyncio
+
+from app.db.mongodb import users_collection
+from app.services.access_tracker import RECENT_ACCESSES, merge_accesses
+
+
+async def trim() -> int:
+    res = await users_collection.update_many(
+        {"accesses.0": {"$exists": True}},
+        merge_accesses([])
+    )
+    return res.modified_count
+
+
+def main() -> None:
+    argparse.ArgumentParser(description="Sort and cap the stored course accesses").parse_args()
+    modified = asyncio.run(trim())
+    print(f"Trimmed the accesses of {modified} users to {RECENT_ACCESSES} entries")
+
+
+if __name__ == "__main__":
+    main()
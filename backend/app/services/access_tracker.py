@@ -0,0 +1,153 @@
+# /app/services/access_tracker.py
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from app.db.mongodb import users_collection
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger("uvicorn.error")
+
+# Tracker settings
+FLUSH_INTERVAL  = float(os.getenv("ACCESS_FLUSH_INTERVAL", "5.0"))
+# Distinct (user, course) pairs held before an early flush
+MAX_PENDING     = int(os.getenv("ACCESS_MAX_PENDING", "50000"))
+# Length of each user's `accesses` list (most recent first)
+RECENT_ACCESSES = int(os.getenv("RECENT_ACCESSES", "20"))
+
+Key = Tuple[ObjectId, ObjectId]
+
+
+def merge_accesses(entries: List[dict]) -> List[dict]:
+    """
+    Pipeline update merging `entries` into `accesses` in one atomic write:
+    newest first, one entry per course (the latest wins, whichever flush
+    wrote it), RECENT_ACCESSES long. Needs MongoDB 5.2+ ($sortArray).
+    """
+    merged = {"$sortArray": {
+        "input":  {"$concatArrays": [{"$ifNull": ["$accesses", []]}, entries]},
+        "sortBy": {"accessedAt": -1}
+    }}
+    unique = {"$reduce": {
+        "input":        merged,
+        "initialValue": [],
+        "in": {"$cond": [
+            {"$in": ["$$this.courseId", "$$value.courseId"]},
+            "$$value",
+            {"$concatArrays": ["$$value", ["$$this"]]}
+        ]}
+    }}
+    return [{"$set": {"accesses": {"$slice": [unique, RECENT_ACCESSES]}}}]
+
+
+class AccessTracker:
+    """
+    Coalesces course views in memory: only the latest time per
+    (user, course) is kept, and a background task writes them every
+    FLUSH_INTERVAL seconds (sooner past MAX_PENDING pairs) in one
+    bulk_write with a single pipeline update per user, so flushes from
+    several workers never interleave inside a user's list. A page view
+    itself does no database I/O.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Key, datetime] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"recorded": 0, "written": 0, "failed": 0, "flushes": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> dict:
+        return {"running": self.running, "pending": len(self._pending), **self.counters}
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write whatever is still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def record(self, user_id: str, course_id: str, when: Optional[datetime] = None) -> None:
+        """
+        Note that `user_id` viewed `course_id`. If the tracker is not running
+        (scripts, tests), the access is written right away.
+        """
+        key = (ObjectId(user_id), ObjectId(course_id))
+        when = when or datetime.utcnow()
+        if when > self._pending.get(key, datetime.min):
+            self._pending[key] = when
+        self.counters["recorded"] += 1
+        if not self.running:
+            await self.flush()
+        elif len(self._pending) >= self.max_pending:
+            self._wake.set()
+
+    def pending_for(self, user_id: str) -> List[dict]:
+        """Accesses of this user not flushed yet, as stored entries."""
+        uid = ObjectId(user_id)
+        return [
+            {"courseId": course, "accessedAt": when}
+            for (user, course), when in self._pending.items() if user == uid
+        ]
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        by_user: Dict[ObjectId, List[dict]] = defaultdict(list)
+        for (user, course), when in batch.items():
+            by_user[user].append({"courseId": course, "accessedAt": when})
+
+        ops = [UpdateOne({"_id": user}, merge_accesses(entries)) for user, entries in by_user.items()]
+
+        self.counters["flushes"] += 1
+        try:
+            await users_collection.bulk_write(ops, ordered=False)
+            self.counters["written"] += len(batch)
+        except asyncio.CancelledError:
+            # Shutting down mid-write: keep the batch for stop() to flush
+            for key, when in batch.items():
+                if when > self._pending.get(key, datetime.min):
+                    self._pending[key] = when
+            raise
+        except PyMongoError as e:
+            self.counters["failed"] += len(batch)
+            logger.error(f"Access flush of {len(batch)} entries failed: {e}")
+        for user in by_user:
+            user_cache.invalidate(str(user))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+
+# Process-wide tracker, started/stopped by app.main
+access_tracker = AccessTracker()
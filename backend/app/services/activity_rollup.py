@@ -0,0 +1,84 @@
+# /app/services/activity_rollup.py
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+
+from pymongo.errors import PyMongoError
+
+from app.crud.analytics import rollup_activity
+from app.schemas.analytics import RollupResult
+
+logger = logging.getLogger("uvicorn.error")
+
+# Seconds between two rollups of the activity logs (0 = only on demand)
+ROLLUP_INTERVAL = float(os.getenv("ACTIVITY_ROLLUP_INTERVAL", "900"))
+
+
+class ActivityRollup:
+    """
+    Runs rollup_activity() every ROLLUP_INTERVAL seconds, and on demand
+    through run(). Runs never overlap within a process; across processes
+    they are harmless (each one replaces whole days with the same result).
+    """
+
+    def __init__(self, interval: float = ROLLUP_INTERVAL):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[datetime] = None
+        self.last_result: Optional[RollupResult] = None
+        self.counters = {"runs": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> dict:
+        return {
+            "running":   self.running,
+            "interval":  self.interval,
+            "last_run":  self.last_run,
+            "watermark": self.last_result.watermark if self.last_result else None,
+            **self.counters,
+        }
+
+    async def start(self) -> None:
+        if self.running or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self, rebuild: bool = False) -> RollupResult:
+        async with self._lock:
+            self.counters["runs"] += 1
+            try:
+                result = await rollup_activity(rebuild=rebuild)
+            except PyMongoError:
+                self.counters["failed"] += 1
+                raise
+            self.last_run = datetime.utcnow()
+            self.last_result = result
+            return result
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run()
+            except PyMongoError as e:
+                logger.error(f"Activity rollup failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Process-wide scheduler, started/stopped by app.main
+activity_rollup = ActivityRollup()
@@ -0,0 +1,236 @@
+# /app/services/activity_writer.py
+
+import asyncio
+import logging
+import os
+from typing import List, Optional
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.db.mongodb import activity_logs_collection
+
+logger = logging.getLogger("uvicorn.error")
+
+# Writer settings
+QUEUE_SIZE      = int(os.getenv("ACTIVITY_LOG_QUEUE_SIZE", "10000"))
+BATCH_SIZE      = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "500"))
+FLUSH_INTERVAL  = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "1.0"))
+# What to do when the queue is full: "block" (wait up to BLOCK_TIMEOUT, then drop),
+# "drop" (discard the new event right away) or "spill" (append it to SPILL_PATH).
+OVERFLOW_POLICY = os.getenv("ACTIVITY_LOG_OVERFLOW", "block").lower()
+BLOCK_TIMEOUT   = float(os.getenv("ACTIVITY_LOG_BLOCK_TIMEOUT", "0.05"))
+SPILL_PATH      = os.getenv("ACTIVITY_LOG_SPILL_PATH", "activity_logs.spill.jsonl")
+
+
+class ActivityLogWriter:
+    """
+    In-process pipeline for activity logs.
+    Callers push documents onto a bounded queue without waiting on Mongo;
+    a single background task drains it with unordered insert_many, either
+    when BATCH_SIZE documents are pending or every FLUSH_INTERVAL seconds.
+
+    Delivery is at-least-once: a batch cancelled mid-write is queued again,
+    and a batch spilled after an error may already have been applied. The
+    time-series collection has no unique _id index to reject the second
+    copy, so each document gets its _id before the first attempt and
+    readers that count (app.crud.analytics) deduplicate on it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        overflow: str = OVERFLOW_POLICY,
+        spill_path: str = SPILL_PATH,
+    ):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {
+            "enqueued": 0,
+            "written":  0,
+            "dropped":  0,
+            "spilled":  0,
+            "failed":   0,
+            "flushes":  0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> dict:
+        """Queue depth and lifetime counters."""
+        return {
+            "running":     self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_max":   self.maxsize,
+            "overflow":    self.overflow,
+            **self.counters,
+        }
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        await self._replay_spill()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer task and flush whatever is still queued."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def submit(self, doc: dict) -> bool:
+        """
+        Queue a document for insertion. Returns False if it was dropped.
+        If the writer is not running (scripts, tests), insert it directly.
+        """
+        if not self.running:
+            await self._write([doc])
+            return True
+
+        try:
+            self._queue.put_nowait(doc)
+            self.counters["enqueued"] += 1
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow == "block":
+            try:
+                await asyncio.wait_for(self._queue.put(doc), timeout=BLOCK_TIMEOUT)
+                self.counters["enqueued"] += 1
+                return True
+            except asyncio.TimeoutError:
+                pass
+        elif self.overflow == "spill" and self._spill([doc]):
+            return True
+
+        self.counters["dropped"] += 1
+        return False
+
+    async def submit_many(self, docs: List[dict]) -> int:
+        """Queue several documents; returns how many were accepted."""
+        if not self.running:
+            await self._write(docs)
+            return len(docs)
+        accepted = 0
+        for doc in docs:
+            accepted += await self.submit(doc)
+        return accepted
+
+    async def flush(self) -> None:
+        """Write everything currently queued."""
+        if not self._queue:
+            return
+        while not self._queue.empty():
+            await self._write(self._drain(self.batch_size))
+
+    # ─── internals ───
+
+    def _drain(self, limit: int) -> List[dict]:
+        batch: List[dict] = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                batch.extend(self._drain(self.batch_size - len(batch)))
+                if len(batch) >= self.batch_size:
+                    break
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                # Shutting down mid-write: put the batch back for stop() to flush.
+                for doc in batch:
+                    try:
+                        self._queue.put_nowait(doc)
+                    except asyncio.QueueFull:
+                        if not self._spill([doc]):
+                            self.counters["dropped"] += 1
+                raise
+
+    async def _write(self, batch: List[dict]) -> None:
+        if not batch:
+            return
+        self.counters["flushes"] += 1
+        # fixed before the first attempt: a retried copy keeps the same _id
+        for doc in batch:
+            doc.setdefault("_id", ObjectId())
+        try:
+            res = await activity_logs_collection.insert_many(batch, ordered=False)
+            self.counters["written"] += len(res.inserted_ids)
+        except BulkWriteError as e:
+            written = e.details.get("nInserted", 0)
+            self.counters["written"] += written
+            self.counters["failed"] += len(batch) - written
+            logger.error(f"Activity log batch partially failed: {e.details.get('writeErrors', [])[:1]}")
+        except PyMongoError as e:
+            logger.error(f"Activity log batch of {len(batch)} failed: {e}")
+            if not self._spill(batch):
+                self.counters["failed"] += len(batch)
+
+    def _spill(self, docs: List[dict]) -> bool:
+        """Append documents to the spill file (Extended JSON, one per line)."""
+        if not self.spill_path:
+            return False
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as fh:
+                for doc in docs:
+                    fh.write(json_util.dumps(doc) + "\n")
+        except OSError as e:
+            logger.error(f"Could not spill activity logs to {self.spill_path}: {e}")
+            return False
+        self.counters["spilled"] += len(docs)
+        return True
+
+    async def _replay_spill(self) -> None:
+        """On start, insert anything a previous run spilled to disk."""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        replay_path = self.spill_path + ".replay"
+        os.replace(self.spill_path, replay_path)
+        batch: List[dict] = []
+        with open(replay_path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    batch.append(json_util.loads(line))
+                if len(batch) >= self.batch_size:
+                    await self._write(batch)
+                    batch = []
+        await self._write(batch)
+        os.remove(replay_path)
+        logger.info("Replayed spilled activity logs")
+
+
+# Process-wide writer, started/stopped by app.main
+activity_writer = ActivityLogWriter()
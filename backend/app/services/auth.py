@@ -2,35 +2,44 @@
 
 import os
 from datetime import datetime, timedelta
-from typing import Annotated, Optional
+from typing import Annotated, Optional, Union
 
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
 
 from app.crud.user import get_user_by_id, authenticate_user
-from app.schemas.user import UserDB
+from app.schemas.user import UserDB, TokenUser
+from app.services.user_cache import user_cache
+from app.services.password_pool import pwd_context
 
 # Load .env into os.environ
 load_dotenv()
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
     raise RuntimeError("SECRET_KEY environment variable not set")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+# When enabled, tokens also carry the user's roles and enrolled course ids and
+# get_current_principal trusts them without touching the database. They are a
+# snapshot taken at issue time: changes made elsewhere only show up once the
+# token is renewed, so keep ACCESS_TOKEN_EXPIRE_MINUTES short with this on.
+JWT_CLAIMS_MODE = os.getenv("JWT_CLAIMS_MODE", "0").lower() in ("1", "true", "yes")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# What get_current_principal resolves to
+Principal = Union[UserDB, TokenUser]
+
 
 def hash_password(password: str) -> str:
-    """Hash a plaintext password."""
+    """
+    Hash a plaintext password (blocking; request handlers go through
+    app.services.password_pool instead).
+    """
     return pwd_context.hash(password)
 
 
@@ -54,32 +63,57 @@ def create_access_token(
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)]
-) -> UserDB:
+def token_claims(user: UserDB) -> dict:
     """
-    Decode the JWT, look up the user in the database (normalized by get_user_by_id),
-    and return a UserDB instance, or 401 if the token is invalid.
+    Payload for a user's access token: just the subject, plus roles and
+    enrolled course ids when JWT_CLAIMS_MODE is on.
     """
-    credentials_exc = HTTPException(
+    claims = {"sub": user.id}
+    if JWT_CLAIMS_MODE:
+        claims["roles"] = list(user.roles)
+        claims["enr"] = [e.courseId for e in user.enrollments]
+    return claims
+
+
+def _credentials_exc() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if not user_id:
-            raise credentials_exc
     except JWTError:
-        raise credentials_exc
+        raise _credentials_exc()
+    if not payload.get("sub"):
+        raise _credentials_exc()
+    return payload
+
+
+async def _load_user(user_id: str) -> UserDB:
+    """UserDB for a token subject, served from the user cache when possible."""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await get_user_by_id(user_id)
+        if not user:
+            raise _credentials_exc()
+        user_cache.put(user)
+    return user
 
-    user = await get_user_by_id(user_id)
-    if not user:
-        raise credentials_exc
 
-    return user
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)]
+) -> UserDB:
+    """
+    Decode the JWT, look up the user (normalized by get_user_by_id, cached for
+    USER_CACHE_TTL seconds) and return a UserDB instance, or 401 if the token
+    is invalid.
+    """
+    payload = _decode_token(token)
+    return await _load_user(payload["sub"])
 
 
 async def get_current_active_user(
@@ -90,3 +124,21 @@ async def get_current_active_user(
     Currently just passes through the authenticated user.
     """
     return current_user
+
+
+async def get_current_principal(
+    token: Annotated[str, Depends(oauth2_scheme)]
+) -> Principal:
+    """
+    Who is calling, for handlers that only need id / roles / enrollments.
+    In JWT_CLAIMS_MODE a token carrying those claims is enough (no database
+    round-trip); otherwise this is the (cached) UserDB.
+    """
+    payload = _decode_token(token)
+    if JWT_CLAIMS_MODE and "roles" in payload and "enr" in payload:
+        return TokenUser(
+            _id=payload["sub"],
+            roles=payload["roles"],
+            enrollments=[{"courseId": c} for c in payload["enr"]]
+        )
+    return await _load_user(payload["sub"])
@@ -0,0 +1,33 @@
+# /app/services/etag.py
+
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Browsers must revalidate every time, but may keep the body to do it
+CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(p) for p in parts) + '"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison (RFC 9110 §13.1.2): W/ prefixes are ignored."""
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(c.strip().removeprefix("W/") == tag for c in if_none_match.split(","))
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    A 304 when the client already holds `etag`; otherwise None, after
+    putting the ETag on the response that is about to be built.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    header = request.headers.get("if-none-match")
+    if header and _matches(header, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,42 @@
+# /app/services/fast_json.py
+
+import os
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+# Set FAST_RESPONSES=0 to hand everything back to FastAPI's regular
+# response_model path (e.g. to compare outputs).
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "1") != "0"
+
+
+@lru_cache(maxsize=None)
+def _adapter(tp: Any) -> TypeAdapter:
+    """One compiled pydantic-core serializer per response type."""
+    return TypeAdapter(tp)
+
+
+def fast_json(tp: Any, content: Any, response: Optional[Response] = None) -> Any:
+    """
+    Serialize already-built models straight to JSON bytes.
+
+    With a response_model, FastAPI dumps the return value to a dict,
+    validates it again into the response model, then encodes that; for data
+    we just built from the database all three passes are redundant. `tp` must
+    be the exact type of `content` (e.g. List[PostDB]) and produce the same
+    fields as the route's response_model — the route keeps its response_model
+    for the OpenAPI schema. Headers set on the injected `response` (cursor,
+    ETag, …) are carried over.
+    """
+    if not FAST_RESPONSES:
+        return content
+    out = Response(_adapter(tp).dump_json(content, by_alias=True), media_type="application/json")
+    if response is not None:
+        for key, value in response.headers.items():
+            if key != "content-length":
+                out.headers[key] = value
+        if response.status_code:
+            out.status_code = response.status_code
+    return out
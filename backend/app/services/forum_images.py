@@ -0,0 +1,93 @@
+# /app/services/forum_images.py
+#
+# Forum message images live in the "forum_images" GridFS bucket; a message only
+# keeps `image_id` plus, once the thumbnail generator has run, `image_width`,
+# `image_height` and `thumbnail_id`. Thumbnails need Pillow; without it images
+# are still stored and served, just without previews or dimensions.
+
+import asyncio
+import io
+import logging
+from typing import Optional, Tuple
+
+from bson import ObjectId
+
+from app.db.mongodb import forum_fs, messages_collection
+from app.crud.course_version import bump_course_version
+
+logger = logging.getLogger("uvicorn.error")
+
+THUMBNAIL_SIZE = (320, 320)
+
+
+def sniff_content_type(data: bytes) -> str:
+    """Best-effort image MIME type from the magic bytes."""
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def _make_thumbnail(data: bytes) -> Optional[Tuple[int, int, bytes, str]]:
+    """(width, height, thumbnail bytes, content type), or None without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        img.thumbnail(THUMBNAIL_SIZE)
+        out = io.BytesIO()
+        if img.mode in ("RGBA", "LA", "P"):
+            img.save(out, format="PNG", optimize=True)
+            content_type = "image/png"
+        else:
+            img.convert("RGB").save(out, format="JPEG", quality=80)
+            content_type = "image/jpeg"
+    return width, height, out.getvalue(), content_type
+
+
+async def generate_thumbnail(
+    message_id: ObjectId,
+    image_id: ObjectId,
+    course_id: Optional[str] = None
+) -> None:
+    """
+    Background task: read the original, record its dimensions and store a
+    small preview next to it. Failures are logged, never raised.
+    With `course_id`, the course version is bumped so cached thread views
+    pick up the thumbnail.
+    """
+    try:
+        grid_out = await forum_fs.open_download_stream(image_id)
+        data = await grid_out.read()
+
+        # Pillow is CPU-bound: keep it off the event loop
+        result = await asyncio.to_thread(_make_thumbnail, data)
+        if result is None:
+            return
+        width, height, thumb, content_type = result
+
+        thumb_id = await forum_fs.upload_from_stream(
+            f"thumb_{grid_out.filename}",
+            thumb,
+            metadata={"contentType": content_type, "thumbnail_of": image_id}
+        )
+        await messages_collection.update_one(
+            {"_id": message_id},
+            {"$set": {
+                "image_width":  width,
+                "image_height": height,
+                "thumbnail_id": thumb_id
+            }}
+        )
+        if course_id:
+            await bump_course_version(course_id)
+    except Exception as e:
+        logger.error(f"Thumbnail generation failed for message {message_id}: {e}")
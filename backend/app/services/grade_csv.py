@@ -0,0 +1,102 @@
+# /app/services/grade_csv.py
+
+import codecs
+import csv
+import io
+import os
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+from app.schemas.submission import SubmissionGradeItem, BulkGradeResult
+
+# Largest CSV body accepted by the grade import (bytes)
+GRADE_CSV_MAX_BYTES = int(os.getenv("GRADE_CSV_MAX_BYTES", str(5 * 1024 * 1024)))
+
+COLUMNS = ("submission_id", "grade", "comment")
+
+# (row number, parsed item or the "invalid" result for that row)
+GradeRow = Tuple[int, Union[SubmissionGradeItem, BulkGradeResult]]
+
+
+def _record_end(text: str) -> int:
+    """
+    Offset just past the last newline that ends a CSV record, i.e. is not
+    inside a quoted field (0 if there is none yet).
+    """
+    idx = text.rfind("\n")
+    while idx >= 0 and text.count('"', 0, idx) % 2:
+        idx = text.rfind("\n", 0, idx)
+    return idx + 1
+
+
+async def _records(chunks: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[List[str]]:
+    """Decode and split a streamed CSV body, one complete record at a time."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"CSV too large (limit {max_bytes // (1024 * 1024)} MB)"
+            )
+        try:
+            pending += decoder.decode(chunk)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV must be UTF-8")
+        cut = _record_end(pending)
+        if cut:
+            for record in csv.reader(io.StringIO(pending[:cut])):
+                yield record
+            pending = pending[cut:]
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        for record in csv.reader(io.StringIO(pending)):
+            yield record
+
+
+def _header(record: List[str]) -> Optional[List[int]]:
+    """Column positions if `record` is a header naming our columns."""
+    names = [c.strip().lower() for c in record]
+    if "submission_id" not in names or "grade" not in names:
+        return None
+    return [names.index(c) if c in names else -1 for c in COLUMNS]
+
+
+async def iter_grade_rows(
+    chunks: AsyncIterator[bytes],
+    max_bytes: int = GRADE_CSV_MAX_BYTES
+) -> AsyncIterator[GradeRow]:
+    """
+    Parse `submission_id,grade,comment` rows from a streamed body. A header
+    row is optional (and may reorder the columns); blank lines are skipped.
+    """
+    positions = [0, 1, 2]
+    row = 0
+    async for record in _records(chunks, max_bytes):
+        row += 1
+        if not any(field.strip() for field in record):
+            continue
+        if row == 1:
+            header = _header(record)
+            if header:
+                positions = header
+                continue
+
+        values = {
+            name: record[pos].strip() if 0 <= pos < len(record) else ""
+            for name, pos in zip(COLUMNS, positions)
+        }
+        try:
+            yield row, SubmissionGradeItem(**values)
+        except ValidationError as e:
+            err = e.errors()[0]
+            yield row, BulkGradeResult(
+                submission_id=values["submission_id"],
+                status="invalid",
+                row=row,
+                error=f"{err['loc'][0]}: {err['msg']}"
+            )
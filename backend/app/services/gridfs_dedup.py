@@ -0,0 +1,179 @@
+# /app/services/gridfs_dedup.py
+#
+# Content-addressed storage for the default GridFS bucket (post attachments
+# and submissions). Every blob carries, in its fs.files metadata:
+#   sha256 – content digest (set by store_upload)
+#   refs   – number of posts/submissions pointing at it
+#   touched_at – last upload of these bytes (starts the GC grace period)
+# Identical uploads reuse the existing blob. An upload made for a known post
+# or submission takes its reference right away; a standalone upload takes
+# none (refs stays 0) until create_post / update_post attach it with
+# acquire_file(). Deleting a post or submission releases its reference, and
+# collect_garbage() removes blobs whose count is zero and that nobody
+# uploaded during the grace period.
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from bson import ObjectId
+from fastapi import Request, UploadFile
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument, UpdateOne
+
+from app.db.mongodb import (
+    fs,
+    fs_files_collection,
+    posts_collection,
+    submissions_collection
+)
+from app.services.gridfs_upload import StoredFile, hash_upload, store_upload
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class UnknownFile(ValueError):
+    """Raised when attaching a file_id that is not (or no longer) stored."""
+
+
+async def store_deduplicated(
+    upload: UploadFile,
+    max_bytes: int,
+    metadata: Optional[dict] = None,
+    request: Optional[Request] = None,
+    refs: int = 1
+) -> StoredFile:
+    """
+    Hash the upload first; if a blob with the same digest and size exists,
+    take `refs` references on it (0 for an upload not attached to anything
+    yet) and skip the GridFS write entirely.
+    """
+    digest, length = await hash_upload(upload, max_bytes)
+    now = datetime.utcnow()
+
+    existing = await fs_files_collection.find_one_and_update(
+        {
+            "metadata.sha256": digest,
+            "length":          length,
+            "metadata.gc":     {"$ne": True}
+        },
+        {"$inc": {"metadata.refs": refs}, "$set": {"metadata.touched_at": now}},
+        projection={"filename": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if existing:
+        await upload.close()
+        return StoredFile(
+            file_id=existing["_id"],
+            filename=upload.filename,
+            length=length,
+            sha256=digest,
+            content_type=upload.content_type,
+            reused=True
+        )
+
+    return await store_upload(
+        fs,
+        upload,
+        max_bytes,
+        metadata={**(metadata or {}), "refs": refs, "touched_at": now},
+        request=request
+    )
+
+
+async def acquire_file(file_id) -> None:
+    """Take one reference to a stored blob (UnknownFile if it is missing or being collected)."""
+    res = await fs_files_collection.update_one(
+        {"_id": ObjectId(file_id), "metadata.gc": {"$ne": True}},
+        {"$inc": {"metadata.refs": 1}}
+    )
+    if not res.matched_count:
+        raise UnknownFile("Unknown file_id")
+
+
+async def release_file(file_id) -> None:
+    """Drop one reference to a blob (no-op for None / unknown ids)."""
+    if not file_id:
+        return
+    await fs_files_collection.update_one(
+        {"_id": ObjectId(file_id)},
+        {"$inc": {"metadata.refs": -1}}
+    )
+
+
+async def reconcile_refs(batch_size: int = 1000) -> int:
+    """
+    Recount `refs` from the posts and submissions that actually point at each
+    blob (repairs drift from uploads that were never attached, or replaced files).
+    Returns the number of blobs whose count changed.
+    """
+    counts: Dict[ObjectId, int] = {}
+    for coll in (posts_collection, submissions_collection):
+        async for row in coll.aggregate([
+            {"$match": {"file_id": {"$ne": None}}},
+            {"$group": {"_id": "$file_id", "n": {"$sum": 1}}}
+        ], allowDiskUse=True):
+            counts[row["_id"]] = counts.get(row["_id"], 0) + row["n"]
+
+    changed = 0
+    ops = []
+    cursor = fs_files_collection.find({}, {"metadata.refs": 1}, batch_size=batch_size)
+    async for f in cursor:
+        actual = counts.get(f["_id"], 0)
+        if (f.get("metadata") or {}).get("refs") != actual:
+            ops.append(UpdateOne({"_id": f["_id"]}, {"$set": {"metadata.refs": actual}}))
+        if len(ops) >= batch_size:
+            res = await fs_files_collection.bulk_write(ops, ordered=False)
+            changed += res.modified_count
+            ops = []
+    if ops:
+        res = await fs_files_collection.bulk_write(ops, ordered=False)
+        changed += res.modified_count
+    return changed
+
+
+async def collect_garbage(grace: timedelta = timedelta(hours=1)) -> int:
+    """
+    Delete blobs with no references left that are older than `grace`
+    (fresh uploads are waiting to be attached to a post).
+    A blob is first flagged `metadata.gc` atomically so a concurrent upload
+    cannot take a reference on it while it is being removed.
+    """
+    cutoff = datetime.utcnow() - grace
+    removed = 0
+    while True:
+        doomed = await fs_files_collection.find_one_and_update(
+            {
+                "metadata.refs": {"$lte": 0},
+                "metadata.gc":   {"$ne": True},
+                "uploadDate":    {"$lt": cutoff},
+                # not re-uploaded recently (standalone uploads wait for create_post)
+                "metadata.touched_at": {"$not": {"$gte": cutoff}}
+            },
+            {"$set": {"metadata.gc": True}},
+            projection={"_id": 1}
+        )
+        if not doomed:
+            break
+
+        fid = doomed["_id"]
+        # belt and braces: never delete something still referenced
+        still_used = (
+            await posts_collection.find_one({"file_id": fid}, {"_id": 1})
+            or await submissions_collection.find_one({"file_id": fid}, {"_id": 1})
+        )
+        if still_used:
+            await fs_files_collection.update_one(
+                {"_id": fid},
+                {"$unset": {"metadata.gc": ""}, "$set": {"metadata.refs": 1}}
+            )
+            continue
+
+        try:
+            await fs.delete(fid)
+            removed += 1
+        except NoFile:
+            pass
+    if removed:
+        logger.info(f"GridFS garbage collection removed {removed} blobs")
+    return removed
@@ -0,0 +1,177 @@
+# /app/services/gridfs_stream.py
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import AsyncIterator, Optional, Tuple
+from urllib.parse import quote
+
+from bson import ObjectId
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from gridfs.errors import NoFile
+
+
+def _etag(grid_out) -> str:
+    """
+    Strong ETag from the stored digest when there is one (md5 on legacy files,
+    sha256 in metadata), otherwise from id + length + upload date.
+    """
+    meta = grid_out.metadata or {}
+    digest = meta.get("sha256") or grid_out.md5
+    if not digest:
+        stamp = int(grid_out.upload_date.replace(tzinfo=timezone.utc).timestamp())
+        digest = f"{grid_out._id}-{grid_out.length}-{stamp}"
+    return f'"{digest}"'
+
+
+def _content_disposition(disposition: str, filename: str) -> str:
+    """ASCII `filename` fallback plus RFC 6266 `filename*` for any other name."""
+    ascii_name = filename.encode("ascii", "replace").decode("ascii").replace('"', "_").replace("\\", "_")
+    header = f'{disposition}; filename="{ascii_name}"'
+    if ascii_name != filename:
+        header += f"; filename*=UTF-8''{quote(filename)}"
+    return header
+
+
+def _last_modified(grid_out) -> str:
+    return format_datetime(grid_out.upload_date.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def _not_modified(request: Request, etag: str, uploaded: datetime) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return _etag_matches(inm, etag)
+
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return uploaded.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into an inclusive (start, end).
+    Returns None when the header should be ignored (malformed or multi-range),
+    raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last) or not (first + last).isdigit():
+        return None
+
+    if first == "":
+        # suffix range: the last N bytes
+        n = int(last)
+        if n == 0 or size == 0:
+            raise ValueError("range not satisfiable")
+        return max(size - n, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+async def _iter_file(grid_out, start: int, length: int) -> AsyncIterator[bytes]:
+    """Yield at most one GridFS chunk at a time from `start`."""
+    try:
+        if start:
+            grid_out.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = await grid_out.read(min(grid_out.chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        grid_out.close()
+
+
+async def stream_gridfs_file(
+    request: Request,
+    bucket,
+    file_id: str,
+    disposition: str = "attachment",
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None
+) -> Response:
+    """
+    Serve a GridFS file without buffering it: honours Range / If-Range for
+    206 partial content and If-None-Match / If-Modified-Since for 304.
+    `filename` is the name the owning document recorded; deduplicated blobs
+    keep the first uploader's name in GridFS, so callers should pass it.
+    """
+    try:
+        oid = ObjectId(file_id)
+    except Exception:
+        raise HTTPException(400, "Invalid file ID")
+
+    try:
+        grid_out = await bucket.open_download_stream(oid)
+    except NoFile:
+        raise HTTPException(404, "File not found")
+
+    meta = grid_out.metadata or {}
+    media_type = (
+        media_type
+        or meta.get("contentType")
+        or meta.get("content_type")
+        or "application/octet-stream"
+    )
+    etag = _etag(grid_out)
+    headers = {
+        "ETag":                etag,
+        "Last-Modified":       _last_modified(grid_out),
+        "Accept-Ranges":       "bytes",
+        "Content-Disposition": _content_disposition(disposition, filename or grid_out.filename or file_id),
+    }
+
+    if _not_modified(request, etag, grid_out.upload_date):
+        grid_out.close()
+        return Response(status_code=304, headers=headers)
+
+    size = grid_out.length
+    status_code = 200
+    start, end = 0, size - 1
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (etag, headers["Last-Modified"])):
+        try:
+            parsed = _parse_range(range_header, size)
+        except ValueError:
+            grid_out.close()
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        if parsed:
+            start, end = parsed
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+    return StreamingResponse(
+        _iter_file(grid_out, start, end - start + 1),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
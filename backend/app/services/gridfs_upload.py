@@ -0,0 +1,116 @@
+# /app/services/gridfs_upload.py
+
+import hashlib
+import os
+from typing import NamedTuple, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException, Request, UploadFile
+
+# Read/write granularity: one GridFS chunk (the driver default, 255 KiB),
+# so a request never holds more than this much of the file in memory.
+CHUNK_SIZE = 255 * 1024
+
+# Per-route size caps (bytes)
+AVATAR_MAX_BYTES      = int(os.getenv("AVATAR_MAX_BYTES",      str(5 * 1024 * 1024)))
+POST_FILE_MAX_BYTES   = int(os.getenv("POST_FILE_MAX_BYTES",   str(200 * 1024 * 1024)))
+SUBMISSION_MAX_BYTES  = int(os.getenv("SUBMISSION_MAX_BYTES",  str(50 * 1024 * 1024)))
+FORUM_IMAGE_MAX_BYTES = int(os.getenv("FORUM_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Check for a vanished client every N chunks
+_DISCONNECT_CHECK_EVERY = 16
+
+
+class StoredFile(NamedTuple):
+    file_id:      ObjectId
+    filename:     str
+    length:       int
+    sha256:       str
+    content_type: Optional[str]
+    reused:       bool = False    # True when an identical blob was already stored
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large (limit {max_bytes // (1024 * 1024)} MB)"
+    )
+
+
+async def store_upload(
+    bucket,
+    upload: UploadFile,
+    max_bytes: int,
+    metadata: Optional[dict] = None,
+    request: Optional[Request] = None
+) -> StoredFile:
+    """
+    Copy an UploadFile into GridFS chunk by chunk, hashing it on the way.
+    Aborts (and deletes the chunks already written) when the size cap is
+    exceeded, the client disconnects, or any write fails.
+    The sha256 is stored in the file's metadata.
+    """
+    metadata = dict(metadata or {})
+    if upload.content_type and "contentType" not in metadata:
+        metadata["contentType"] = upload.content_type
+
+    grid_in = bucket.open_upload_stream(
+        upload.filename,
+        chunk_size_bytes=CHUNK_SIZE,
+        metadata=metadata
+    )
+    hasher = hashlib.sha256()
+    total = 0
+    chunks = 0
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_bytes:
+                raise _too_large(max_bytes)
+            hasher.update(chunk)
+            await grid_in.write(chunk)
+
+            chunks += 1
+            if request is not None and chunks % _DISCONNECT_CHECK_EVERY == 0:
+                if await request.is_disconnected():
+                    raise HTTPException(status_code=499, detail="Client disconnected")
+
+        digest = hasher.hexdigest()
+        await grid_in.set("metadata", {**metadata, "sha256": digest})
+        await grid_in.close()
+    except BaseException:
+        await grid_in.abort()
+        raise
+    finally:
+        await upload.close()
+
+    return StoredFile(
+        file_id=grid_in._id,
+        filename=upload.filename,
+        length=total,
+        sha256=digest,
+        content_type=upload.content_type
+    )
+
+
+async def hash_upload(upload: UploadFile, max_bytes: int) -> tuple:
+    """
+    Hash an upload without storing it and rewind it: returns (sha256, length).
+    The UploadFile is already spooled locally, so this costs no Mongo I/O.
+    """
+    hasher = hashlib.sha256()
+    total = 0
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            await upload.close()
+            raise _too_large(max_bytes)
+        hasher.update(chunk)
+    await upload.seek(0)
+    return hasher.hexdigest(), total
@@ -0,0 +1,107 @@
+# /app/services/password_pool.py
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# bcrypt cost. Changing it is picked up on each user's next login (rehash).
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a small thread pool gives real parallelism
+# without blocking the event loop.
+POOL_WORKERS  = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash operations allowed in flight (running + waiting); beyond that: 503
+POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", str(POOL_WORKERS * 8)))
+
+# Password hashing context
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def _rounds(hashed: str) -> Optional[int]:
+    """Cost factor of a `$2b$12$…` hash, None if it is not bcrypt."""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when the hash was made with another scheme or another cost."""
+    return pwd_context.needs_update(hashed) or _rounds(hashed) != BCRYPT_ROUNDS
+
+
+def _verify_and_rehash(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    try:
+        ok = pwd_context.verify(plain, hashed)
+    except (ValueError, TypeError):
+        # empty / malformed stored hash
+        return False, None
+    if ok and needs_rehash(hashed):
+        return True, pwd_context.hash(plain)
+    return ok, None
+
+
+class PasswordPool:
+    """
+    Runs bcrypt on a dedicated thread pool. The number of pending operations
+    is capped; past that, callers get an immediate 503 instead of queueing
+    behind a login storm.
+    """
+
+    def __init__(self, workers: int = POOL_WORKERS, max_pending: int = POOL_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.counters = {"completed": 0, "rejected": 0, "rehashed": 0}
+
+    def stats(self) -> dict:
+        return {
+            "workers":     self.workers,
+            "pending":     self.pending,
+            "max_pending": self.max_pending,
+            "rounds":      BCRYPT_ROUNDS,
+            **self.counters,
+        }
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="bcrypt")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.counters["completed"] += 1
+
+    async def hash(self, plain: str) -> str:
+        return await self._run(pwd_context.hash, plain)
+
+    async def verify(self, plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (valid, new_hash). new_hash is set when the password was right
+        but the stored hash uses an outdated cost and should be replaced.
+        """
+        ok, new_hash = await self._run(_verify_and_rehash, plain, hashed)
+        if new_hash:
+            self.counters["rehashed"] += 1
+        return ok, new_hash
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Process-wide pool, shut down by app.main
+password_pool = PasswordPool()
@@ -0,0 +1,38 @@
+# /app/services/signed_urls.py
+
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+from app.services.auth import SECRET_KEY
+
+# Lifetime of a signed file URL (seconds). URLs are issued per window of
+# this length and stay valid until the end of the next one, so a URL is
+# good for between 1x and 2x FILE_URL_TTL and is the same for every
+# response built within a window.
+FILE_URL_TTL = int(os.getenv("FILE_URL_TTL", "3600"))
+
+
+def url_window(now: Optional[float] = None) -> int:
+    """Index of the current signing window (part of cached responses' ETags)."""
+    return int((time.time() if now is None else now) // FILE_URL_TTL)
+
+
+def _signature(file_id: str, exp: int) -> str:
+    digest = hmac.new(SECRET_KEY.encode(), f"file:{file_id}:{exp}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode("ascii")
+
+
+def signed_url(url: str, file_id: str, window: Optional[int] = None) -> str:
+    """`url` with `exp` / `sig` query parameters granting access to `file_id`."""
+    exp = ((url_window() if window is None else window) + 2) * FILE_URL_TTL
+    return f"{url}?exp={exp}&sig={_signature(file_id, exp)}"
+
+
+def valid_signature(file_id: str, exp: Optional[int], sig: Optional[str]) -> bool:
+    if exp is None or not sig or exp <= time.time():
+        return False
+    return hmac.compare_digest(sig, _signature(file_id, exp))
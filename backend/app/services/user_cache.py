@@ -0,0 +1,70 @@
+# /app/services/user_cache.py
+
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.schemas.user import UserDB
+
+# Cache settings. Each worker process has its own cache, so TTL also bounds
+# how long another worker can serve a user changed elsewhere.
+USER_CACHE_TTL  = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+class UserCache:
+    """
+    In-process TTL + LRU cache of normalized UserDB objects, keyed by user id.
+    Filled by get_current_user; the user CRUD invalidates entries on write.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, maxsize: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str) -> Optional[UserDB]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user: UserDB) -> None:
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        self._entries[user.id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size":      len(self._entries),
+            "max_size":  self.maxsize,
+            "ttl":       self.ttl,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Process-wide cache used by app.services.auth
+user_cache = UserCache()
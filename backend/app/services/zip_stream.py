@@ -0,0 +1,83 @@
+# /app/services/zip_stream.py
+
+import io
+import zipfile
+from datetime import datetime
+from typing import AsyncIterator, Tuple
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+# (name inside the archive, GridFS file id, modification time)
+ZipEntry = Tuple[str, ObjectId, datetime]
+
+
+class _Sink(io.RawIOBase):
+    """
+    Write-only, non-seekable target for ZipFile: it only buffers what was
+    written since the last drain(), so the archive is never held in memory.
+    ZipFile switches to data descriptors when it cannot seek back.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buf += b
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _zip_time(when: datetime) -> tuple:
+    # ZIP timestamps cannot predate 1980
+    return max(when, datetime(1980, 1, 1)).timetuple()[:6]
+
+
+async def stream_zip(bucket, entries: AsyncIterator[ZipEntry]) -> AsyncIterator[bytes]:
+    """
+    Yield a ZIP archive of GridFS files as it is built: each file is copied
+    one GridFS chunk at a time, so memory use stays at about one chunk plus
+    the central directory (a few dozen bytes per entry), whatever the number
+    or size of files. Entries are stored uncompressed (uploads are mostly
+    PDFs / archives already). Missing files are skipped.
+    """
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    async for name, file_id, when in entries:
+        try:
+            grid_out = await bucket.open_download_stream(file_id)
+        except NoFile:
+            continue
+        info = zipfile.ZipInfo(name, date_time=_zip_time(when))
+        info.compress_type = zipfile.ZIP_STORED
+        try:
+            with archive.open(info, "w", force_zip64=grid_out.length >= zipfile.ZIP64_LIMIT) as member:
+                while True:
+                    data = await grid_out.read(grid_out.chunk_size)
+                    if not data:
+                        break
+                    member.write(data)
+                    out = sink.drain()
+                    if out:
+                        yield out
+        finally:
+            grid_out.close()
+        out = sink.drain()
+        if out:
+            yield out
+
+    archive.close()
+    yield sink.drain()
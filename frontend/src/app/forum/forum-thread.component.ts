@@ -166,15 +166,6 @@ export class ForumThreadComponent implements OnInit {
     });
   }
 
-  /**
-   * Convert a base64 string to a SafeUrl for use in <img src>
-   */
-  toSafeUrl(base64: string): SafeUrl {
-    return this.sanitizer.bypassSecurityTrustUrl(
-      `data:image/png;base64,${base64}`
-    );
-  }
-
   /** Compare message author_id against the normalized currentUserId */
   isOutgoing(authorId: string): boolean {
     return this.currentUserId === authorId;
@@ -183,10 +174,8 @@ export class ForumThreadComponent implements OnInit {
   /**
    * Open the clicked image in a full-screen modal/lightbox
    */
-  openImageModal(base64: string): void {
-    this.modalImageUrl = this.sanitizer.bypassSecurityTrustUrl(
-      `data:image/png;base64,${base64}`
-    );
+  openImageModal(url: string): void {
+    this.modalImageUrl = url;
   }
 
   /**
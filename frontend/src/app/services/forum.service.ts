@@ -11,7 +11,10 @@ export interface ForumMessage {
   thread_id:  string;
   author_id:  string;
   content?:   string;
-  image_data?: string;   // Base64 string
+  image_url?:     string;   // full image, served from GridFS
+  thumbnail_url?: string;   // small preview (may lag right after posting)
+  image_width?:   number;
+  image_height?:  number;
   created_at: string;
 }
 
@@ -139,7 +142,10 @@ export class ForumService {
           thread_id:  msg.thread_id,
           author_id:  msg.author_id,
           content:    msg.content,
-          image_data: msg.image_data,
+          image_url:     msg.image_url,
+          thumbnail_url: msg.thumbnail_url,
+          image_width:   msg.image_width,
+          image_height:  msg.image_height,
           created_at: msg.created_at
         }))
       );